@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+# Dùng các view async cho API đọc (xem backend.async_views). Số thread chạy phần
+# đồng bộ (truy vấn database) được đặt bằng ASGI_THREADS, ví dụ ASGI_THREADS=32
+os.environ.setdefault('ASYNC_VIEWS', 'true')
 
 application = get_asgi_application()
@@ -0,0 +1,72 @@
+import functools
+from contextlib import ExitStack
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.http import JsonResponse
+from . import metrics, response_cache
+
+# Bật khi chạy dưới ASGI (backend/asgi.py đặt mặc định); dưới WSGI giữ view đồng bộ
+ASYNC_VIEWS = getattr(settings, 'ASYNC_VIEWS', False)
+
+
+def _run_in_thread(view, request, args, kwargs):
+    """
+    Chạy view đồng bộ trong thread pool. Django 3.1 chưa có ORM async nên phần
+    chạm database vẫn cần một thread, nhưng chỉ trong lúc truy vấn; response
+    được render luôn ở đây để serializer / renderer không chạy trên event loop.
+    """
+    close_old_connections()
+    try:
+        with ExitStack() as stack:
+            # Kết nối database là theo thread: gắn bộ đếm query của request vào thread này
+            stats = metrics.current_stats()
+            if stats is not None:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(stats.record_query))
+            response = view(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+_run = sync_to_async(_run_in_thread, thread_sensitive=False)
+
+
+def async_read_view(view, fast_path=None):
+    """
+    Biến một view đọc dữ liệu (thường là `SomeAPIView.as_view()`) thành view async.
+
+    `fast_path(request, *args, **kwargs)` trả về response dựng hoàn toàn từ cache,
+    không chạm database, hoặc None. Client cache là I/O chặn nên fast_path cũng
+    chạy trong thread pool, nhưng chỉ trong lúc đọc cache; khi trượt mới chạy view
+    gốc (truy vấn, serializer, render). Kích thước pool đặt bằng biến môi trường
+    ASGI_THREADS.
+    Khi ASYNC_VIEWS tắt, trả lại nguyên view đồng bộ.
+    """
+    if not ASYNC_VIEWS:
+        return view
+
+    lookup = sync_to_async(fast_path, thread_sensitive=False) if fast_path is not None else None
+
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if lookup is not None:
+            response = await lookup(request, *args, **kwargs)
+            if response is not None:
+                return response
+        return await _run(view, request, args, kwargs)
+
+    return async_view
+
+
+def cached_api_response(request, *args, **kwargs):
+    """fast_path cho các view dùng @cache_response: trả JSON đã cache nếu còn hợp lệ"""
+    data = response_cache.lookup(request)
+    if data is None:
+        return None
+    response = JsonResponse(data, safe=False, json_dumps_params={'ensure_ascii': False})
+    response['X-Cache'] = 'HIT'
+    return response
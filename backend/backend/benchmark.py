@@ -0,0 +1,212 @@
+import json
+import platform
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.core.cache import caches
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+# Số query tối đa cho mỗi endpoint, đo ở một lần gọi trượt response cache
+# (các cache khác như bảng tham chiếu, membership đã ấm)
+QUERY_BUDGETS = {
+    'book-detail': 7,
+    'book-list': 1,
+    'book-summary': 1,
+    'books-by-pen-name': 8,
+    'category-list': 1,
+    'login': 1,
+    'user-info': 1,
+    'user-info-by-username': 2,
+}
+# Latency / throughput được phép xấu đi bao nhiêu so với báo cáo cũ trước khi bị coi là hồi quy
+DEFAULT_TOLERANCE = 0.2
+RESPONSE_CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+
+
+class Endpoint:
+    def __init__(self, name, method, path_for, data_for=None, auth=False):
+        self.name = name
+        self.method = method
+        self.path_for = path_for
+        self.data_for = data_for
+        self.auth = auth
+
+    def call(self, client, rng, sample):
+        path = self.path_for(rng, sample)
+        if self.method == 'post':
+            return client.post(path, self.data_for(rng, sample), content_type='application/json')
+        return client.get(path)
+
+
+def _login_payload(rng, sample):
+    return {'username': rng.choice(sample['usernames']), 'password': sample['password']}
+
+
+ENDPOINTS = [
+    Endpoint('book-detail', 'get', lambda rng, sample: f"/book/{rng.choice(sample['book_ids'])}/"),
+    Endpoint('book-list', 'get', lambda rng, sample: '/book/'),
+    Endpoint('book-summary', 'get', lambda rng, sample: f"/book/{rng.choice(sample['book_ids'])}/summary/"),
+    Endpoint('books-by-pen-name', 'get', lambda rng, sample: f"/book/author/pen_name/{rng.choice(sample['pen_names'])}/"),
+    Endpoint('category-list', 'get', lambda rng, sample: '/book/categories/'),
+    Endpoint('login', 'post', lambda rng, sample: '/user/login/', data_for=_login_payload),
+    Endpoint('user-info', 'get', lambda rng, sample: '/user/info/', auth=True),
+    Endpoint('user-info-by-username', 'get', lambda rng, sample: f"/user/{rng.choice(sample['usernames'])}/"),
+]
+
+
+def percentile(values, fraction):
+    """Percentile theo nearest-rank trên danh sách đã sắp xếp"""
+    if not values:
+        return None
+    index = max(0, min(len(values) - 1, int(round(fraction * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def _client_for(endpoint, sample):
+    client = Client()
+    if endpoint.auth:
+        from django.contrib.auth.models import User
+        from user.authentication import AikoRefreshToken
+
+        user = User.objects.get(username=sample['usernames'][0])
+        client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AikoRefreshToken.for_user(user).access_token}'
+    return client
+
+
+def measure_cold_call(endpoint, sample, seed=0):
+    """
+    Số query, latency và status của một request khi response cache trống: gọi
+    một lần để làm ấm các cache khác, xoá response cache rồi đo lần gọi thứ hai.
+    """
+    client = _client_for(endpoint, sample)
+    endpoint.call(client, random.Random(seed), sample)
+    caches[RESPONSE_CACHE_ALIAS].clear()
+    with CaptureQueriesContext(connection) as context:
+        start = time.perf_counter()
+        response = endpoint.call(client, random.Random(seed), sample)
+        elapsed = time.perf_counter() - start
+    return len(context.captured_queries), elapsed, response.status_code
+
+
+def _run_worker(endpoint, sample, requests, seed):
+    close_old_connections()
+    client = _client_for(endpoint, sample)
+    rng = random.Random(seed)
+    timings = []
+    errors = 0
+    try:
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = endpoint.call(client, rng, sample)
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+    finally:
+        close_old_connections()
+    return timings, errors
+
+
+def run_endpoint(endpoint, sample, requests=200, concurrency=1, warmup=10, seed=0):
+    """Gọi endpoint `requests` lần (chia cho `concurrency` luồng), trả về thống kê"""
+    _run_worker(endpoint, sample, warmup, seed)
+    per_worker = max(1, requests // concurrency)
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [_run_worker(endpoint, sample, per_worker, seed)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(_run_worker, endpoint, sample, per_worker, seed + i) for i in range(concurrency)]
+            results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    timings = sorted(timing for worker_timings, _ in results for timing in worker_timings)
+    errors = sum(worker_errors for _, worker_errors in results)
+    to_ms = lambda value: round(value * 1000, 3)
+    return {
+        'requests': len(timings),
+        'errors': errors,
+        'throughput_rps': round(len(timings) / elapsed, 2) if elapsed else None,
+        'mean_ms': to_ms(sum(timings) / len(timings)),
+        'p50_ms': to_ms(percentile(timings, 0.50)),
+        'p95_ms': to_ms(percentile(timings, 0.95)),
+        'p99_ms': to_ms(percentile(timings, 0.99)),
+        'max_ms': to_ms(timings[-1]),
+    }
+
+
+def run_benchmark(sample, endpoints=None, requests=200, concurrency=1, warmup=10, seed=0, budgets=None):
+    """Chạy toàn bộ benchmark, trả về báo cáo dạng dict (ghi ra JSON được)"""
+    budgets = QUERY_BUDGETS if budgets is None else budgets
+    selected = [endpoint for endpoint in ENDPOINTS if not endpoints or endpoint.name in endpoints]
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'database': connection.vendor,
+            'requests': requests,
+            'concurrency': concurrency,
+            'seed': seed,
+            'dataset': {key: value for key, value in sample.items() if isinstance(value, int)},
+        },
+        'endpoints': {},
+    }
+    for endpoint in selected:
+        result = run_endpoint(endpoint, sample, requests, concurrency, warmup, seed)
+        queries, elapsed, status_code = measure_cold_call(endpoint, sample, seed)
+        result['queries'] = queries
+        result['cold_ms'] = round(elapsed * 1000, 3)
+        if status_code >= 400:
+            result['errors'] += 1
+        result['query_budget'] = budgets.get(endpoint.name)
+        report['endpoints'][endpoint.name] = result
+    return report
+
+
+def budget_violations(report):
+    return [
+        f"{name}: {result['queries']} queries (budget {result['query_budget']})"
+        for name, result in report['endpoints'].items()
+        if result['query_budget'] is not None and result['queries'] > result['query_budget']
+    ]
+
+
+def endpoint_errors(report):
+    """Endpoint có response lỗi (status >= 400): số liệu của nó không đo đúng thứ cần đo"""
+    return [
+        f"{name}: {result['errors']} requests answered with status >= 400"
+        for name, result in report['endpoints'].items()
+        if result['errors']
+    ]
+
+
+def compare_reports(baseline, current, tolerance=DEFAULT_TOLERANCE):
+    """
+    So sánh hai báo cáo, trả về danh sách hồi quy: latency p50/p95 tăng,
+    throughput giảm quá `tolerance`, hoặc số query tăng.
+    """
+    regressions = []
+    for name, result in current['endpoints'].items():
+        previous = baseline.get('endpoints', {}).get(name)
+        if previous is None:
+            continue
+        for key in ('p50_ms', 'p95_ms'):
+            if previous.get(key) and result[key] > previous[key] * (1 + tolerance):
+                regressions.append(f'{name}: {key} {previous[key]} -> {result[key]}')
+        if previous.get('throughput_rps') and result['throughput_rps'] < previous['throughput_rps'] * (1 - tolerance):
+            regressions.append(f"{name}: throughput_rps {previous['throughput_rps']} -> {result['throughput_rps']}")
+        if previous.get('queries') is not None and result['queries'] > previous['queries']:
+            regressions.append(f"{name}: queries {previous['queries']} -> {result['queries']}")
+    return regressions
+
+
+def load_report(path):
+    with open(path, encoding='utf-8') as report_file:
+        return json.load(report_file)
+
+
+def write_report(report, path):
+    with open(path, 'w', encoding='utf-8') as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
@@ -1,17 +1,23 @@
 import os
-from dotenv import load_dotenv
+import sys
+from decouple import config
 from pymongo.mongo_client import MongoClient
-from pymongo.server_api import ServerApi
 
-load_dotenv()
+# Chạy được cả bằng `python backend/connect-mongodb.py` lẫn từ trong thư mục backend/
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from backend.mongo import client_options, pool_listener, pool_stats
 
 # get URI from environment
-uri = os.getenv('MONGO_URI')
+uri = config('MONGO_URI')
 
-# Create a new MongoClient and check connection
-client = MongoClient(uri, server_api=ServerApi('1'))
+# Create a MongoClient with the same pool / timeout / compression options as the app and check connection
+client = MongoClient(uri, event_listeners=[pool_listener], **client_options())
 try:
     client.admin.command('ping')
     print("Pinged your deployment. You successfully connected to MongoDB!")
+    print(f"Options: {client_options()}")
+    print(f"Pool: {pool_stats()}")
 except Exception as e:
     print(f"Error: {e}")
+finally:
+    client.close()
@@ -0,0 +1,45 @@
+import contextvars
+from contextlib import contextmanager
+from django.conf import settings
+
+READS_ALIAS = 'reads'
+
+_use_reads = contextvars.ContextVar('use_read_replica', default=False)
+
+
+@contextmanager
+def read_replica(enabled=True):
+    """Trong khối lệnh này, truy vấn đọc đi qua alias 'reads' (nếu có cấu hình)"""
+    token = _use_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _use_reads.reset(token)
+
+
+def use_read_replica(enabled=True):
+    """Bật / tắt cho phần còn lại của context hiện tại (ReadReplicaMiddleware reset sau mỗi request)"""
+    _use_reads.set(enabled)
+
+
+class ReadReplicaRouter:
+    """
+    Đọc từ secondary chỉ khi request hiện tại là endpoint chỉ đọc (view có
+    `read_replica = True`, xem ReadReplicaMiddleware); mọi truy vấn khác, kể cả
+    đọc trong request có ghi, vẫn đi qua 'default' để thấy ngay dữ liệu vừa ghi.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _use_reads.get() and READS_ALIAS in settings.DATABASES:
+            return READS_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Hai alias trỏ cùng một database
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == 'default'
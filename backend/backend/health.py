@@ -0,0 +1,34 @@
+import time
+from django.conf import settings
+from django.db import connections
+from django.http import JsonResponse
+from . import metrics, mongo
+
+
+def _ping(alias):
+    connection = connections[alias]
+    start = time.perf_counter()
+    try:
+        connection.ensure_connection()
+        if connection.vendor == 'djongo':
+            connection.connection.command('ping')
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+    except Exception as error:
+        return {'ok': False, 'error': str(error)}
+    return {'ok': True, 'latency_ms': round((time.perf_counter() - start) * 1000, 1)}
+
+
+def health_view(request):
+    """
+    Ping từng alias database; trả 503 nếu có alias lỗi (dùng cho load balancer).
+    Chi tiết lỗi và số liệu pool chỉ hiện cho IP nội bộ / staff như /metrics/.
+    """
+    databases = {alias: _ping(alias) for alias in settings.DATABASES}
+    healthy = all(result['ok'] for result in databases.values())
+    data = {'status': 'ok' if healthy else 'error'}
+    if metrics.is_internal_request(request):
+        data['databases'] = databases
+        data['pools'] = mongo.pool_stats()
+    return JsonResponse(data, status=200 if healthy else 503)
@@ -0,0 +1,93 @@
+import re
+from html import escape
+from html.parser import HTMLParser
+
+# Các thẻ CKEditor sinh ra mà trình đọc được phép hiển thị
+ALLOWED_TAGS = {
+    'p', 'br', 'hr', 'div', 'span', 'blockquote', 'pre', 'code',
+    'strong', 'b', 'em', 'i', 'u', 's', 'strike', 'sub', 'sup', 'small',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6',
+    'ul', 'ol', 'li', 'a', 'img', 'figure', 'figcaption',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption',
+}
+VOID_TAGS = {'br', 'hr', 'img'}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan'},
+}
+# Nội dung của các thẻ này bị bỏ hoàn toàn chứ không chỉ bỏ thẻ
+DROP_CONTENT_TAGS = {'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template'}
+SAFE_URL = re.compile(r'^(https?:|mailto:|/|#)', re.IGNORECASE)
+SAFE_STYLE = re.compile(r'^\s*text-align\s*:\s*(left|right|center|justify)\s*;?\s*$', re.IGNORECASE)
+
+
+class _Sanitizer(HTMLParser):
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self.open_tags = []
+        self.dropping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping += 1
+            return
+        if self.dropping or tag not in ALLOWED_TAGS:
+            return
+        self.parts.append(f'<{tag}{self._render_attrs(tag, attrs)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping -= 1
+        elif tag in self.open_tags and tag not in VOID_TAGS:
+            self.handle_endtag(tag)
+
+    def handle_endtag(self, tag):
+        if tag in DROP_CONTENT_TAGS:
+            self.dropping = max(self.dropping - 1, 0)
+            return
+        if self.dropping or tag not in self.open_tags:
+            return
+        # Đóng cả các thẻ con bị bỏ ngỏ để HTML luôn cân bằng
+        while self.open_tags:
+            current = self.open_tags.pop()
+            self.parts.append(f'</{current}>')
+            if current == tag:
+                break
+
+    def handle_data(self, data):
+        if not self.dropping:
+            self.parts.append(escape(data, quote=False))
+
+    def _render_attrs(self, tag, attrs):
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        rendered = []
+        for name, value in attrs:
+            value = value or ''
+            if name == 'style':
+                if not SAFE_STYLE.match(value):
+                    continue
+            elif name not in allowed:
+                continue
+            elif name in ('href', 'src') and not SAFE_URL.match(value.strip()):
+                continue
+            rendered.append(f' {name}="{escape(value)}"')
+        if tag == 'a' and any(item.startswith(' href=') for item in rendered):
+            rendered.append(' rel="noopener noreferrer nofollow"')
+        return ''.join(rendered)
+
+    def result(self):
+        self.close()
+        return ''.join(self.parts) + ''.join(f'</{tag}>' for tag in reversed(self.open_tags))
+
+
+def sanitize_html(html):
+    """Lọc HTML từ CKEditor theo whitelist thẻ/thuộc tính, bỏ script và URL nguy hiểm"""
+    sanitizer = _Sanitizer()
+    sanitizer.feed(html or '')
+    return sanitizer.result()
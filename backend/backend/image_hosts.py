@@ -0,0 +1,27 @@
+import hashlib
+import os
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+LOCAL_HOST_DIR = 'hosted'
+
+
+def upload_image_to_local(image_file):
+    """
+    Image host giả lập lưu ảnh vào MEDIA_ROOT thay vì gọi Imgur.
+    Dùng cho môi trường dev / test offline (IMAGE_UPLOADER=backend.image_hosts.upload_image_to_local).
+    """
+    image_file.seek(0)
+    data = image_file.read()
+    _, extension = os.path.splitext(getattr(image_file, 'name', '') or '')
+    name = f'{LOCAL_HOST_DIR}/{hashlib.sha1(data).hexdigest()}{extension.lower()}'
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return local_url(name)
+
+
+def local_url(name):
+    """URL công khai của một file trong default_storage (MEDIA_URL, kèm LOCAL_IMAGE_HOST_URL nếu có)"""
+    base_url = getattr(settings, 'LOCAL_IMAGE_HOST_URL', '')
+    return f'{base_url}{default_storage.url(name)}'
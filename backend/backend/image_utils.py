@@ -1,31 +1,254 @@
 import base64
+import binascii
+import hashlib
+import re
+import tempfile
 from io import BytesIO
-from PIL import Image
-from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+import pillow_avif  # noqa: F401  đăng ký định dạng AVIF cho Pillow
+from django.conf import settings
+from django.core.files.base import ContentFile, File
+
+# Giới hạn đầu vào, kiểm tra trước khi giải mã toàn bộ ảnh
+MAX_IMAGE_BYTES = getattr(settings, 'IMAGE_MAX_BYTES', 20 * 1024 * 1024)
+MAX_IMAGE_DIMENSION = getattr(settings, 'IMAGE_MAX_DIMENSION', 8000)
+MAX_IMAGE_PIXELS = getattr(settings, 'IMAGE_MAX_PIXELS', 40_000_000)
+
+# Kích thước (rộng, cao tối đa) của từng biến thể theo mục đích sử dụng
+IMAGE_PROFILES = {
+    'cover': {'thumbnail': (160, 240), 'cover': (480, 720), 'full': (1200, 1800)},
+    'avatar': {'thumbnail': (64, 64), 'cover': (256, 256), 'full': (512, 512)},
+    'background': {'thumbnail': (640, 360), 'cover': (1280, 720), 'full': (1920, 1080)},
+}
+# Biến thể và định dạng được ghi vào field URL chính (tương thích client cũ)
+PRIMARY_VARIANT = ('cover', 'jpeg')
+# Các biến thể được phục vụ từ default_storage; chỉ biến thể chính (JPEG) đi qua image host
+VARIANT_FORMATS = getattr(settings, 'IMAGE_VARIANT_FORMATS', ('webp', 'jpeg'))
+ENCODE_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60, 'speed': 6},
+    'jpeg': {'format': 'JPEG', 'quality': 85, 'optimize': True, 'progressive': True},
+}
+
+
+class InvalidImageError(Exception):
+    pass
+
+
+# Chữ ký (magic bytes) của các định dạng ảnh chấp nhận, kiểm tra trên SIGNATURE_BYTES byte đầu
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+SIGNATURE_BYTES = 32
+BASE64_CHUNK_SIZE = 64 * 1024  # bội số của 4 để mỗi chunk giải mã độc lập
+# Dưới ngưỡng này ảnh giải mã được giữ trong RAM, vượt quá thì ghi ra file tạm
+SPOOL_MAX_MEMORY = getattr(settings, 'IMAGE_SPOOL_MAX_MEMORY', 1024 * 1024)
+# Kích thước mỗi dải pixel khi hash ảnh
+DIGEST_BAND_BYTES = 1024 * 1024
+BASE64_HEAD_RE = re.compile(r'^[A-Za-z0-9+/\s]*={0,2}\s*$')
+
+
+def _strip_data_uri(data):
+    # Bỏ tiền tố 'data:image/png;base64,' nếu có, không copy cả chuỗi
+    marker = data.find('base64,', 0, 100)
+    return data[marker + len('base64,'):] if marker != -1 else data
+
+
+def sniff_image_type(head):
+    """Đoán định dạng ảnh từ vài byte đầu; None nếu không nhận ra"""
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    if head[4:8] == b'ftyp' and head[8:12] in (b'avif', b'avis', b'heic', b'mif1'):
+        return 'avif'
+    return None
+
 
 def is_base64_string(data):
-    """Kiểm tra xem dữ liệu có phải base64 hay không"""
-    try:
-        base64.b64decode(data)
-        return True
-    except Exception:
+    """
+    Kiểm tra nhanh xem dữ liệu có giống base64 hay không.
+    Chỉ xét phần đầu chuỗi; việc kiểm tra đầy đủ diễn ra trong lúc giải mã.
+    """
+    if not isinstance(data, str):
         return False
+    head = _strip_data_uri(data)[:BASE64_CHUNK_SIZE]
+    return bool(head.strip()) and BASE64_HEAD_RE.match(head) is not None
+
+
+def _sniff_spool(spool):
+    """Kiểm tra chữ ký trên các byte đầu đã ghi (chunk đầu có thể ngắn hơn chữ ký)"""
+    spool.seek(0)
+    extension = sniff_image_type(spool.read(SIGNATURE_BYTES))
+    spool.seek(0, 2)
+    if extension is None:
+        raise InvalidImageError("Unsupported or invalid image data.")
+    return extension
+
+
+def decode_base64_image(base64_string, max_bytes=None):
+    """
+    Giải mã base64 theo từng chunk vào SpooledTemporaryFile trong một lượt.
+
+    Từ chối sớm nếu chunk đầu không phải chữ ký ảnh hợp lệ hoặc dung lượng
+    vượt `max_bytes`, nên bộ nhớ mỗi lần upload không vượt quá SPOOL_MAX_MEMORY
+    cộng một chunk, dù chuỗi base64 lớn cỡ nào.
+    """
+    max_bytes = max_bytes or MAX_IMAGE_BYTES
+    payload = _strip_data_uri(base64_string)
+    if len(payload) // 4 * 3 > max_bytes * 1.1:
+        # Ước lượng trước khi giải mã (chừa 10% cho khoảng trắng / xuống dòng)
+        raise InvalidImageError(f"Image is larger than {max_bytes} bytes.")
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    extension = None
+    written = 0
+    leftover = ''
+    try:
+        for start in range(0, len(payload), BASE64_CHUNK_SIZE):
+            chunk = leftover + ''.join(payload[start:start + BASE64_CHUNK_SIZE].split())
+            aligned = len(chunk) // 4 * 4
+            chunk, leftover = chunk[:aligned], chunk[aligned:]
+            if not chunk:
+                continue
+            decoded = base64.b64decode(chunk, validate=True)
+            written += len(decoded)
+            if written > max_bytes:
+                raise InvalidImageError(f"Image is larger than {max_bytes} bytes.")
+            spool.write(decoded)
+            if extension is None and written >= SIGNATURE_BYTES:
+                extension = _sniff_spool(spool)
+        if leftover or not written:
+            raise InvalidImageError("Invalid base64 image data.")
+        if extension is None:
+            # Ảnh ngắn hơn SIGNATURE_BYTES
+            extension = _sniff_spool(spool)
+    except binascii.Error as e:
+        spool.close()
+        raise InvalidImageError(f"Error processing base64 image: {str(e)}")
+    except InvalidImageError:
+        spool.close()
+        raise
+    spool.seek(0)
+    return File(spool, name=f'uploaded_image.{extension}')
+
 
 def save_base64_image(base64_string):
-    """Chuyển đổi base64 thành file image và trả về file object"""
+    """Chuyển đổi base64 thành file image (giữ nguyên bytes gốc, không encode lại)"""
+    return decode_base64_image(base64_string)
+
+
+def _open_checked(image_file):
+    """Image.open (chỉ đọc header) sau khi kiểm tra dung lượng và kích thước"""
+    image_file.seek(0, 2)
+    size = image_file.tell()
+    image_file.seek(0)
+    if size > MAX_IMAGE_BYTES:
+        raise InvalidImageError(f"Image is larger than {MAX_IMAGE_BYTES} bytes.")
+
+    try:
+        # Image.open chỉ đọc header nên kiểm tra kích thước ở đây chưa tốn bộ nhớ
+        image = Image.open(image_file)
+    except (IOError, SyntaxError) as e:
+        raise InvalidImageError(f"Invalid image file: {str(e)}")
+    width, height = image.size
+    if max(width, height) > MAX_IMAGE_DIMENSION or width * height > MAX_IMAGE_PIXELS:
+        raise InvalidImageError(f"Image dimensions {width}x{height} are too large.")
+    return image
+
+
+def validate_image(image_file):
+    """
+    Kiểm tra dung lượng, kích thước và cấu trúc file ảnh mà không giải mã pixel
+    (dùng trong request; việc giải mã và tạo biến thể chạy ở worker).
+    Trả về phần mở rộng theo định dạng ảnh.
+    """
+    image = _open_checked(image_file)
+    image_format = image.format
     try:
-        # Giải mã base64 thành bytes
-        image_data = base64.b64decode(base64_string.split('base64,')[-1])
-        image = Image.open(BytesIO(image_data))
-
-        # Tạo tên file cho ảnh
-        image_name = 'uploaded_image.png'
-        
-        # Save to a ContentFile (file object)
-        image_io = BytesIO()
-        image.save(image_io, format='PNG')
-        image_file = ContentFile(image_io.getvalue(), name=image_name)
-        
-        return image_file
+        image.verify()
     except Exception as e:
-        raise Exception(f"Error processing base64 image: {str(e)}")
\ No newline at end of file
+        raise InvalidImageError(f"Invalid image file: {str(e)}")
+    finally:
+        image_file.seek(0)
+    return (image_format or 'bin').lower()
+
+
+def open_image(image_file):
+    """
+    Mở và giải mã ảnh đúng một lần sau khi kiểm tra dung lượng và kích thước.
+    Trả về ảnh đã xoay theo EXIF, ở mode RGB/RGBA.
+    """
+    image = _open_checked(image_file)
+    try:
+        image.load()
+    except Exception as e:
+        raise InvalidImageError(f"Invalid image file: {str(e)}")
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    return image.convert('RGBA' if has_alpha else 'RGB')
+
+
+def _encode(image, image_format):
+    options = dict(ENCODE_OPTIONS[image_format])
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        # JPEG không có kênh alpha: ghép lên nền trắng
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = BytesIO()
+    # Không truyền exif / icc_profile nên metadata của ảnh gốc bị loại bỏ
+    image.save(buffer, **options)
+    return buffer.getvalue()
+
+
+def image_digest(image, profile='cover'):
+    """
+    Hash nội dung ảnh đã chuẩn hoá (pixel sau khi xoay EXIF, bỏ metadata).
+    Cùng một ảnh gửi lại, dù khác tên file hay metadata, cho cùng digest.
+    """
+    digest = hashlib.sha256()
+    digest.update(f'{profile}:{image.mode}:{image.width}x{image.height}:'.encode('ascii'))
+    # Hash từng dải hàng thay vì image.tobytes() (copy cả bộ đệm pixel, ~160 MB ở giới hạn 40 MP)
+    rows = max(1, DIGEST_BAND_BYTES // max(1, image.width * len(image.getbands())))
+    for top in range(0, image.height, rows):
+        digest.update(image.crop((0, top, image.width, min(top + rows, image.height))).tobytes())
+    return digest.hexdigest()
+
+
+def render_image_variants(image, profile='cover'):
+    """
+    Tạo các biến thể thumbnail / cover / full cho ảnh đã mở ở nhiều định dạng.
+
+    Trả về dict {variant: {'width', 'height', 'files': {format: ContentFile}}}.
+    Các biến thể nhỏ được thu nhỏ từ biến thể lớn hơn liền trước thay vì từ
+    ảnh gốc, và ảnh không bao giờ bị phóng to.
+    """
+    variants = {}
+    sizes = sorted(IMAGE_PROFILES[profile].items(), key=lambda item: -item[1][0] * item[1][1])
+    current = image
+    for name, box in sizes:
+        current = current.copy()
+        current.thumbnail(box, Image.LANCZOS)
+        variants[name] = {
+            'width': current.width,
+            'height': current.height,
+            'files': {
+                image_format: ContentFile(_encode(current, image_format), name=f'{name}.{image_format}')
+                for image_format in VARIANT_FORMATS
+            },
+        }
+    return variants
+
+
+def default_cover_url():
+    return getattr(settings, 'DEFAULT_COVER_URL', 'https://i.imgur.com/OJbZSFy.jpeg')
+
+
+def default_avatar_url():
+    return getattr(settings, 'DEFAULT_AVATAR_URL', 'https://i.imgur.com/default-avatar.jpg')
@@ -1,3 +1,4 @@
+import logging
 import os
 import requests
 from PIL import Image
@@ -5,8 +6,12 @@ import io
 import pillow_avif 
 import PIL
 
+logger = logging.getLogger(__name__)
+
 # Retrieve the Imgur Client ID from environment variables
 IMGUR_CLIENT_ID = os.getenv('IMGUR_CLIENT_ID')
+# (connect, read) timeout in seconds so a stalled upload never hangs a worker
+IMGUR_TIMEOUT = (5, 30)
 
 def upload_image_to_imgur(image_file):
     """
@@ -28,35 +33,33 @@ def upload_image_to_imgur(image_file):
         # Reset the pointer after verification
         image_file.seek(0)
         
-        # Create a BytesIO object to hold the image data
-        img_byte_arr = io.BytesIO()
-        
         # Check if the image format is supported
-        if image.format not in ['JPEG', 'PNG', 'GIF', 'BMP']:
+        if image.format not in ['JPEG', 'PNG', 'GIF', 'BMP', 'WEBP']:
             # Convert to PNG if the format is not supported
+            img_byte_arr = io.BytesIO()
             image.save(img_byte_arr, format='PNG')
+            img_byte_arr.seek(0)
+            image_format = 'PNG'
         else:
-            # Save the image in its original format
-            image.save(img_byte_arr, format=image.format)
-        
-        # Reset the pointer to the beginning of the BytesIO object
-        img_byte_arr.seek(0)
+            # Upload the original bytes as-is: they are already encoded,
+            # decoding and re-encoding would only cost time and quality
+            img_byte_arr = image_file
+            image_format = image.format
         
         # Prepare the files for upload
         files = {
-            'image': ('image', img_byte_arr, f'image/{image.format.lower()}')
+            'image': ('image', img_byte_arr, f'image/{image_format.lower()}')
         }
         
         # Send the image to Imgur
         response = requests.post(
             'https://api.imgur.com/3/image',
             headers=headers,
-            files=files
+            files=files,
+            timeout=IMGUR_TIMEOUT
         )
         
-        # Debugging: Print response status and text
-        print(f"Upload status: {response.status_code}")
-        print(f"Response: {response.text}")
+        logger.debug("Imgur upload status %s: %s", response.status_code, response.text)
         
         if response.status_code == 200:
             # Return the image URL if the upload is successful
@@ -68,10 +71,10 @@ def upload_image_to_imgur(image_file):
             
     except requests.exceptions.RequestException as e:
         # Handle any network-related errors
-        print(f"Request error: {str(e)}")
+        logger.warning("Imgur request error: %s", e)
         raise Exception(f"Error uploading image to Imgur: {str(e)}")
     
     except Exception as e:
         # Handle any other errors
-        print(f"Error details: {str(e)}")
+        logger.warning("Imgur upload error: %s", e)
         raise Exception(f"Error processing image: {str(e)}")
@@ -0,0 +1,193 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+_current_request = contextvars.ContextVar('current_request_stats', default=None)
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(label, '')) for label in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {'buckets': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            index = bisect.bisect_left(self.buckets, value)
+            if index < len(self.buckets):
+                series['buckets'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted(self._series.items())
+            for key, series in items:
+                labels = list(zip(self.labels, key))
+                cumulative = 0
+                for bound, count in zip(self.buckets, series['buckets']):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", bound)])} {cumulative}')
+                lines.append(f'{self.name}_bucket{_format_labels(labels + [("le", "+Inf")])} {series["count"]}')
+                lines.append(f'{self.name}_sum{_format_labels(labels)} {series["sum"]:.6f}')
+                lines.append(f'{self.name}_count{_format_labels(labels)} {series["count"]}')
+        return lines
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in labels
+    )
+    return '{' + ','.join(f'{name}="{value}"' for name, value in escaped) + '}'
+
+
+REQUEST_LABELS = ('method', 'endpoint', 'status')
+request_latency = Histogram('aiko_request_duration_seconds', 'Request latency by endpoint.', REQUEST_LABELS)
+request_queries = Histogram('aiko_request_db_queries', 'Database queries per request.', REQUEST_LABELS, COUNT_BUCKETS)
+request_db_time = Histogram('aiko_request_db_seconds', 'Time spent in the database per request.', REQUEST_LABELS)
+request_serializer_time = Histogram('aiko_request_serializer_seconds', 'Time spent serializing per request.', REQUEST_LABELS)
+# Upload chạy ở worker nền (backend.upload_queue), không thuộc request nào nên đo theo từng lần upload
+image_upload_time = Histogram('aiko_image_upload_seconds', 'Duration of each outbound image upload.', ('outcome',))
+write_behind_flush_time = Histogram('aiko_write_behind_flush_seconds', 'Duration of each write-behind flush.', ('buffer', 'outcome'))
+write_behind_batch_size = Histogram('aiko_write_behind_batch_size', 'Keys written per write-behind flush.', ('buffer',), COUNT_BUCKETS)
+
+REGISTRY = [
+    request_latency, request_queries, request_db_time, request_serializer_time, image_upload_time,
+    write_behind_flush_time, write_behind_batch_size,
+]
+
+
+class RequestStats:
+    """Số liệu thu thập trong lúc xử lý một request"""
+
+    def __init__(self):
+        self.queries = []
+        self.db_time = 0.0
+        self.timings = {}
+
+    def record_query(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.db_time += elapsed
+            self.queries.append((elapsed, sql))
+
+    def add_time(self, kind, elapsed):
+        self.timings[kind] = self.timings.get(kind, 0.0) + elapsed
+
+
+def current_stats():
+    return _current_request.get()
+
+
+@contextmanager
+def collect_request_stats():
+    stats = RequestStats()
+    token = _current_request.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_request.reset(token)
+
+
+@contextmanager
+def track(kind):
+    """Cộng thời gian của khối lệnh vào `kind` của request hiện tại (nếu có)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats = _current_request.get()
+        if stats is not None:
+            stats.add_time(kind, time.perf_counter() - start)
+
+
+def observe_request(method, endpoint, status, elapsed, stats):
+    labels = {'method': method, 'endpoint': endpoint, 'status': status}
+    request_latency.observe(elapsed, **labels)
+    request_queries.observe(len(stats.queries), **labels)
+    request_db_time.observe(stats.db_time, **labels)
+    request_serializer_time.observe(stats.timings.get('serializer', 0.0), **labels)
+
+
+_serializer_timing_installed = False
+
+
+def install_serializer_timing():
+    """
+    Đo thời gian serializer bằng cách bọc property `data` của DRF serializer.
+    Serializer lồng nhau dùng to_representation chứ không gọi `.data`, nên mỗi
+    response chỉ bị đếm một lần.
+    """
+    global _serializer_timing_installed
+    if _serializer_timing_installed:
+        return
+    from rest_framework import serializers
+
+    for cls in (serializers.Serializer, serializers.ListSerializer):
+        original = cls.data
+
+        def timed_data(self, _original=original):
+            with track('serializer'):
+                return _original.fget(self)
+
+        cls.data = property(timed_data)
+    _serializer_timing_installed = True
+
+
+def render_metrics():
+    lines = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render())
+    return '\n'.join(lines) + '\n'
+
+
+def is_internal_request(request):
+    """
+    Request mang JWT hợp lệ của staff, hoặc từ IP khai báo rõ trong
+    METRICS_ALLOWED_IPS (mặc định rỗng: sau reverse proxy, REMOTE_ADDR loopback
+    không nói gì về client thật). View Django thường không chạy authentication
+    của DRF (request.user luôn là AnonymousUser với JWT), nên token được xác
+    thực trực tiếp ở đây.
+    """
+    allowed = getattr(settings, 'METRICS_ALLOWED_IPS', ())
+    if request.META.get('REMOTE_ADDR') in allowed:
+        return True
+    from rest_framework.exceptions import APIException
+    from rest_framework.settings import api_settings
+
+    for authentication_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = authentication_class().authenticate(request)
+        except APIException:
+            return False
+        if result is not None:
+            return result[0].is_staff
+    return False
+
+
+def metrics_view(request):
+    """Xuất số liệu theo định dạng text của Prometheus (số liệu của process hiện tại)"""
+    if not is_internal_request(request):
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,109 @@
+import logging
+import time
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from . import db_router, metrics
+
+slow_request_logger = logging.getLogger('backend.slow_requests')
+
+
+class ProfilingMiddleware:
+    """
+    Đo latency, số truy vấn / thời gian database và thời gian serializer của
+    từng request, gom theo endpoint (route) để xuất ra /metrics/. Upload ảnh chạy
+    ở worker nền nên được đo riêng (metrics.image_upload_time).
+    Request chậm hơn SLOW_REQUEST_THRESHOLD_MS được ghi log kèm danh sách truy vấn.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 500) / 1000
+        self.slow_query_limit = getattr(settings, 'SLOW_REQUEST_MAX_QUERIES_LOGGED', 50)
+        metrics.install_serializer_timing()
+        if iscoroutinefunction(get_response):
+            # Dưới ASGI: báo cho Django rằng middleware này là coroutine, không cần chuyển qua thread
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        start = time.perf_counter()
+        with metrics.collect_request_stats() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats.record_query))
+            response = self.get_response(request)
+        return self._finish(request, response, start, stats)
+
+    async def __acall__(self, request):
+        # Truy vấn chạy ở thread khác: chỉ các view bọc bằng backend.async_views tự gắn bộ đếm query
+        start = time.perf_counter()
+        with metrics.collect_request_stats() as stats:
+            response = await self.get_response(request)
+        return self._finish(request, response, start, stats)
+
+    def _finish(self, request, response, start, stats):
+        elapsed = time.perf_counter() - start
+
+        endpoint = self._endpoint(request)
+        metrics.observe_request(request.method, endpoint, response.status_code, elapsed, stats)
+        response['Server-Timing'] = (
+            f'db;dur={stats.db_time * 1000:.1f};desc="{len(stats.queries)} queries", '
+            f'total;dur={elapsed * 1000:.1f}'
+        )
+        if elapsed >= self.slow_threshold:
+            self._log_slow_request(request, endpoint, response, elapsed, stats)
+        return response
+
+    @staticmethod
+    def _endpoint(request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        # Dùng route (vd. 'book/<int:book_id>/') để id khác nhau không tạo series mới
+        return match.route or match.view_name
+
+    def _log_slow_request(self, request, endpoint, response, elapsed, stats):
+        queries = sorted(stats.queries, reverse=True)[:self.slow_query_limit]
+        slow_request_logger.warning(
+            'Slow request %s %s (%s) -> %s in %.0f ms: %d queries, %.0f ms db, %s\n%s',
+            request.method, request.get_full_path(), endpoint, response.status_code, elapsed * 1000,
+            len(stats.queries), stats.db_time * 1000,
+            ', '.join(f'{kind} {value * 1000:.0f} ms' for kind, value in stats.timings.items()) or 'no other timings',
+            '\n'.join(f'  {duration * 1000:8.1f} ms  {sql}' for duration, sql in queries),
+        )
+
+
+class ReadReplicaMiddleware:
+    """
+    Cho truy vấn đọc của các endpoint chỉ đọc đi qua alias 'reads' (secondary).
+    Endpoint tự khai báo bằng thuộc tính `read_replica = True` trên class view;
+    chỉ áp dụng cho GET / HEAD.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        with db_router.read_replica(False):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with db_router.read_replica(False):
+            return await self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if request.method in ('GET', 'HEAD') and getattr(view_class, 'read_replica', False):
+            db_router.use_read_replica()
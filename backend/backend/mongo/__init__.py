@@ -0,0 +1,181 @@
+"""
+Cấu hình MongoClient dùng chung cho Django (settings.DATABASES) và các script
+(connect-mongodb.py). Module này chỉ đọc biến môi trường và không import Django,
+nên settings.py import được.
+"""
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from decouple import Csv, config
+from pymongo import monitoring
+
+
+def client_options():
+    """
+    Tham số cho MongoClient lấy từ biến môi trường. Giá trị ở đây đè lên option
+    cùng tên trong MONGO_URI; để trống một biến thì dùng mặc định của pymongo / URI.
+    """
+    options = {
+        'appname': config('MONGO_APPNAME', default='aiko-backend'),
+        # Kích thước pool là cho mỗi process (mỗi worker gunicorn / uvicorn có pool riêng)
+        'maxPoolSize': config('MONGO_MAX_POOL_SIZE', default=100, cast=int),
+        'minPoolSize': config('MONGO_MIN_POOL_SIZE', default=0, cast=int),
+        'maxIdleTimeMS': config('MONGO_MAX_IDLE_TIME_MS', default=None, cast=_optional_int),
+        'waitQueueTimeoutMS': config('MONGO_WAIT_QUEUE_TIMEOUT_MS', default=None, cast=_optional_int),
+        # Mặc định của pymongo là 30 giây: quá lâu để một request chờ khi cluster mất primary
+        'serverSelectionTimeoutMS': config('MONGO_SERVER_SELECTION_TIMEOUT_MS', default=5000, cast=int),
+        'connectTimeoutMS': config('MONGO_CONNECT_TIMEOUT_MS', default=10000, cast=int),
+        'socketTimeoutMS': config('MONGO_SOCKET_TIMEOUT_MS', default=None, cast=_optional_int),
+        'retryWrites': config('MONGO_RETRY_WRITES', default=True, cast=bool),
+    }
+    # zstd / snappy cần cài thêm zstandard / python-snappy; server chọn cái đầu tiên nó hỗ trợ
+    compressors = config('MONGO_COMPRESSORS', default='', cast=Csv())
+    if compressors:
+        options['compressors'] = compressors
+        options['zlibCompressionLevel'] = config('MONGO_ZLIB_LEVEL', default=-1, cast=int)
+    return {name: value for name, value in options.items() if value is not None}
+
+
+def _optional_int(value):
+    return int(value) if value not in (None, '') else None
+
+
+def databases():
+    """
+    settings.DATABASES: 'default' cho mọi truy vấn, và 'reads' (cùng database,
+    client riêng đọc từ secondary) khi đặt MONGO_READ_PREFERENCE. backend.db_router
+    chỉ chuyển sang 'reads' các truy vấn đọc của endpoint chỉ đọc.
+    """
+    client = dict(client_options(), host=config('MONGO_URI'), event_listeners=[pool_listener, command_capture])
+    default = {
+        'ENGINE': 'backend.mongo',
+        'NAME': config('MONGO_DB'),
+        'CLIENT': client,
+        # None: giữ kết nối giữa các request; số giây: mở lại client sau bấy nhiêu giây
+        'CONN_MAX_AGE': config('MONGO_CONN_MAX_AGE', default=None, cast=_optional_int),
+    }
+    result = {'default': default}
+    read_preference = config('MONGO_READ_PREFERENCE', default='')
+    if read_preference:
+        reads_client = dict(client, readPreference=read_preference)
+        max_staleness = config('MONGO_MAX_STALENESS_SECONDS', default=None, cast=_optional_int)
+        if max_staleness is not None:
+            reads_client['maxStalenessSeconds'] = max_staleness
+        # Khi test, 'reads' dùng chung kết nối của 'default' thay vì tạo database test riêng
+        result['reads'] = dict(default, CLIENT=reads_client, TEST={'MIRROR': 'default'})
+    return result
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """
+    Đếm kết nối của pool theo từng server: đang mở, đang được dùng, số lần phải
+    chờ / chờ quá hạn khi lấy kết nối, số lần pool bị xoá (server lỗi).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._stats = defaultdict(lambda: {
+            'open': 0, 'in_use': 0, 'created': 0, 'closed': 0, 'checkouts': 0,
+            'checkout_failures': 0, 'checkout_wait_max_ms': 0.0, 'checkout_wait_total_ms': 0.0, 'cleared': 0,
+        })
+
+    def _update(self, address, **changes):
+        key = '%s:%s' % address
+        with self._lock:
+            stats = self._stats[key]
+            for name, value in changes.items():
+                stats[name] += value
+
+    def _waited_ms(self):
+        start = getattr(self._local, 'checkout_start', None)
+        self._local.checkout_start = None
+        return (time.perf_counter() - start) * 1000 if start is not None else 0.0
+
+    def pool_created(self, event):
+        self._update(event.address)
+
+    def pool_cleared(self, event):
+        self._update(event.address, cleared=1)
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._update(event.address, open=1, created=1)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._update(event.address, open=-1, closed=1)
+
+    def connection_check_out_started(self, event):
+        self._local.checkout_start = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._waited_ms()
+        self._update(event.address, checkout_failures=1)
+
+    def connection_checked_out(self, event):
+        waited = self._waited_ms()
+        key = '%s:%s' % event.address
+        with self._lock:
+            stats = self._stats[key]
+            stats['in_use'] += 1
+            stats['checkouts'] += 1
+            stats['checkout_wait_total_ms'] += waited
+            stats['checkout_wait_max_ms'] = max(stats['checkout_wait_max_ms'], waited)
+
+    def connection_checked_in(self, event):
+        self._update(event.address, in_use=-1)
+
+    def snapshot(self):
+        with self._lock:
+            return {address: dict(stats) for address, stats in self._stats.items()}
+
+
+pool_listener = PoolStatsListener()
+
+
+def pool_stats():
+    """Số liệu pool của process hiện tại, theo server"""
+    return pool_listener.snapshot()
+
+
+class CommandCapture(monitoring.CommandListener):
+    """
+    Ghi lại các lệnh đọc mà djongo gửi tới MongoDB trong khối `capture()` của
+    thread hiện tại (dùng để explain truy vấn thật, xem lệnh sync_mongo_indexes).
+    Ngoài khối đó listener không làm gì.
+    """
+
+    READ_COMMANDS = ('find', 'aggregate', 'count', 'distinct')
+    SESSION_FIELDS = ('lsid', '$db', '$clusterTime', '$readPreference', 'txnNumber')
+
+    def __init__(self):
+        self._local = threading.local()
+
+    @contextmanager
+    def capture(self):
+        commands = self._local.commands = []
+        try:
+            yield commands
+        finally:
+            self._local.commands = None
+
+    def started(self, event):
+        commands = getattr(self._local, 'commands', None)
+        if commands is not None and event.command_name in self.READ_COMMANDS:
+            command = {key: value for key, value in event.command.items() if key not in self.SESSION_FIELDS}
+            commands.append((event.database_name, command))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+command_capture = CommandCapture()
@@ -0,0 +1,44 @@
+import threading
+from collections import OrderedDict
+from djongo.base import DatabaseWrapper as DjongoDatabaseWrapper, DjongoClient
+from pymongo import MongoClient
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(alias, params):
+    """Một MongoClient cho mỗi alias trong mỗi process; mọi thread dùng chung pool của nó"""
+    client = _clients.get(alias)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(alias)
+            if client is None:
+                client = _clients[alias] = MongoClient(connect=False, document_class=OrderedDict, **params)
+    return client
+
+
+class DatabaseWrapper(DjongoDatabaseWrapper):
+    """
+    djongo với vòng đời client phù hợp cho pool:
+
+    - djongo cache MongoClient theo tên database, nên 'default' và 'reads' (cùng
+      database, read preference khác) sẽ dùng chung một client. Ở đây client
+      được cache theo alias.
+    - djongo đóng MongoClient mỗi khi Django đóng kết nối (cuối mỗi request nếu
+      CONN_MAX_AGE = 0) dù client được dùng chung giữa các thread, làm mọi thread
+      phải mở lại socket. Ở đây đóng kết nối chỉ bỏ tham chiếu; socket rảnh do
+      pool của pymongo tự dọn theo maxIdleTimeMS.
+    """
+
+    def get_new_connection(self, connection_params):
+        name = connection_params.pop('name')
+        enforce_schema = connection_params.pop('enforce_schema')
+        self.client_connection = get_client(self.alias, connection_params)
+        database = self.client_connection[name]
+        self.djongo_connection = DjongoClient(database, enforce_schema)
+        return database
+
+    def _close(self):
+        self.client_connection = None
+        self.djongo_connection = None
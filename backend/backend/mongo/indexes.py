@@ -0,0 +1,164 @@
+"""
+Đồng bộ index khai báo trong model sang MongoDB.
+
+djongo chỉ tạo index qua migration bằng cách dịch câu SQL, và bỏ mất thông tin:
+field giảm dần ('-date_update') thành tên field sai, điều kiện của partial index
+bị bỏ qua, migration đã chạy trước khi thêm index thì không bao giờ tạo lại.
+Ở đây index được suy ra trực tiếp từ model (primary key, unique, db_index,
+unique_together, UniqueConstraint, Meta.indexes) và so với index thật của
+từng collection theo khoá (field + chiều + unique), không theo tên.
+"""
+from collections import namedtuple
+from django.apps import apps
+from django.db import models
+from pymongo.errors import OperationFailure
+from . import command_capture
+
+IndexSpec = namedtuple('IndexSpec', 'name keys unique')
+IndexPlan = namedtuple('IndexPlan', 'collection missing replaced undeclared')
+
+# Index cho model của app bên thứ ba (không sửa được Meta): CheckEmailView lọc theo email
+EXTRA_INDEXES = {
+    'auth.User': [models.Index(fields=['email'], name='auth_user_email_idx')],
+}
+# Index do MongoDB / djongo tự tạo, không bao giờ xoá
+PROTECTED_INDEXES = {'_id_', '__primary_key__'}
+
+
+def _keys(model, field_names):
+    keys = []
+    for name in field_names:
+        field = model._meta.get_field(name.lstrip('-'))
+        keys.append((field.column, -1 if name.startswith('-') else 1))
+    return tuple(keys)
+
+
+def _name(table, keys, suffix):
+    return '_'.join([table] + [column for column, _ in keys] + [suffix])
+
+
+def declared_indexes(model):
+    """Các index model cần có; index thường là tiền tố của index khác thì bỏ (index dài hơn đã phục vụ được)"""
+    opts = model._meta
+    specs = []
+    for field in opts.local_fields:
+        keys = ((field.column, 1),)
+        if field.primary_key:
+            specs.append(IndexSpec('__primary_key__', keys, True))
+        elif field.unique:
+            specs.append(IndexSpec(_name(opts.db_table, keys, 'uniq'), keys, True))
+        elif field.db_index:
+            specs.append(IndexSpec(_name(opts.db_table, keys, 'idx'), keys, False))
+    for field_names in opts.unique_together:
+        keys = _keys(model, field_names)
+        specs.append(IndexSpec(_name(opts.db_table, keys, 'uniq'), keys, True))
+    for constraint in opts.constraints:
+        if isinstance(constraint, models.UniqueConstraint) and constraint.condition is None:
+            specs.append(IndexSpec(constraint.name, _keys(model, constraint.fields), True))
+    for index in list(opts.indexes) + EXTRA_INDEXES.get(opts.label, []):
+        specs.append(IndexSpec(index.name, _keys(model, index.fields), False))
+
+    result = []
+    for spec in specs:
+        covered = any(
+            other.keys[:len(spec.keys)] == spec.keys and (len(other.keys) > len(spec.keys) or other.unique)
+            for other in specs if other is not spec
+        )
+        duplicate = any(other.keys == spec.keys and other.unique == spec.unique for other in result)
+        if not duplicate and (spec.unique or not covered):
+            result.append(spec)
+    return result
+
+
+def synced_models():
+    return [
+        model for model in apps.get_models(include_auto_created=True)
+        if model._meta.managed and not model._meta.proxy
+    ]
+
+
+def index_plan(database, model):
+    """So index khai báo với index thật của collection"""
+    collection = model._meta.db_table
+    existing = {
+        name: (tuple((column, int(direction)) for column, direction in info['key']), bool(info.get('unique')))
+        for name, info in database[collection].index_information().items()
+    }
+    declared = declared_indexes(model)
+    existing_keys = set(existing.values())
+    declared_keys = {(spec.keys, spec.unique) for spec in declared}
+    missing = [spec for spec in declared if (spec.keys, spec.unique) not in existing_keys]
+    missing_names = {spec.name for spec in missing}
+    # Index trùng tên nhưng khác khoá (vd. do djongo tạo sai) phải xoá trước khi tạo lại
+    replaced = [name for name in existing if name in missing_names]
+    undeclared = [
+        name for name, key in existing.items()
+        if key not in declared_keys and name not in missing_names and name not in PROTECTED_INDEXES
+    ]
+    return IndexPlan(collection, missing, replaced, undeclared)
+
+
+def apply_plan(database, plan, drop_undeclared=False):
+    """Tạo index còn thiếu (và xoá index thừa nếu được yêu cầu); trả về danh sách lỗi"""
+    collection = database[plan.collection]
+    errors = []
+    for name in plan.replaced + (plan.undeclared if drop_undeclared else []):
+        collection.drop_index(name)
+    for spec in plan.missing:
+        try:
+            collection.create_index(list(spec.keys), name=spec.name, unique=spec.unique, background=True)
+        except OperationFailure as error:
+            # Thường do dữ liệu trùng khi tạo index unique
+            errors.append(f'{plan.collection}.{spec.name}: {error}')
+    return errors
+
+
+def explain_queries(database, run):
+    """
+    Chạy `run()` (truy vấn ORM thật), ghi lại các lệnh đọc djongo gửi đi rồi explain
+    từng lệnh: trả về [(collection, các stage của winning plan, index dùng, số document
+    đã quét, số document trả về)].
+    """
+    with command_capture.capture() as commands:
+        run()
+    reports = []
+    for database_name, command in commands:
+        command_name = next(iter(command))
+        result = database.client[database_name].command('explain', command, verbosity='executionStats')
+        stages, index_names = [], []
+        for plan in _find_all(result, 'winningPlan'):
+            _collect_stages(plan, stages, index_names)
+        stats = next(iter(_find_all(result, 'executionStats')), {})
+        reports.append({
+            'collection': command[command_name],
+            'command': command_name,
+            'stages': stages,
+            'indexes': index_names,
+            'docs_examined': stats.get('totalDocsExamined'),
+            'returned': stats.get('nReturned'),
+        })
+    return reports
+
+
+def _find_all(value, key):
+    """Mọi giá trị của `key` ở bất kỳ độ sâu nào (vị trí plan khác nhau giữa find / aggregate và giữa các bản MongoDB)"""
+    if isinstance(value, dict):
+        for name, item in value.items():
+            if name == key:
+                yield item
+            else:
+                yield from _find_all(item, key)
+    elif isinstance(value, list):
+        for item in value:
+            yield from _find_all(item, key)
+
+
+def _collect_stages(plan, stages, index_names):
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        stages.append(plan['stage'])
+    if 'indexName' in plan:
+        index_names.append(plan['indexName'])
+    for child in [plan.get('inputStage')] + plan.get('inputStages', []):
+        _collect_stages(child, stages, index_names)
@@ -0,0 +1,105 @@
+import base64
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class _CursorEncoder(DjangoJSONEncoder):
+    """Giữ đủ micro giây: DjangoJSONEncoder cắt datetime xuống mili giây, làm trượt / lặp dòng ở ranh giới trang"""
+
+    def default(self, o):
+        if isinstance(o, (datetime.datetime, datetime.time)):
+            return o.isoformat()
+        return super().default(o)
+
+
+class KeysetPagination(BasePagination):
+    """
+    Phân trang keyset (cursor) theo một bộ cột sắp xếp.
+
+    Thay vì OFFSET, mỗi trang lọc `WHERE (a, b) > (cursor)` trên các cột đã
+    sắp xếp nên chi phí một trang chỉ phụ thuộc vào kích thước trang. Cột cuối
+    cùng của `ordering` phải là duy nhất (thường là `id`) để thứ tự ổn định.
+    """
+    ordering = ('-id',)
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = tuple(self.get_ordering(request, queryset, view))
+        fields = [queryset.model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        self.position = self.decode_cursor(request, fields)
+
+        queryset = queryset.order_by(*(
+            ('-' if name.startswith('-') else '') + field.attname
+            for name, field in zip(self.ordering, fields)
+        ))
+        if self.position is not None:
+            queryset = queryset.filter(self._after_position(fields))
+
+        page_size = self.get_page_size(request)
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        self.page = rows[:page_size]
+        self.next_position = None
+        if self.has_next:
+            self.next_position = [getattr(self.page[-1], field.attname) for field in fields]
+        return self.page
+
+    def _after_position(self, fields):
+        # (a > x) OR (a = x AND b > y) OR ... với chiều so sánh theo từng cột
+        condition = Q()
+        for index, field in enumerate(fields):
+            term = Q(**{name: value for name, value in zip(
+                (f.attname for f in fields[:index]), self.position[:index])})
+            lookup = 'lt' if self.ordering[index].startswith('-') else 'gt'
+            term &= Q(**{f'{field.attname}__{lookup}': self.position[index]})
+            condition |= term
+        return condition
+
+    def encode_cursor(self, position):
+        raw = json.dumps(position, cls=_CursorEncoder, separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+    def decode_cursor(self, request, fields):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            if len(values) != len(fields):
+                raise ValueError
+            return [field.to_python(value) for field, value in zip(fields, values)]
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
@@ -0,0 +1,146 @@
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+
+def _unwrap(field):
+    """Trả về serializer con nếu field là ListSerializer / ManyRelatedField"""
+    if isinstance(field, serializers.ListSerializer):
+        return field.child
+    if isinstance(field, serializers.ManyRelatedField):
+        return field.child_relation
+    return field
+
+
+def _relations(model):
+    """Map tên accessor (vd. 'teammember_set', 'volumes') sang field quan hệ của model"""
+    relations = {}
+    for field in model._meta.get_fields():
+        if not field.is_relation:
+            continue
+        if field.auto_created and not field.concrete:
+            relations[field.get_accessor_name()] = field
+        else:
+            relations[field.name] = field
+    return relations
+
+
+def _columns(model):
+    return {field.name for field in model._meta.concrete_fields}
+
+
+def _is_single(relation):
+    # Quan hệ xuôi FK / OneToOne -> có thể join bằng select_related
+    return relation.concrete and (relation.many_to_one or relation.one_to_one)
+
+
+def _needs_object(field):
+    """PrimaryKeyRelatedField chỉ đọc cột *_id nên không cần load object liên kết"""
+    field = _unwrap(field)
+    if isinstance(field, serializers.RelatedField):
+        return not field.use_pk_only_optimization()
+    return True
+
+
+class QueryPlan:
+    """
+    Cây select_related / prefetch_related suy ra từ một serializer.
+
+    `columns` là các cột cần load của model gốc (dùng cho `.only()`),
+    `select` là các đường dẫn select_related, `prefetch` là danh sách
+    Prefetch cho các quan hệ nhiều - nhiều hoặc ngược.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.columns = {model._meta.pk.name}
+        self.select = set()
+        self.prefetch = {}
+
+    def apply(self, queryset, restrict_columns=False):
+        if restrict_columns:
+            queryset = queryset.only(*sorted(self.columns))
+        if self.select:
+            queryset = queryset.select_related(*sorted(self.select))
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch.values())
+        return queryset
+
+
+def build_query_plan(serializer, model=None):
+    """
+    Duyệt đồ thị field của serializer để lập kế hoạch truy vấn.
+
+    Mỗi quan hệ nhiều được load bằng đúng một truy vấn Prefetch (đã giới hạn
+    cột bằng `.only()`), nên số truy vấn chỉ phụ thuộc vào hình dạng của
+    serializer chứ không phụ thuộc vào số dòng dữ liệu.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    serializer = _unwrap(serializer)
+    model = model or serializer.Meta.model
+    plan = QueryPlan(model)
+    _plan_fields(plan, serializer, model, prefix='')
+    return plan
+
+
+def _plan_fields(plan, serializer, model, prefix):
+    for field in serializer.fields.values():
+        if getattr(field, 'write_only', False):
+            continue
+        source_attrs = getattr(field, 'source_attrs', None)
+        if not source_attrs:
+            # source='*' hoặc SerializerMethodField: không suy ra được gì thêm
+            continue
+        _plan_path(plan, field, model, source_attrs, prefix)
+
+
+def _plan_path(plan, field, model, source_attrs, prefix):
+    current = model
+    path = prefix
+    for index, attr in enumerate(source_attrs):
+        relation = _relations(current).get(attr)
+        is_last = index == len(source_attrs) - 1
+        if relation is None:
+            # Cột thường của model hiện tại (bỏ qua property / method)
+            if not path and attr in _columns(current):
+                plan.columns.add(attr)
+            return
+
+        if not path:
+            plan.columns.add(relation.name if _is_single(relation) else current._meta.pk.name)
+
+        if is_last and not _needs_object(field):
+            return
+
+        related_model = relation.related_model
+        lookup = f'{path}__{attr}' if path else attr
+
+        if _is_single(relation):
+            plan.select.add(lookup)
+            path = lookup
+            current = related_model
+            if is_last:
+                child = _unwrap(field)
+                if isinstance(child, serializers.BaseSerializer):
+                    _plan_fields(plan, child, related_model, path)
+            continue
+
+        # Quan hệ nhiều: lập kế hoạch riêng cho model đích rồi gói vào Prefetch
+        child = _unwrap(field)
+        child_plan = QueryPlan(related_model)
+        if is_last and isinstance(child, serializers.BaseSerializer):
+            _plan_fields(child_plan, child, related_model, prefix='')
+        elif not is_last:
+            _plan_path(child_plan, field, related_model, source_attrs[index + 1:], prefix='')
+        if relation.one_to_many:
+            # Django cần cột FK ngược để ghép kết quả prefetch vào object cha
+            child_plan.columns.add(relation.field.name)
+        queryset = child_plan.apply(related_model._default_manager.all(), restrict_columns=True)
+        plan.prefetch[lookup] = Prefetch(lookup, queryset=queryset)
+        return
+
+
+def plan_queryset(queryset, serializer):
+    """Áp dụng kế hoạch truy vấn của `serializer` lên `queryset`"""
+    plan = build_query_plan(serializer, queryset.model)
+    return plan.apply(queryset)
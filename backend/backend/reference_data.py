@@ -0,0 +1,144 @@
+import hashlib
+import threading
+import time
+import uuid
+from collections import namedtuple
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from rest_framework import serializers
+from rest_framework.response import Response
+
+# Các process khác nhận ra bảng đã đổi sau tối đa bấy nhiêu giây
+CHECK_INTERVAL = getattr(settings, 'REFERENCE_DATA_CHECK_INTERVAL', 5)
+
+Snapshot = namedtuple('Snapshot', 'version rows by_pk by_key')
+
+
+class ReferenceTable:
+    """
+    Bảng tra cứu nhỏ, gần như không đổi (trạng thái truyện, thể loại, vai trò...)
+    được nạp một lần vào RAM của process.
+
+    Khi một dòng đổi, signal gọi `invalidate()`: process hiện tại nạp lại ở lần
+    đọc sau, các process khác nhận ra nhờ số phiên bản trong cache dùng chung
+    (kiểm tra tối đa mỗi CHECK_INTERVAL giây). Các instance trả về được dùng
+    chung giữa các request: chỉ đọc, không sửa.
+    """
+
+    def __init__(self, model_label, keys=(), ordering=('pk',)):
+        self.model_label = model_label
+        self.keys = keys
+        self.ordering = ordering
+        self.version_key = f'reference-data:{model_label}'
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def __deepcopy__(self, memo):
+        # Bảng dùng chung cho cả process; serializer field của DRF deepcopy tham số khởi tạo
+        return self
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def _shared_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def _load(self):
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < CHECK_INTERVAL:
+            return snapshot
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._checked_at < CHECK_INTERVAL:
+                return snapshot
+            version = self._shared_version()
+            if snapshot is None or snapshot.version != version:
+                rows = list(self.model._default_manager.order_by(*self.ordering))
+                snapshot = self._snapshot = Snapshot(
+                    version,
+                    rows,
+                    {row.pk: row for row in rows},
+                    {key: {getattr(row, key): row for row in rows} for key in self.keys},
+                )
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    @property
+    def version(self):
+        return self._load().version
+
+    def all(self):
+        return self._load().rows
+
+    def get(self, pk):
+        return self._load().by_pk.get(pk)
+
+    def get_by(self, key, value):
+        return self._load().by_key[key].get(value)
+
+    def invalidate(self):
+        """
+        Gọi từ signal khi bảng đổi. Đổi phiên bản ngay (process này không đọc
+        bản cũ nữa) và một lần nữa sau commit, vì bản nạp lại trong lúc
+        transaction chưa commit có thể đã được thread khác đọc bằng dữ liệu cũ.
+        """
+        self._bump()
+        transaction.on_commit(self._bump)
+
+    def _bump(self):
+        cache.set(self.version_key, uuid.uuid4().hex, None)
+        self._snapshot = None
+
+
+book_statuses = ReferenceTable('book.BookStatus', keys=('code',))
+categories = ReferenceTable('book.Category')
+roles = ReferenceTable('contributors.Role', keys=('name',))
+team_types = ReferenceTable('contributors.TeamType')
+
+
+def reference_response(request, table, serializer_class, rows, variant=''):
+    """
+    Danh sách lấy từ bảng tham chiếu, kèm ETag theo phiên bản bảng (và `variant`
+    nếu nội dung còn phụ thuộc user / tham số); 304 nếu client đã có bản này.
+    """
+    digest = hashlib.sha1(f'{table.version}:{variant}'.encode()).hexdigest()[:20]
+    etag = f'"{digest}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = Response(serializer_class(rows, many=True).data)
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+class ReferenceRelatedField(serializers.PrimaryKeyRelatedField):
+    """PrimaryKeyRelatedField tra id trong bảng tham chiếu thay vì query từng id"""
+
+    def __init__(self, table, **kwargs):
+        self.table = table
+        super().__init__(**kwargs)
+
+    def get_queryset(self):
+        return self.table.model._default_manager.all()
+
+    def to_internal_value(self, data):
+        try:
+            if isinstance(data, bool):
+                raise TypeError
+            pk = self.table.model._meta.pk.to_python(data)
+        except (TypeError, ValueError, ValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        row = self.table.get(pk)
+        if row is None:
+            self.fail('does_not_exist', pk_value=data)
+        return row
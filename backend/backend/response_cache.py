@@ -0,0 +1,97 @@
+import functools
+import hashlib
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+CACHE_ALIAS = getattr(settings, 'RESPONSE_CACHE_ALIAS', 'default')
+# Chỉ là lưới an toàn: entry bị loại bỏ qua tag ngay khi dữ liệu đổi
+CACHE_TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _tag_key(tag):
+    return f'response-tag:{tag}'
+
+
+def _entry_key(request, vary_on_user):
+    """Khoá theo method + URL (query đã sắp xếp) và trạng thái đăng nhập nếu cần"""
+    query = '&'.join(f'{key}={value}' for key, values in sorted(request.GET.lists()) for value in sorted(values))
+    user = request.user
+    audience = f'user:{user.pk}' if vary_on_user and user.is_authenticated else 'public'
+    raw = f'{request.method}:{request.path}?{query}:{audience}'
+    return 'response:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def _tag_versions(tags, create=False):
+    """Token hiện tại của từng tag; tạo token mới cho tag chưa có khi `create`"""
+    cache = _cache()
+    keys = {tag: _tag_key(tag) for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {tag: found.get(key) for tag, key in keys.items()}
+    if create:
+        for tag, version in versions.items():
+            if version is None:
+                token = uuid.uuid4().hex
+                # add() không ghi đè token của process khác vừa tạo cùng lúc
+                if not cache.add(keys[tag], token, None):
+                    token = cache.get(keys[tag])
+                versions[tag] = token
+    return versions
+
+
+def invalidate_tags(*tags):
+    """
+    Loại bỏ mọi response gắn với các tag này. Chạy sau khi transaction commit
+    để request song song không kịp cache lại dữ liệu cũ trước khi commit.
+    """
+    tags = [tag for tag in tags if tag]
+    if not tags:
+        return
+    transaction.on_commit(lambda: _cache().delete_many([_tag_key(tag) for tag in tags]))
+
+
+def lookup(request, vary_on_user=False):
+    """`response.data` đã cache cho request này nếu còn hợp lệ, ngược lại None"""
+    entry = _cache().get(_entry_key(request, vary_on_user))
+    if entry is not None and _tag_versions(entry['tags']) == entry['tags']:
+        return entry['data']
+    return None
+
+
+def cache_response(tags, key_tags=None, vary_on_user=False, timeout=None):
+    """
+    Cache `response.data` của một method GET trong APIView.
+
+    `tags(request, data, **kwargs)` trả về các tag mà dữ liệu trong response phụ
+    thuộc vào (ví dụ 'book:12'). Mỗi entry lưu token của các tag lúc ghi; lần đọc
+    sau so với token hiện tại, khác nhau nghĩa là dữ liệu đã đổi. Token của các
+    tag biết trước từ URL (`key_tags(request, **kwargs)`) được chụp trước khi
+    đọc database, nên thay đổi xảy ra trong lúc build response không bị cache
+    nhầm. Chỉ cache response 200; dữ liệu được render lại theo Accept của từng request.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            data = lookup(request, vary_on_user)
+            if data is not None:
+                response = Response(data, status=status.HTTP_200_OK)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            before = _tag_versions(key_tags(request, **kwargs), create=True) if key_tags else {}
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK and getattr(response, 'data', None) is not None:
+                versions = _tag_versions(set(tags(request, response.data, **kwargs)) | set(before), create=True)
+                if all(versions[tag] == version for tag, version in before.items()):
+                    _cache().set(_entry_key(request, vary_on_user), {'tags': versions, 'data': response.data}, timeout or CACHE_TIMEOUT)
+                response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
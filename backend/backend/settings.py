@@ -12,7 +12,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 
 import os
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
+from backend import mongo
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -48,9 +49,11 @@ INSTALLED_APPS = [
     'user',
     'book',
     'contributors',
+    'images',
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -59,10 +62,14 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'backend.middleware.ReadReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
 
+# Buffer write-behind chỉ ghi khi test gọi flush_all() và bị bỏ trước khi xoá database test
+TEST_RUNNER = 'backend.test_runner.TestRunner'
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -84,15 +91,11 @@ WSGI_APPLICATION = 'backend.wsgi.application'
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
-DATABASES = {
-    'default': {
-        'ENGINE': 'djongo',
-        'NAME': config('MONGO_DB'), 
-        'CLIENT': {
-            'host': config('MONGO_URI'), 
-        }
-    }
-}
+# djongo với một MongoClient (và pool) cho mỗi alias trong mỗi process; các option
+# pool / timeout / nén / read preference lấy từ biến MONGO_* (xem backend/mongo).
+# MONGO_READ_PREFERENCE (vd. secondaryPreferred) thêm alias 'reads' cho các endpoint chỉ đọc
+DATABASES = mongo.databases()
+DATABASE_ROUTERS = ['backend.db_router.ReadReplicaRouter']
 
 
 #CORS setup
@@ -144,7 +147,7 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # Rest framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'user.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PARSER_CLASSES': (
             'rest_framework.parsers.JSONParser',
@@ -171,6 +174,100 @@ CKEDITOR_CONFIGS = {
     }
 }
 
+# Profiling / metrics settings
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=500, cast=int)
+# /metrics/ và chi tiết /health/ chỉ dành cho staff (JWT) và các IP liệt kê ở đây (cách nhau bởi dấu phẩy).
+# Mặc định rỗng: sau reverse proxy cùng máy mọi request đều có REMOTE_ADDR là 127.0.0.1
+METRICS_ALLOWED_IPS = config('METRICS_ALLOWED_IPS', default='', cast=Csv())
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'backend': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+# Image upload settings
+# Ảnh được lưu tạm rồi xử lý nền: biến thể lưu ở MEDIA_ROOT/images, chỉ biến thể chính được upload
+# lên image host; dùng backend.image_hosts.upload_image_to_local để chạy offline
+IMAGE_UPLOADER = config('IMAGE_UPLOADER', default='backend.imgur_utils.upload_image_to_imgur')
+IMAGE_UPLOAD_ASYNC = config('IMAGE_UPLOAD_ASYNC', default=True, cast=bool)
+IMAGE_UPLOAD_WORKERS = config('IMAGE_UPLOAD_WORKERS', default=4, cast=int)
+IMAGE_UPLOAD_MAX_RETRIES = config('IMAGE_UPLOAD_MAX_RETRIES', default=4, cast=int)
+IMAGE_UPLOAD_BACKOFF = config('IMAGE_UPLOAD_BACKOFF', default=1.0, cast=float)
+# Giới hạn ảnh đầu vào và các định dạng biến thể được tạo (thêm avif nếu muốn)
+IMAGE_MAX_BYTES = config('IMAGE_MAX_BYTES', default=20 * 1024 * 1024, cast=int)
+IMAGE_MAX_DIMENSION = config('IMAGE_MAX_DIMENSION', default=8000, cast=int)
+# Ảnh base64 được giải mã vào RAM tới ngưỡng này, phần còn lại ghi ra file tạm
+IMAGE_SPOOL_MAX_MEMORY = config('IMAGE_SPOOL_MAX_MEMORY', default=1024 * 1024, cast=int)
+IMAGE_VARIANT_FORMATS = config('IMAGE_VARIANT_FORMATS', default='webp,jpeg', cast=lambda value: tuple(value.split(',')))
+
+# Ảnh mặc định khi sách / tập / người dùng chưa có ảnh
+DEFAULT_COVER_URL = 'https://i.imgur.com/OJbZSFy.jpeg'
+DEFAULT_AVATAR_URL = 'https://i.imgur.com/default-avatar.jpg'
+
+# Cache settings
+# Dạng URL: locmem://<tên>, file:///đường/dẫn hoặc redis://host:port/db (cần django-redis).
+# locmem chỉ dùng được khi chạy một process; nhiều worker cần file hoặc redis để
+# việc xoá cache ở worker này có hiệu lực với các worker khác.
+def cache_from_url(url):
+    scheme, _, location = url.partition('://')
+    if scheme == 'file':
+        return {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache', 'LOCATION': location}
+    if scheme in ('redis', 'rediss'):
+        return {'BACKEND': 'django_redis.cache.RedisCache', 'LOCATION': url}
+    return {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': location or scheme}
+
+CACHES = {
+    'default': cache_from_url(config('CACHE_URL', default='locmem://default')),
+    'responses': cache_from_url(config('RESPONSE_CACHE_URL', default='locmem://responses')),
+}
+# Response của các API công khai; entry bị xoá theo tag khi dữ liệu đổi, TTL chỉ là lưới an toàn
+RESPONSE_CACHE_ALIAS = 'responses'
+RESPONSE_CACHE_TIMEOUT = config('RESPONSE_CACHE_TIMEOUT', default=60 * 60 * 24, cast=int)
+
+# Authentication settings
+# request.user được dựng từ claim của JWT; kết quả kiểm tra token bị thu hồi
+# (denylist trong cache 'default') được nhớ trong process bấy nhiêu giây
+AUTH_LOCAL_CACHE_TTL = config('AUTH_LOCAL_CACHE_TTL', default=30, cast=int)
+
+# Reference data settings
+# Trạng thái truyện, thể loại, vai trò, loại nhóm được nạp vào RAM; process khác
+# thấy thay đổi sau tối đa bấy nhiêu giây (phiên bản lưu trong cache 'default')
+REFERENCE_DATA_CHECK_INTERVAL = config('REFERENCE_DATA_CHECK_INTERVAL', default=5, cast=int)
+
+# Async settings
+# Các API đọc nóng (chi tiết truyện, mục lục, đọc chương, hồ sơ user) chạy dạng async:
+# trúng cache thì chỉ chiếm thread trong lúc đọc cache, trượt thì cả view chạy trong thread pool.
+# backend/asgi.py bật mặc định; dưới WSGI nên để tắt
+ASYNC_VIEWS = config('ASYNC_VIEWS', default=False, cast=bool)
+
+# Reading progress settings
+# Vị trí đọc được gom trong RAM và ghi theo lô mỗi bấy nhiêu giây (0: ghi ngay);
+# ghi sớm hơn khi số cặp user / truyện đang chờ chạm ngưỡng
+READING_PROGRESS_FLUSH_INTERVAL = config('READING_PROGRESS_FLUSH_INTERVAL', default=5.0, cast=float)
+READING_PROGRESS_MAX_PENDING = config('READING_PROGRESS_MAX_PENDING', default=10000, cast=int)
+
+# View counter / trending settings
+# Lượt xem được đếm trong RAM và cộng dồn xuống database mỗi bấy nhiêu giây (0: ghi ngay);
+# bảng xếp hạng thịnh hành được tính lại sau mỗi TRENDING_REFRESH_INTERVAL giây (0: chỉ chạy bằng lệnh compute_trending)
+VIEW_COUNTER_FLUSH_INTERVAL = config('VIEW_COUNTER_FLUSH_INTERVAL', default=10.0, cast=float)
+TRENDING_REFRESH_INTERVAL = config('TRENDING_REFRESH_INTERVAL', default=10 * 60, cast=int)
+TRENDING_SIZE = config('TRENDING_SIZE', default=100, cast=int)
+
+# Search settings
+# Đánh chỉ mục cả nội dung chương (tốn dung lượng, tắt mặc định)
+SEARCH_INDEX_CHAPTERS = config('SEARCH_INDEX_CHAPTERS', default=False, cast=bool)
+
 # Medie UI settings
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
\ No newline at end of file
@@ -0,0 +1,18 @@
+from django.test.runner import DiscoverRunner
+from . import write_behind
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Buffer write-behind chỉ ghi khi test gọi flush_all(), và được bỏ hết trước
+    khi xoá database test: không thread nền hay lần ghi lúc thoát nào đi vào
+    database thật.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        write_behind.use_manual_flush()
+
+    def teardown_databases(self, old_config, **kwargs):
+        write_behind.discard_all()
+        super().teardown_databases(old_config, **kwargs)
@@ -0,0 +1,346 @@
+import json
+import os
+from types import SimpleNamespace
+from unittest import mock
+from asgiref.sync import async_to_sync
+from django.contrib.auth.models import AnonymousUser, User
+from django.core.cache import cache, caches
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from pymongo.errors import OperationFailure
+from book.models import Book, BookStatus, Category, Chapter, ReadingProgress, Volume
+from book.views import BookDetailView, BookTableOfContentsView, ChapterReadView, cached_book_detail, cached_chapter
+from backend import async_views, reference_data, write_behind
+from backend import mongo
+from backend.mongo import indexes
+from user.authentication import AikoRefreshToken, _users, _verdicts
+
+
+class MetricsAccessTest(TestCase):
+    """/metrics/ và chi tiết /health/ chỉ dành cho staff hoặc IP khai báo rõ"""
+
+    def setUp(self):
+        cache.clear()
+        _verdicts.clear()
+        _users.clear()
+        self.staff = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        self.reader = User.objects.create_user(username='reader', password='password123')
+
+    def bearer(self, user):
+        return {'HTTP_AUTHORIZATION': f'Bearer {AikoRefreshToken.for_user(user).access_token}'}
+
+    def test_loopback_without_token_is_forbidden(self):
+        # Test client gửi REMOTE_ADDR 127.0.0.1, giống request đi qua reverse proxy cùng máy
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 403)
+
+    def test_staff_token_is_allowed(self):
+        self.client.get(reverse('book-list'))
+        response = self.client.get(reverse('metrics'), **self.bearer(self.staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn('aiko_request_duration_seconds', response.content.decode())
+
+    def test_non_staff_token_is_forbidden(self):
+        response = self.client.get(reverse('metrics'), **self.bearer(self.reader))
+        self.assertEqual(response.status_code, 403)
+
+    def test_invalid_token_is_forbidden(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer not-a-token')
+        self.assertEqual(response.status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowlisted_ip_is_allowed(self):
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.assertEqual(self.client.get(reverse('metrics'), REMOTE_ADDR='10.0.0.6').status_code, 403)
+
+    def test_health_hides_details_from_public_requests(self):
+        response = self.client.get(reverse('health'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'status': 'ok'})
+
+        response = self.client.get(reverse('health'), **self.bearer(self.staff))
+        data = response.json()
+        self.assertEqual(data['status'], 'ok')
+        self.assertTrue(all(result['ok'] for result in data['databases'].values()))
+        self.assertIn('pools', data)
+
+
+class ReferenceDataTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reference_data.categories.invalidate()
+        self.fantasy = Category.objects.create(name='Fantasy', description='')
+
+    def test_rows_are_loaded_once(self):
+        table = reference_data.ReferenceTable('book.Category', keys=('name',))
+        with self.assertNumQueries(1):
+            self.assertEqual(table.get(self.fantasy.id), self.fantasy)
+            self.assertEqual(table.get_by('name', 'Fantasy').id, self.fantasy.id)
+            self.assertEqual([category.name for category in table.all()], ['Fantasy'])
+
+    def test_saving_a_row_bumps_the_version(self):
+        version = reference_data.categories.version
+        romance = Category.objects.create(name='Romance', description='')
+        self.assertNotEqual(reference_data.categories.version, version)
+        self.assertEqual(reference_data.categories.get(romance.id).name, 'Romance')
+        romance_id = romance.id
+        romance.delete()
+        self.assertIsNone(reference_data.categories.get(romance_id))
+
+    def test_other_processes_notice_changes_after_check_interval(self):
+        table = reference_data.ReferenceTable('book.Category')
+        with mock.patch.object(reference_data, 'time') as clock:
+            clock.monotonic.return_value = 1000.0
+            self.assertEqual(len(table.all()), 1)
+            # Process khác thêm dòng (không qua signal của process này) rồi đổi phiên bản dùng chung
+            Category.objects.bulk_create([Category(name='Romance', description='')])
+            cache.set(table.version_key, 'changed-elsewhere', None)
+
+            clock.monotonic.return_value += reference_data.CHECK_INTERVAL - 1
+            with self.assertNumQueries(0):
+                self.assertEqual(len(table.all()), 1)
+            clock.monotonic.return_value += 2
+            self.assertEqual(table.version, 'changed-elsewhere')
+            self.assertEqual(len(table.all()), 2)
+            # Phiên bản không đổi: chỉ kiểm tra cache, không đọc lại bảng
+            clock.monotonic.return_value += reference_data.CHECK_INTERVAL + 1
+            with self.assertNumQueries(0):
+                self.assertEqual(len(table.all()), 2)
+
+    def test_etag_follows_the_table_version(self):
+        url = reverse('category-list')
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        for header in (etag, f'W/{etag}', f'"other", {etag}', '*'):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=header)
+            self.assertEqual(response.status_code, 304, header)
+            self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=f'{etag[:-1]}-old"').status_code, 200)
+        # Kết quả lọc theo ?name= có ETag riêng
+        self.assertNotEqual(self.client.get(url, {'name': 'Fantasy'})['ETag'], etag)
+
+        Category.objects.create(name='Romance', description='')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+
+class FakeCollection:
+    def __init__(self, information, failing=()):
+        self.information = information
+        self.failing = failing
+        self.dropped = []
+        self.created = []
+
+    def index_information(self):
+        return self.information
+
+    def drop_index(self, name):
+        self.dropped.append(name)
+
+    def create_index(self, keys, name, unique, background):
+        if name in self.failing:
+            raise OperationFailure('E11000 duplicate key error')
+        self.created.append((name, keys, unique))
+
+
+class MongoIndexTest(SimpleTestCase):
+    def keys(self, model):
+        return {spec.keys: spec.unique for spec in indexes.declared_indexes(model)}
+
+    def test_indexes_covered_by_a_longer_prefix_are_skipped(self):
+        # user_id là tiền tố của unique (user_id, book_id) và của index "đọc tiếp"
+        self.assertEqual(self.keys(ReadingProgress), {
+            (('id', 1),): True,
+            (('book_id', 1),): False,
+            (('chapter_id', 1),): False,
+            (('user_id', 1), ('book_id', 1)): True,
+            (('user_id', 1), ('date_update', -1)): False,
+        })
+        self.assertEqual(self.keys(Chapter), {(('id', 1),): True, (('volume_id', 1), ('number', 1)): True})
+
+    def test_descending_and_extra_indexes(self):
+        specs = {spec.name: spec for spec in indexes.declared_indexes(Book)}
+        self.assertEqual(specs['book_catalog_update_idx'].keys, (('is_deleted', 1), ('date_update', -1), ('id', -1)))
+        self.assertEqual(specs['__primary_key__'].keys, (('id', 1),))
+        self.assertIn((('email', 1),), self.keys(User))
+
+    def test_index_plan_compares_keys_not_names(self):
+        collection = FakeCollection({
+            '_id_': {'key': [('_id', 1)]},
+            '__primary_key__': {'key': [('id', 1)], 'unique': True},
+            # djongo tạo sai: chỉ còn cột đầu của unique_together
+            'book_chapter_volume_id_number_uniq': {'key': [('volume_id', 1)], 'unique': True},
+            'book_chapter_volume_id_idx': {'key': [('volume_id', 1.0)]},
+        })
+        plan = indexes.index_plan({'book_chapter': collection}, Chapter)
+        self.assertEqual(plan.collection, 'book_chapter')
+        self.assertEqual([spec.name for spec in plan.missing], ['book_chapter_volume_id_number_uniq'])
+        self.assertEqual(plan.replaced, ['book_chapter_volume_id_number_uniq'])
+        self.assertEqual(plan.undeclared, ['book_chapter_volume_id_idx'])
+
+        # Đúng khoá thì tên khác cũng coi như đã có
+        collection = FakeCollection({
+            '_id_': {'key': [('_id', 1)]},
+            '__primary_key__': {'key': [('id', 1)], 'unique': True},
+            'chapter_order': {'key': [('volume_id', 1), ('number', 1)], 'unique': True},
+        })
+        self.assertEqual(indexes.index_plan({'book_chapter': collection}, Chapter), ('book_chapter', [], [], []))
+
+    def test_apply_plan(self):
+        collection = FakeCollection({
+            '__primary_key__': {'key': [('id', 1)], 'unique': True},
+            'stale_idx': {'key': [('title', 1)]},
+        }, failing={'book_book_catalog_upload_idx', 'book_catalog_upload_idx'})
+        database = {'book_book': collection}
+        plan = indexes.index_plan(database, Book)
+        self.assertEqual(plan.undeclared, ['stale_idx'])
+
+        errors = indexes.apply_plan(database, plan)
+        self.assertEqual(collection.dropped, [])
+        self.assertEqual(
+            [name for name, _, _ in collection.created], ['book_book_status_id_idx', 'book_catalog_update_idx'],
+        )
+        self.assertEqual(collection.created[1][1], [('is_deleted', 1), ('date_update', -1), ('id', -1)])
+        self.assertEqual(len(errors), 1)
+        self.assertTrue(errors[0].startswith('book_book.book_catalog_upload_idx:'))
+
+        indexes.apply_plan(database, plan, drop_undeclared=True)
+        self.assertEqual(collection.dropped, ['stale_idx'])
+
+
+class MongoClientConfigTest(SimpleTestCase):
+    ENV = {'MONGO_URI': 'mongodb://db-1,db-2/?replicaSet=rs0', 'MONGO_DB': 'aiko'}
+
+    def test_client_options_from_environment(self):
+        environ = dict(self.ENV, MONGO_MAX_POOL_SIZE='20', MONGO_MAX_IDLE_TIME_MS='', MONGO_COMPRESSORS='zstd,zlib')
+        with mock.patch.dict(os.environ, environ):
+            options = mongo.client_options()
+        self.assertEqual(options['maxPoolSize'], 20)
+        self.assertEqual(options['serverSelectionTimeoutMS'], 5000)
+        # Để trống thì dùng mặc định của pymongo / URI
+        self.assertNotIn('maxIdleTimeMS', options)
+        self.assertEqual(options['compressors'], ['zstd', 'zlib'])
+        self.assertEqual(options['zlibCompressionLevel'], -1)
+
+    def test_reads_alias_only_with_a_read_preference(self):
+        with mock.patch.dict(os.environ, self.ENV):
+            os.environ.pop('MONGO_READ_PREFERENCE', None)
+            self.assertEqual(list(mongo.databases()), ['default'])
+        environ = dict(self.ENV, MONGO_READ_PREFERENCE='secondaryPreferred', MONGO_MAX_STALENESS_SECONDS='120')
+        with mock.patch.dict(os.environ, environ):
+            databases = mongo.databases()
+        self.assertEqual(databases['default']['CLIENT']['host'], self.ENV['MONGO_URI'])
+        self.assertNotIn('readPreference', databases['default']['CLIENT'])
+        reads = databases['reads']
+        self.assertEqual((reads['NAME'], reads['TEST']), ('aiko', {'MIRROR': 'default'}))
+        self.assertEqual(reads['CLIENT']['readPreference'], 'secondaryPreferred')
+        self.assertEqual(reads['CLIENT']['maxStalenessSeconds'], 120)
+
+    def test_pool_stats_listener(self):
+        listener = mongo.PoolStatsListener()
+        event = SimpleNamespace(address=('db-1', 27017))
+        listener.pool_created(event)
+        for _ in range(2):
+            listener.connection_created(event)
+            listener.connection_check_out_started(event)
+            listener.connection_checked_out(event)
+        listener.connection_checked_in(event)
+        listener.connection_check_out_started(event)
+        listener.connection_check_out_failed(event)
+        listener.connection_closed(event)
+        stats = listener.snapshot()['db-1:27017']
+        self.assertEqual(
+            {name: stats[name] for name in ('open', 'in_use', 'created', 'closed', 'checkouts', 'checkout_failures')},
+            {'open': 1, 'in_use': 1, 'created': 2, 'closed': 1, 'checkouts': 2, 'checkout_failures': 1},
+        )
+
+    def test_command_capture_records_reads_inside_the_block_only(self):
+        capture = mongo.CommandCapture()
+
+        def event(name, **command):
+            return SimpleNamespace(command_name=name, database_name='aiko', command={name: 'book_book', 'lsid': 1, **command})
+
+        capture.started(event('find'))
+        with capture.capture() as commands:
+            capture.started(event('find', filter={'is_deleted': False}))
+            capture.started(event('insert'))
+        capture.started(event('aggregate'))
+        self.assertEqual(commands, [('aiko', {'find': 'book_book', 'filter': {'is_deleted': False}})])
+
+class AsyncReadViewTest(TransactionTestCase):
+    """
+    Bản async phải trả đúng response như view đồng bộ. TransactionTestCase:
+    view chạy trong thread khác, với kết nối database riêng.
+    """
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        write_behind.discard_all()
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        self.book = Book.objects.create(title='Test book')
+        volume = Volume.objects.create(book=self.book, title='Volume 1')
+        self.chapter = Chapter.objects.create(volume=volume, number=1, title='Một', content='<p>Một</p>')
+        self.factory = RequestFactory()
+
+    def tearDown(self):
+        write_behind.discard_all()
+
+    def async_view(self, view, fast_path=None):
+        with mock.patch.object(async_views, 'ASYNC_VIEWS', True):
+            return async_to_sync(async_views.async_read_view(view, fast_path))
+
+    def get(self, path):
+        # Như sau AuthenticationMiddleware; fast_path đọc request.user để chọn khoá cache
+        request = self.factory.get(path)
+        request.user = AnonymousUser()
+        return request
+
+    def sync_call(self, view, path, **kwargs):
+        response = view(self.get(path), **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        return response
+
+    def test_wrapper_is_the_view_itself_when_disabled(self):
+        view = BookDetailView.as_view()
+        self.assertIs(async_views.async_read_view(view, cached_book_detail), view)
+
+    def test_book_detail(self):
+        path = reverse('book-detail', args=[self.book.id])
+        view = BookDetailView.as_view()
+        async_view = self.async_view(view, cached_book_detail)
+
+        miss = async_view(self.get(path), book_id=self.book.id)
+        sync = self.sync_call(view, path, book_id=self.book.id)
+        hit = async_view(self.get(path), book_id=self.book.id)
+        self.assertEqual((miss.status_code, sync.status_code, hit.status_code), (200, 200, 200))
+        self.assertEqual((miss['X-Cache'], hit['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(json.loads(miss.content), json.loads(sync.content))
+        self.assertEqual(json.loads(hit.content), json.loads(sync.content))
+
+        missing = reverse('book-detail', args=[self.book.id + 100])
+        self.assertEqual(async_view(self.get(missing), book_id=self.book.id + 100).status_code, 404)
+
+    def test_table_of_contents(self):
+        path = reverse('book-toc', args=[self.book.id])
+        view = BookTableOfContentsView.as_view()
+        response = self.async_view(view)(self.get(path), book_id=self.book.id)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content), json.loads(self.sync_call(view, path, book_id=self.book.id).content))
+
+    def test_chapter_read(self):
+        path = reverse('chapter-read', args=[self.chapter.id])
+        view = ChapterReadView.as_view()
+        async_view = self.async_view(view, cached_chapter)
+        # Lần đầu chương chưa có trong cache: chạy view gốc, lần sau lấy từ cache
+        first = async_view(self.get(path), chapter_id=self.chapter.id)
+        cached = async_view(self.get(path), chapter_id=self.chapter.id)
+        sync = self.sync_call(view, path, chapter_id=self.chapter.id)
+        for response in (first, cached):
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.content, sync.content)
+            self.assertEqual(response['ETag'], sync['ETag'])
+        self.assertEqual(async_view(self.get(path), chapter_id=self.chapter.id + 100).status_code, 404)
@@ -0,0 +1,194 @@
+import logging
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+from . import metrics
+from .image_hosts import local_url
+from .image_utils import PRIMARY_VARIANT, image_digest, open_image, render_image_variants, validate_image
+
+logger = logging.getLogger(__name__)
+
+PENDING_DIR = 'pending_uploads'
+# Các biến thể của ảnh đã lưu, đặt tên theo hash nội dung
+IMAGE_DIR = 'images'
+
+_executor = None
+_executor_lock = threading.Lock()
+_futures = set()
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def get_uploader():
+    """Hàm upload ảnh lên image host, cấu hình bằng IMAGE_UPLOADER"""
+    return import_string(_setting('IMAGE_UPLOADER', 'backend.imgur_utils.upload_image_to_imgur'))
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_setting('IMAGE_UPLOAD_WORKERS', 4),
+                thread_name_prefix='image-upload',
+            )
+        return _executor
+
+
+def wait_for_uploads(timeout=None):
+    """Chờ các job đang chạy hoàn tất (dùng khi test hoặc trước khi tắt process)"""
+    wait(list(_futures), timeout=timeout)
+
+
+def upload_with_retries(name, uploader=None):
+    """Upload file `name` trong default_storage, thử lại với backoff luỹ thừa (kèm jitter) khi lỗi"""
+    uploader = uploader or get_uploader()
+    max_retries = _setting('IMAGE_UPLOAD_MAX_RETRIES', 4)
+    backoff = _setting('IMAGE_UPLOAD_BACKOFF', 1.0)
+    max_backoff = _setting('IMAGE_UPLOAD_MAX_BACKOFF', 60.0)
+    attempt = 0
+    while True:
+        start = time.perf_counter()
+        try:
+            with default_storage.open(name, 'rb') as image_file:
+                url = uploader(image_file)
+            metrics.image_upload_time.observe(time.perf_counter() - start, outcome='success')
+            return url
+        except Exception as e:
+            metrics.image_upload_time.observe(time.perf_counter() - start, outcome='error')
+            if attempt >= max_retries:
+                raise
+            delay = min(backoff * (2 ** attempt), max_backoff) * random.uniform(0.5, 1.0)
+            logger.warning('Image upload failed (attempt %d): %s; retrying in %.1fs', attempt + 1, e, delay)
+            time.sleep(delay)
+            attempt += 1
+
+
+def _primary(variants):
+    variant, image_format = PRIMARY_VARIANT
+    files = variants[variant]['files']
+    return files.get(image_format) or next(iter(files.values()))
+
+
+def _describe(variants, url_for):
+    """{variant: {'width', 'height', format: url}} như lưu trong field *_variants"""
+    described = {}
+    for variant, info in variants.items():
+        described[variant] = {'width': info['width'], 'height': info['height']}
+        for image_format, name in info['files'].items():
+            described[variant][image_format] = url_for(name)
+    return described
+
+
+def store_image(image_file, profile='cover', uploader=None):
+    """
+    Giải mã ảnh một lần và tra kho ảnh theo hash nội dung. Ảnh đã có thì dùng
+    lại, không encode, không upload. Nếu chưa, các biến thể được lưu vào
+    IMAGE_DIR và phục vụ trực tiếp từ default_storage; chỉ biến thể chính
+    (PRIMARY_VARIANT) được upload lên image host, nên mỗi ảnh mới tốn đúng một
+    lần gọi mạng. Trả về StoredImage.
+    """
+    from images.store import find_image, register_image
+
+    image = open_image(image_file)
+    digest = image_digest(image, profile)
+    stored = find_image(digest)
+    if stored is not None:
+        return stored
+
+    variants = {}
+    for variant, info in render_image_variants(image, profile).items():
+        variants[variant] = {
+            'width': info['width'],
+            'height': info['height'],
+            'files': {
+                image_format: default_storage.save(f'{IMAGE_DIR}/{digest}-{variant}.{image_format}', content)
+                for image_format, content in info['files'].items()
+            },
+        }
+    del image  # không giữ ảnh đã giải mã trong RAM suốt lúc upload
+    names = [name for info in variants.values() for name in info['files'].values()]
+    try:
+        url = upload_with_retries(_primary(variants), uploader)
+    except Exception:
+        for name in names:
+            default_storage.delete(name)
+        raise
+    stored = register_image(digest, profile, url, _describe(variants, local_url))
+    if stored.url != url:
+        # Worker khác vừa lưu cùng ảnh: dùng bản của nó, bỏ các file vừa tạo
+        for name in names:
+            default_storage.delete(name)
+    return stored
+
+
+class PendingImageUpload:
+    """
+    Ảnh gốc đã kiểm tra và lưu tạm trên máy, chờ worker xử lý (xem store_image).
+
+    Trong lúc chờ, model trỏ tới bản gốc local (`placeholder_url`) và chưa có
+    biến thể. Khi xong, worker thay bằng URL thật và các biến thể, chỉ khi field
+    vẫn còn giữ placeholder (người dùng chưa đổi ảnh khác trong lúc đó).
+    """
+
+    placeholder_variants = None
+
+    def __init__(self, name, profile):
+        self.name = name
+        self.profile = profile
+        self.placeholder_url = default_storage.url(name)
+
+    def submit(self, instance, field_name, variants_field=None):
+        """Lên lịch xử lý sau khi transaction hiện tại commit"""
+        model, pk = type(instance), instance.pk
+        transaction.on_commit(lambda: self._schedule(model, pk, field_name, variants_field))
+
+    def _schedule(self, *args):
+        if not _setting('IMAGE_UPLOAD_ASYNC', True):
+            self.run(*args)
+            return
+        future = _get_executor().submit(self.run, *args)
+        _futures.add(future)
+        future.add_done_callback(_futures.discard)
+
+    def run(self, model, pk, field_name, variants_field=None):
+        close_old_connections()
+        try:
+            try:
+                with default_storage.open(self.name, 'rb') as image_file:
+                    stored = store_image(image_file, self.profile)
+            except Exception:
+                # Giữ nguyên placeholder: ảnh vẫn được phục vụ từ bản gốc local
+                logger.exception('Giving up uploading image for %s(pk=%s).%s', model.__name__, pk, field_name)
+                return
+
+            instance = model.objects.filter(pk=pk, **{field_name: self.placeholder_url}).first()
+            if instance is not None:
+                setattr(instance, field_name, stored.url)
+                update_fields = [field_name]
+                if variants_field:
+                    setattr(instance, variants_field, stored.variants)
+                    update_fields.append(variants_field)
+                instance.save(update_fields=update_fields)
+            default_storage.delete(self.name)
+        finally:
+            close_old_connections()
+
+
+def stage_image_upload(image_file, profile='cover'):
+    """
+    Kiểm tra ảnh (dung lượng, kích thước, cấu trúc file) rồi lưu bản gốc xuống
+    thư mục chờ. Không giải mã pixel, không encode, không gọi mạng: việc đó
+    chạy ở worker. Trả về PendingImageUpload; gọi `submit()` sau khi lưu model.
+    """
+    extension = validate_image(image_file)
+    name = default_storage.save(f'{PENDING_DIR}/{uuid.uuid4().hex}.{extension}', image_file)
+    return PendingImageUpload(name, profile)
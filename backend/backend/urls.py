@@ -19,6 +19,8 @@ from django.urls import path, include
 from ckeditor_uploader import views as ckeditor_views
 from django.conf.urls.static import static
 from django.conf import settings
+from backend.health import health_view
+from backend.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,6 +28,8 @@ urlpatterns = [
     path('contributors/', include('contributors.urls')),
     path('book/', include('book.urls')),
     path("ckeditor/", include("ckeditor_uploader.urls")),
+    path('metrics/', metrics_view, name='metrics'),
+    path('health/', health_view, name='health'),
 ]
 
 if settings.DEBUG:
@@ -0,0 +1,236 @@
+import atexit
+import itertools
+import logging
+import threading
+import time
+from collections import Counter, deque
+from django.db import close_old_connections
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+_buffers = []
+# Tắt khi database chỉ tồn tại trong lúc chạy (test, benchmark), xem use_manual_flush
+_flush_at_exit = True
+_manual = False
+
+
+class WriteBehindBuffer:
+    """
+    Gom các lần ghi theo khoá trong RAM rồi ghi xuống database theo lô.
+
+    Lần ghi sau cho cùng khoá đè lần trước (hoặc được gộp bằng `merge(old, new)`),
+    nên số bản ghi mỗi lô chỉ phụ thuộc số khoá khác nhau chứ không phụ thuộc số
+    request. Lô được ghi mỗi `interval` giây bởi một thread nền, hoặc sớm hơn khi
+    có `max_pending` khoá. `interval <= 0` thì ghi ngay (dùng khi chạy một lần).
+
+    `write(batch)` nhận dict {khoá: giá trị} và phải tự ghi cả lô. Nếu lỗi, các
+    khoá chưa bị ghi đè được đưa lại vào buffer để thử ở lần sau. Dữ liệu chưa
+    ghi chỉ nằm trong process hiện tại: dùng `get` / `pending` để đọc kèm.
+    """
+
+    def __init__(self, name, write, interval=5.0, max_pending=10000, merge=None):
+        self.name = name
+        self.write = write
+        self.interval = interval
+        self.max_pending = max_pending
+        self.merge = merge
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        _buffers.append(self)
+
+    def put(self, key, value):
+        with self._lock:
+            if self.merge is not None and key in self._pending:
+                value = self.merge(self._pending[key], value)
+            self._pending[key] = value
+            size = len(self._pending)
+        if _manual:
+            return
+        if self.interval <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if size >= self.max_pending:
+            self._wakeup.set()
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._pending.get(key, default)
+
+    def pending(self):
+        with self._lock:
+            return dict(self._pending)
+
+    def discard(self, key):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def clear(self):
+        """Bỏ mọi khoá đang chờ mà không ghi"""
+        with self._flush_lock:
+            self._take()
+
+    def flush(self):
+        """Ghi mọi khoá đang chờ; trả về số khoá đã ghi"""
+        with self._flush_lock:
+            batch = self._take()
+            if not batch:
+                return 0
+            start = time.perf_counter()
+            try:
+                self.write(batch)
+            except Exception:
+                metrics.write_behind_flush_time.observe(time.perf_counter() - start, buffer=self.name, outcome='error')
+                logger.exception('Write-behind flush of %s failed; %d keys requeued', self.name, len(batch))
+                self._requeue(batch)
+                return 0
+            metrics.write_behind_flush_time.observe(time.perf_counter() - start, buffer=self.name, outcome='success')
+            metrics.write_behind_batch_size.observe(len(batch), buffer=self.name)
+            return len(batch)
+
+    def _take(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
+
+    def _requeue(self, batch):
+        with self._lock:
+            for key, value in batch.items():
+                if len(self._pending) >= self.max_pending:
+                    logger.warning('Write-behind buffer %s is full; dropping unwritten keys', self.name)
+                    break
+                if key in self._pending:
+                    if self.merge is None:
+                        continue  # đã có giá trị mới hơn
+                    value = self.merge(value, self._pending[key])
+                self._pending[key] = value
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=f'write-behind-{self.name}', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                close_old_connections()
+
+
+class CounterBuffer(WriteBehindBuffer):
+    """
+    Bộ đếm cho đường ghi nóng. `incr` chỉ append vào một deque (thao tác nguyên
+    tử trong CPython, không cần khoá); mỗi thread ghi vào shard riêng nên các
+    thread không tranh nhau cùng một deque. Khi flush, các lần tăng được gộp
+    thành {khoá: tổng} rồi truyền cho `write` như WriteBehindBuffer.
+    """
+
+    def __init__(self, name, write, interval=10.0, max_pending=100000, shards=8):
+        super().__init__(name, write, interval=interval, max_pending=max_pending)
+        self._shards = [deque() for _ in range(shards)]
+        self._next_shard = itertools.count()
+        self._local = threading.local()
+
+    def _shard(self):
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = self._local.shard = self._shards[next(self._next_shard) % len(self._shards)]
+        return shard
+
+    def incr(self, key, amount=1):
+        shard = self._shard()
+        shard.append((key, amount))
+        if _manual:
+            return
+        if self.interval <= 0:
+            self.flush()
+            return
+        self._ensure_thread()
+        if len(shard) * len(self._shards) >= self.max_pending:
+            self._wakeup.set()
+
+    put = incr
+
+    def get(self, key, default=None):
+        return self.pending().get(key, default)
+
+    def pending(self):
+        totals = Counter()
+        for shard in self._shards:
+            for key, amount in shard.copy():
+                totals[key] += amount
+        return dict(totals)
+
+    def discard(self, key):
+        """Bỏ các lần tăng đang chờ của `key`"""
+        with self._flush_lock:
+            for shard in self._shards:
+                # Lấy ra số phần tử có lúc bắt đầu rồi trả lại những cái khác khoá;
+                # phần append thêm trong lúc đó vẫn ở cuối deque
+                for _ in range(len(shard)):
+                    item = shard.popleft()
+                    if item[0] != key:
+                        shard.append(item)
+
+    def _take(self):
+        totals = Counter()
+        for shard in self._shards:
+            # Chỉ lấy số phần tử có lúc bắt đầu; phần append thêm để lần sau
+            for _ in range(len(shard)):
+                key, amount = shard.popleft()
+                totals[key] += amount
+        return dict(totals)
+
+    def _requeue(self, batch):
+        self._shards[0].extend(batch.items())
+
+
+def flush_all():
+    """Ghi hết các buffer (gọi trước khi tắt process hoặc trong test)"""
+    for buffer in _buffers:
+        buffer.flush()
+
+
+def discard_all():
+    """Bỏ hết dữ liệu đang chờ của mọi buffer mà không ghi"""
+    for buffer in _buffers:
+        buffer.clear()
+
+
+def disable_exit_flush():
+    """
+    Không ghi các buffer khi process thoát. Cần khi database chỉ tồn tại trong
+    lúc chạy (test, benchmark): lúc thoát database test đã bị xoá, connection
+    trỏ lại database thật và lần ghi đó sẽ đi vào database thật.
+    """
+    global _flush_at_exit
+    _flush_at_exit = False
+
+
+def use_manual_flush():
+    """
+    Không ghi tự động nữa (không thread nền, không ghi lúc thoát): dữ liệu chỉ
+    được ghi khi gọi flush() / flush_all(). Dùng trong test.
+    """
+    global _manual
+    _manual = True
+    disable_exit_flush()
+
+
+def _flush_on_exit():
+    if _flush_at_exit:
+        flush_all()
+
+
+atexit.register(_flush_on_exit)
@@ -0,0 +1,127 @@
+from collections import defaultdict
+from django.db import transaction
+from django.utils.timezone import now
+from backend.response_cache import invalidate_tags
+from contributors.models import Author
+from . import search, summary
+from .models import Book, BookAuthor, BookTeam
+
+MAX_BOOKS = 1000
+
+# quan hệ: (bảng trung gian, cột phía bên kia, cột đánh dấu dòng chính hoặc None)
+RELATIONS = {
+    'categories': (Book.categories.through, 'category_id', None),
+    'teams': (BookTeam, 'team_id', 'is_main_team'),
+    'authors': (BookAuthor, 'author_id', 'is_main_author'),
+}
+
+
+class MainRelationRemoved(Exception):
+    """Thay đổi gỡ tác giả / nhóm chính của một số truyện"""
+
+    def __init__(self, relation, book_ids):
+        super().__init__(f'Cannot remove the main {relation} of books {book_ids}')
+        self.relation = relation
+        self.book_ids = book_ids
+
+
+def _apply_relation(name, change, book_ids, results):
+    """
+    Áp một thay đổi {'set': [...]} hoặc {'add': [...], 'remove': [...]} cho mọi
+    truyện: một query đọc bảng trung gian, một DELETE và một bulk INSERT.
+    Dòng còn giữ lại không bị đụng tới nên cờ tác giả / nhóm chính được giữ;
+    dòng mới thêm không phải dòng chính. Raise MainRelationRemoved nếu thay đổi
+    gỡ dòng chính của truyện nào đó.
+    Trả về tập id phía bên kia đã bị thêm / gỡ ở ít nhất một truyện.
+    """
+    through, column, main_flag = RELATIONS[name]
+    current = defaultdict(set)
+    main = {}
+    fields = ('book_id', column) + ((main_flag,) if main_flag else ())
+    for book_id, related_id, *is_main in through.objects.filter(book_id__in=book_ids).values_list(*fields):
+        current[book_id].add(related_id)
+        if is_main and is_main[0]:
+            main[book_id] = related_id
+    defaults = {main_flag: False} if main_flag else {}
+
+    to_remove = set(change.get('remove', ()))
+    to_create = []
+    touched = set()
+    orphaned = []
+    for book_id in book_ids:
+        existing = current[book_id]
+        if change.get('set') is not None:
+            wanted = set(change['set'])
+        else:
+            wanted = (existing | set(change.get('add', ()))) - to_remove
+        added = sorted(wanted - existing)
+        removed = sorted(existing - wanted)
+        if main.get(book_id) in removed:
+            orphaned.append(book_id)
+        if added or removed:
+            results[book_id][name] = {'added': added, 'removed': removed}
+            touched.update(added, removed)
+        to_create += [through(book_id=book_id, **{column: related_id}, **defaults) for related_id in added]
+    if orphaned:
+        raise MainRelationRemoved(name, orphaned)
+
+    # Thay đổi giống nhau cho mọi truyện nên một điều kiện xoá đúng các cặp cần gỡ
+    stale = through.objects.filter(book_id__in=book_ids)
+    if change.get('set') is not None:
+        stale = stale.exclude(**{f'{column}__in': change['set']})
+    else:
+        stale = stale.filter(**{f'{column}__in': to_remove})
+    if touched:
+        # bulk_create không gửi signal: việc làm mới cache cho cả lô ở apply_batch_update
+        stale.delete()
+        through.objects.bulk_create(to_create)
+    return touched
+
+
+def apply_batch_update(book_ids, status=None, changes=None):
+    """
+    Đổi trạng thái và thêm / gỡ thể loại, nhóm, tác giả của nhiều truyện trong
+    một transaction. Trả về kết quả theo từng id: 'updated' kèm những gì đã đổi,
+    'unchanged', hoặc 'not_found'. Raise MainRelationRemoved (không đổi gì)
+    nếu thay đổi gỡ tác giả / nhóm chính của một truyện.
+
+    Thay đổi được ghi bằng bulk update / insert nên signal không chạy; response
+    cache, chỉ mục tìm kiếm và BookSummary được làm mới ở đây cho cả lô.
+    """
+    changes = changes or {}
+    book_ids = list(dict.fromkeys(book_ids))
+    with transaction.atomic():
+        found = set(Book.objects.filter(id__in=book_ids).values_list('id', flat=True))
+        targets = [book_id for book_id in book_ids if book_id in found]
+        results = {book_id: {} for book_id in targets}
+
+        if status is not None:
+            updated = list(Book.objects.filter(id__in=targets).exclude(status_id=status.pk).values_list('id', flat=True))
+            Book.objects.filter(id__in=updated).update(status_id=status.pk)
+            for book_id in updated:
+                results[book_id]['status'] = status.pk
+
+        touched_authors = set()
+        for name, change in changes.items():
+            touched = _apply_relation(name, change, targets, results)
+            if name == 'authors':
+                touched_authors = touched
+
+        changed = [book_id for book_id in targets if results[book_id]]
+        if changed:
+            Book.objects.filter(id__in=changed).update(date_update=now())
+            if touched_authors:
+                # Bút danh là một phần chỉ mục tìm kiếm
+                search.index_books([book_id for book_id in changed if 'authors' in results[book_id]])
+            tags = [f'book:{book_id}' for book_id in changed]
+            tags += [f'pen-name:{pen_name}' for pen_name in Author.objects.filter(id__in=touched_authors).values_list('pen_name', flat=True)]
+            # Chỉ xoá response cache khi lô đã commit: request song song không cache lại dữ liệu cũ
+            transaction.on_commit(lambda: invalidate_tags(*tags))
+            summary.schedule_refresh(*changed)
+
+    return [
+        {'id': book_id, 'result': 'not_found'} if book_id not in found
+        else {'id': book_id, 'result': 'updated', 'changes': results[book_id]} if results[book_id]
+        else {'id': book_id, 'result': 'unchanged'}
+        for book_id in book_ids
+    ]
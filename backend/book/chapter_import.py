@@ -0,0 +1,259 @@
+import io
+import json
+import posixpath
+import re
+import zipfile
+from html import escape
+from xml.etree import ElementTree
+from django.conf import settings
+from django.db import transaction
+from django.utils.html import strip_tags
+from django.utils.timezone import now
+from backend.html_utils import sanitize_html
+from backend.response_cache import invalidate_tags
+from . import search, summary
+from .content_cache import invalidate_chapter
+from .models import Chapter
+from .serializers import ImportChapterSerializer
+
+# Giới hạn cho một lần import, kiểm tra trên metadata của zip trước khi giải nén
+MAX_IMPORT_CHAPTERS = getattr(settings, 'CHAPTER_IMPORT_MAX_CHAPTERS', 2000)
+MAX_IMPORT_ENTRY_BYTES = getattr(settings, 'CHAPTER_IMPORT_MAX_ENTRY_BYTES', 5 * 1024 * 1024)
+MAX_IMPORT_TOTAL_BYTES = getattr(settings, 'CHAPTER_IMPORT_MAX_TOTAL_BYTES', 200 * 1024 * 1024)
+BATCH_SIZE = 200
+
+HTML_EXTENSIONS = ('.html', '.htm', '.xhtml')
+BODY_RE = re.compile(r'<body[^>]*>(.*)</body\s*>', re.IGNORECASE | re.DOTALL)
+TITLE_RE = re.compile(r'<(title|h1|h2|h3)[^>]*>(.*?)</\1\s*>', re.IGNORECASE | re.DOTALL)
+NUMBER_RE = re.compile(r'(\d+(?:\.\d+)?)')
+
+WORD_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+CONTAINER_NS = '{urn:oasis:names:tc:opendocument:xmlns:container}'
+OPF_NS = '{http://www.idpf.org/2007/opf}'
+
+
+class ChapterImportError(Exception):
+    pass
+
+
+def _title_from_html(html):
+    for _, text in TITLE_RE.findall(html):
+        title = ' '.join(strip_tags(text).split())
+        if title:
+            return title
+    return None
+
+
+def _html_chapter(html, fallback_title):
+    match = BODY_RE.search(html)
+    body = match.group(1) if match else html
+    return {'title': (_title_from_html(html) or fallback_title)[:200], 'content': body}
+
+
+def _docx_chapter(data, fallback_title):
+    """Chuyển document.xml của file DOCX thành các đoạn <p>, giữ đậm / nghiêng"""
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as docx:
+            if docx.getinfo('word/document.xml').file_size > MAX_IMPORT_ENTRY_BYTES:
+                raise ChapterImportError(f'{fallback_title}: document is too large.')
+            root = ElementTree.fromstring(docx.read('word/document.xml'))
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError):
+        raise ChapterImportError(f'{fallback_title}: invalid DOCX file.')
+
+    title = None
+    paragraphs = []
+    for paragraph in root.iter(f'{WORD_NS}p'):
+        style = paragraph.find(f'{WORD_NS}pPr/{WORD_NS}pStyle')
+        is_heading = style is not None and style.get(f'{WORD_NS}val', '').lower().startswith(('heading', 'title'))
+        runs = []
+        for run in paragraph.iter(f'{WORD_NS}r'):
+            text = escape(''.join(node.text or '' for node in run.iter(f'{WORD_NS}t')), quote=False)
+            if not text:
+                continue
+            if run.find(f'{WORD_NS}rPr/{WORD_NS}b') is not None:
+                text = f'<strong>{text}</strong>'
+            if run.find(f'{WORD_NS}rPr/{WORD_NS}i') is not None:
+                text = f'<em>{text}</em>'
+            runs.append(text)
+        if not runs:
+            continue
+        if is_heading and title is None:
+            title = strip_tags(''.join(runs))
+            continue
+        paragraphs.append(f'<p>{"".join(runs)}</p>')
+    return {'title': (title or fallback_title)[:200], 'content': ''.join(paragraphs)}
+
+
+def _check_archive(archive, names):
+    if len(names) > MAX_IMPORT_CHAPTERS:
+        raise ChapterImportError(f'Too many files (limit {MAX_IMPORT_CHAPTERS}).')
+    total = 0
+    for name in names:
+        size = archive.getinfo(name).file_size
+        if size > MAX_IMPORT_ENTRY_BYTES:
+            raise ChapterImportError(f'{name} is larger than {MAX_IMPORT_ENTRY_BYTES} bytes.')
+        total += size
+    if total > MAX_IMPORT_TOTAL_BYTES:
+        raise ChapterImportError(f'Archive is larger than {MAX_IMPORT_TOTAL_BYTES} bytes uncompressed.')
+
+
+def _read_text(archive, name):
+    return archive.read(name).decode('utf-8', errors='replace')
+
+
+def _sort_key(name):
+    match = NUMBER_RE.findall(posixpath.basename(name))
+    return (float(match[-1]) if match else float('inf'), name)
+
+
+def parse_zip(archive):
+    """
+    Mỗi file HTML / DOCX trong zip là một chương, sắp theo số trong tên file
+    (chapter-12.html -> 12). Nếu có file không mang số thì đánh số theo thứ tự.
+    """
+    names = sorted(
+        (name for name in archive.namelist()
+         if name.lower().endswith(HTML_EXTENSIONS + ('.docx',)) and not posixpath.basename(name).startswith('.')),
+        key=_sort_key,
+    )
+    _check_archive(archive, names)
+    numbered = all(NUMBER_RE.search(posixpath.basename(name)) for name in names)
+    for index, name in enumerate(names):
+        stem = posixpath.splitext(posixpath.basename(name))[0]
+        if name.lower().endswith('.docx'):
+            item = _docx_chapter(archive.read(name), stem)
+        else:
+            item = _html_chapter(_read_text(archive, name), stem)
+        item['number'] = _sort_key(name)[0] if numbered else index + 1
+        yield item
+
+
+def parse_epub(archive):
+    """Đọc các chương theo thứ tự spine của EPUB, bỏ trang mục lục và trang trống"""
+    try:
+        container = ElementTree.fromstring(archive.read('META-INF/container.xml'))
+        opf_path = container.find(f'.//{CONTAINER_NS}rootfile').get('full-path')
+        package = ElementTree.fromstring(archive.read(opf_path))
+    except (KeyError, AttributeError, ElementTree.ParseError):
+        raise ChapterImportError('Invalid EPUB file.')
+
+    base = posixpath.dirname(opf_path)
+    manifest = {
+        item.get('id'): item for item in package.iter(f'{OPF_NS}item')
+    }
+    names = []
+    for itemref in package.iter(f'{OPF_NS}itemref'):
+        item = manifest.get(itemref.get('idref'))
+        if item is None or 'nav' in (item.get('properties') or '').split():
+            continue
+        if item.get('media-type') != 'application/xhtml+xml':
+            continue
+        names.append(posixpath.normpath(posixpath.join(base, item.get('href'))))
+    try:
+        _check_archive(archive, names)
+    except KeyError:
+        raise ChapterImportError('EPUB spine refers to a missing file.')
+
+    number = 0
+    for name in names:
+        html = _read_text(archive, name)
+        item = _html_chapter(html, posixpath.splitext(posixpath.basename(name))[0])
+        if not strip_tags(item['content']).strip():
+            continue
+        number += 1
+        item['number'] = number
+        yield item
+
+
+def parse_upload(upload):
+    """Nhận file upload (EPUB, zip HTML/DOCX hoặc JSON), trả về iterator các chương"""
+    name = (getattr(upload, 'name', '') or '').lower()
+    if name.endswith('.json'):
+        try:
+            items = json.load(upload)
+        except ValueError:
+            raise ChapterImportError('Invalid JSON file.')
+        if not isinstance(items, list):
+            raise ChapterImportError('JSON file must contain a list of chapters.')
+        return iter(items)
+    try:
+        archive = zipfile.ZipFile(upload)
+    except zipfile.BadZipFile:
+        raise ChapterImportError('Upload must be an EPUB, a zip of HTML/DOCX files or a JSON file.')
+    if name.endswith('.epub') or 'META-INF/container.xml' in archive.namelist():
+        return parse_epub(archive)
+    return parse_zip(archive)
+
+
+def _validated(items):
+    for index, item in enumerate(items):
+        if index >= MAX_IMPORT_CHAPTERS:
+            raise ChapterImportError(f'Too many chapters (limit {MAX_IMPORT_CHAPTERS}).')
+        serializer = ImportChapterSerializer(data=item)
+        if not serializer.is_valid():
+            raise ChapterImportError({'index': index, 'errors': serializer.errors})
+        yield serializer.validated_data
+
+
+def import_chapters(volume, items, upsert=False, batch_size=BATCH_SIZE):
+    """
+    Ghi các chương vào `volume` trong một transaction, theo lô bulk_create.
+
+    `items` là iterable các dict có number / title / content (được đọc dần,
+    không cần nằm hết trong RAM). Chương trùng số với chương đã có sẽ bị từ
+    chối, trừ khi `upsert=True` thì được cập nhật bằng bulk_update. Vì bulk
+    không gửi signal, cache nội dung, chỉ mục tìm kiếm và bản tóm tắt truyện được
+    cập nhật tại đây.
+    """
+    created = []
+    updated = []
+    with transaction.atomic():
+        existing = dict(Chapter.objects.filter(volume=volume).values_list('number', 'id'))
+        seen = set()
+        to_create = []
+        to_update = []
+
+        def flush():
+            Chapter.objects.bulk_create(to_create, batch_size=batch_size)
+            Chapter.objects.bulk_update(to_update, ['title', 'content', 'date_update'], batch_size=batch_size)
+            to_create.clear()
+            to_update.clear()
+
+        for item in _validated(items):
+            number = item['number']
+            if number in seen:
+                raise ChapterImportError(f'Duplicate chapter number {number:g}.')
+            seen.add(number)
+            chapter = Chapter(
+                volume=volume,
+                number=number,
+                title=(item.get('title') or f'Chương {number:g}')[:200],
+                content=sanitize_html(item.get('content')),
+            )
+            if number in existing:
+                if not upsert:
+                    raise ChapterImportError(f'Chapter {number:g} already exists in this volume.')
+                chapter.id = existing[number]
+                chapter.date_update = now()
+                to_update.append(chapter)
+                updated.append(chapter.id)
+            else:
+                to_create.append(chapter)
+                created.append(number)
+            if len(to_create) + len(to_update) >= batch_size:
+                flush()
+        flush()
+
+        if search.INDEX_CHAPTERS and seen:
+            search.index_chapters(
+                Chapter.objects.filter(volume=volume, number__in=seen).only('id', 'content'), volume.book_id,
+            )
+
+    def invalidate():
+        for chapter_id in updated:
+            invalidate_chapter(chapter_id)
+        invalidate_tags(f'book:{volume.book_id}')
+
+    transaction.on_commit(invalidate)
+    summary.schedule_refresh(volume.book_id)
+    return {'created': len(created), 'updated': len(updated), 'numbers': sorted(seen)}
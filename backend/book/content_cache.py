@@ -0,0 +1,101 @@
+import gzip
+import hashlib
+import json
+from django.conf import settings
+from django.core.cache import caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import http_date
+from backend.html_utils import sanitize_html
+from .models import Chapter
+
+try:
+    import brotli
+except ImportError:  # brotli là tuỳ chọn, thiếu thì chỉ phục vụ gzip
+    brotli = None
+
+CACHE_ALIAS = getattr(settings, 'CHAPTER_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'CHAPTER_CACHE_TIMEOUT', 60 * 60 * 24)
+# Nội dung ngắn hơn ngưỡng này không đáng nén
+MIN_COMPRESS_SIZE = 512
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _pointer_key(chapter_id):
+    return f'chapter-content:{chapter_id}'
+
+
+def _entry_key(chapter_id, digest):
+    return f'chapter-content:{chapter_id}:{digest}'
+
+
+def content_hash(body):
+    """
+    Hash của đúng body JSON trả cho client; dùng làm ETag và khoá cache, nên
+    mọi field được serialize (kể cả date_update, volume, book) đều làm đổi ETag
+    """
+    return hashlib.sha1(body).hexdigest()
+
+
+def render_chapter(chapter):
+    """Sanitize và render sẵn nội dung chương thành JSON kèm các bản nén"""
+    payload = {
+        'id': chapter.id,
+        'title': chapter.title,
+        'number': chapter.number,
+        'volume': chapter.volume_id,
+        'book': chapter.volume.book_id,
+        'date_upload': chapter.date_upload,
+        'date_update': chapter.date_update,
+        'content': sanitize_html(chapter.content),
+    }
+    body = json.dumps(payload, cls=DjangoJSONEncoder, ensure_ascii=False).encode('utf-8')
+    variants = {'identity': body}
+    if len(body) >= MIN_COMPRESS_SIZE:
+        variants['gzip'] = gzip.compress(body, compresslevel=9)
+        if brotli is not None:
+            variants['br'] = brotli.compress(body, quality=11)
+
+    digest = content_hash(body)
+    return {
+        'digest': digest,
+        'book': chapter.volume.book_id,
+        'etag': f'"{digest}"',
+        'last_modified': http_date(chapter.date_update.timestamp()),
+        'variants': variants,
+    }
+
+
+def get_cached_chapter(chapter_id):
+    """Đọc bản render từ cache, không chạm tới database; None nếu chưa có"""
+    cache = _cache()
+    digest = cache.get(_pointer_key(chapter_id))
+    if digest is None:
+        return None
+    return cache.get(_entry_key(chapter_id, digest))
+
+
+def store_chapter(chapter):
+    entry = render_chapter(chapter)
+    cache = _cache()
+    cache.set(_entry_key(chapter.id, entry['digest']), entry, CACHE_TIMEOUT)
+    cache.set(_pointer_key(chapter.id), entry['digest'], CACHE_TIMEOUT)
+    return entry
+
+
+def load_chapter(chapter_id):
+    """Lấy bản render của chương: cache nếu còn, nếu không thì render từ database"""
+    entry = get_cached_chapter(chapter_id)
+    if entry is not None:
+        return entry
+    chapter = Chapter.objects.select_related('volume').only(
+        'id', 'title', 'number', 'content', 'date_upload', 'date_update', 'volume', 'volume__book',
+    ).get(id=chapter_id)
+    return store_chapter(chapter)
+
+
+def invalidate_chapter(chapter_id):
+    # Chỉ cần xoá con trỏ; entry cũ sẽ tự hết hạn và không bao giờ được đọc lại
+    _cache().delete(_pointer_key(chapter_id))
@@ -0,0 +1,262 @@
+import hashlib
+import os
+import re
+import uuid
+import zipfile
+from html import escape, unescape
+from django.core.files.storage import default_storage
+from django.db.models import Count, Max
+from django.utils.html import strip_tags
+from django.utils.timezone import now
+from backend.html_utils import sanitize_html
+from .models import Book, Chapter, Volume
+
+EXPORT_DIR = 'exports'
+CHUNK_SIZE = 100
+FORMATS = {
+    'epub': ('application/epub+zip', 'epub'),
+    'txt': ('application/zip', 'zip'),
+}
+
+VOID_TAG_RE = re.compile(r'<(br|hr|img)((?:\s[^>]*)?)>', re.IGNORECASE)
+BLOCK_END_RE = re.compile(r'</(p|div|h[1-6]|li|blockquote|pre|tr)>|<br>', re.IGNORECASE)
+
+
+class ExportScope:
+    """Phạm vi xuất: cả quyển sách hoặc một tập"""
+
+    def __init__(self, book, volume=None):
+        self.book = book
+        self.volume = volume
+
+    @classmethod
+    def for_book(cls, book_id):
+        return cls(Book.objects.only('id', 'title', 'another_name', 'description', 'date_update').get(id=book_id))
+
+    @classmethod
+    def for_volume(cls, volume_id):
+        volume = Volume.objects.select_related('book').only(
+            'id', 'title', 'book', 'book__id', 'book__title', 'book__another_name', 'book__description', 'book__date_update',
+        ).get(id=volume_id)
+        return cls(volume.book, volume)
+
+    @property
+    def title(self):
+        if self.volume is not None:
+            return f'{self.book.title} - {self.volume.title}'
+        return self.book.title or 'Untitled'
+
+    @property
+    def slug(self):
+        return f'volume-{self.volume.id}' if self.volume is not None else f'book-{self.book.id}'
+
+    def volumes(self):
+        if self.volume is not None:
+            return [self.volume]
+        return list(Volume.objects.filter(book=self.book).only('id', 'title').order_by('id'))
+
+    def chapters(self):
+        """Đọc chương theo thứ tự tập / số chương, từng lô, không giữ cả sách trong RAM"""
+        chapters = Chapter.objects.only('id', 'title', 'number', 'content', 'volume').order_by('volume_id', 'number', 'id')
+        if self.volume is not None:
+            chapters = chapters.filter(volume=self.volume)
+        else:
+            chapters = chapters.filter(volume__book=self.book)
+        return chapters.iterator(chunk_size=CHUNK_SIZE)
+
+    def fingerprint(self):
+        """
+        Thay đổi khi có chương được thêm, sửa hoặc xoá trong phạm vi, hay khi
+        tên sách / tập đổi. Chỉ cần một query tổng hợp trên bảng chương.
+        """
+        if self.volume is not None:
+            chapters = Chapter.objects.filter(volume=self.volume)
+            volumes = [(self.volume.id, self.volume.title)]
+        else:
+            chapters = Chapter.objects.filter(volume__book=self.book)
+            volumes = [(volume.id, volume.title) for volume in self.volumes()]
+        stats = chapters.aggregate(count=Count('id'), last_update=Max('date_update'), last_id=Max('id'))
+        digest = hashlib.sha1()
+        for part in (self.title, self.book.date_update, volumes, stats['count'], stats['last_update'], stats['last_id']):
+            digest.update(repr(part).encode('utf-8'))
+        return digest.hexdigest()[:16]
+
+
+class _StreamBuffer:
+    """File-like không seek được: ZipFile ghi vào đây, generator lấy ra từng phần"""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _xhtml(html):
+    # Nội dung đã sanitize là HTML; EPUB cần XHTML nên các thẻ rỗng phải tự đóng
+    return VOID_TAG_RE.sub(lambda match: f'<{match.group(1)}{match.group(2).rstrip("/ ")}/>', html)
+
+
+def chapter_text(html):
+    text = BLOCK_END_RE.sub('\n', sanitize_html(html))
+    return '\n'.join(line.strip() for line in unescape(strip_tags(text)).splitlines() if line.strip())
+
+
+def _chapter_page(chapter):
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+        f'<head><title>{escape(chapter.title)}</title></head>\n'
+        f'<body><h2>{escape(chapter.title)}</h2>\n{_xhtml(sanitize_html(chapter.content))}</body></html>'
+    )
+
+
+def _nav_page(scope, entries):
+    items = []
+    for volume_title, chapters in entries:
+        links = ''.join(f'<li><a href="{name}">{escape(title)}</a></li>' for name, title in chapters)
+        items.append(f'<li><span>{escape(volume_title)}</span><ol>{links}</ol></li>')
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+        '<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">\n'
+        f'<head><title>{escape(scope.title)}</title></head>\n'
+        f'<body><nav epub:type="toc"><h1>{escape(scope.title)}</h1><ol>{"".join(items)}</ol></nav></body></html>'
+    )
+
+
+def _package_document(scope, names):
+    manifest = ''.join(
+        f'<item id="c{index}" href="{name}" media-type="application/xhtml+xml"/>' for index, name in enumerate(names)
+    )
+    spine = ''.join(f'<itemref idref="c{index}"/>' for index in range(len(names)))
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>\n'
+        '<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id">\n'
+        '<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">'
+        f'<dc:identifier id="book-id">urn:aiko:{scope.slug}</dc:identifier>'
+        f'<dc:title>{escape(scope.title)}</dc:title><dc:language>vi</dc:language>'
+        f'<meta property="dcterms:modified">{now().strftime("%Y-%m-%dT%H:%M:%SZ")}</meta></metadata>\n'
+        f'<manifest><item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav"/>{manifest}</manifest>\n'
+        f'<spine>{spine}</spine></package>'
+    )
+
+
+CONTAINER_XML = (
+    '<?xml version="1.0" encoding="utf-8"?>\n'
+    '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">'
+    '<rootfiles><rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml"/></rootfiles>'
+    '</container>'
+)
+
+
+def stream_epub(scope):
+    """
+    Sinh file EPUB theo từng phần bytes. Mỗi chương được ghi vào zip ngay khi
+    đọc ra từ database rồi trả về, nên bộ nhớ không phụ thuộc số chương; mục
+    lục và file OPF (chỉ cần tiêu đề và tên file) được ghi cuối cùng.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        # mimetype phải là file đầu tiên và không nén
+        archive.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+        archive.writestr('META-INF/container.xml', CONTAINER_XML)
+        yield buffer.drain()
+
+        volume_titles = {volume.id: volume.title for volume in scope.volumes()}
+        entries = []
+        names = []
+        for chapter in scope.chapters():
+            name = f'chapter-{len(names) + 1:05d}.xhtml'
+            archive.writestr(f'OEBPS/{name}', _chapter_page(chapter))
+            if not entries or entries[-1][0] != chapter.volume_id:
+                entries.append((chapter.volume_id, []))
+            entries[-1][1].append((name, chapter.title))
+            names.append(name)
+            yield buffer.drain()
+
+        archive.writestr('OEBPS/nav.xhtml', _nav_page(scope, [(volume_titles.get(volume_id, ''), chapters) for volume_id, chapters in entries]))
+        archive.writestr('OEBPS/content.opf', _package_document(scope, names))
+    yield buffer.drain()
+
+
+def stream_text(scope):
+    """Sinh file zip gồm một file .txt cho mỗi tập, ghi dần từng chương"""
+    buffer = _StreamBuffer()
+    volume_titles = {volume.id: volume.title for volume in scope.volumes()}
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        current_volume = None
+        handle = None
+        files = 0
+        for chapter in scope.chapters():
+            if chapter.volume_id != current_volume:
+                if handle is not None:
+                    handle.close()
+                current_volume = chapter.volume_id
+                files += 1
+                title = str(volume_titles.get(current_volume, current_volume)).replace('/', '-')
+                handle = archive.open(f'{files:03d} - {title}.txt', 'w')
+            handle.write(f'{chapter.title}\n\n{chapter_text(chapter.content)}\n\n\n'.encode('utf-8'))
+            yield buffer.drain()
+        if handle is not None:
+            handle.close()
+    yield buffer.drain()
+
+
+STREAMERS = {'epub': stream_epub, 'txt': stream_text}
+
+
+def artifact_name(scope, export_format, fingerprint=None):
+    extension = FORMATS[export_format][1]
+    return f'{EXPORT_DIR}/{scope.slug}-{fingerprint or scope.fingerprint()}.{extension}'
+
+
+def cached_artifact(scope, export_format):
+    """Tên file đã xuất trước đó nếu nội dung chưa đổi; None nếu phải tạo lại"""
+    name = artifact_name(scope, export_format)
+    return name if default_storage.exists(name) else None
+
+
+def stream_and_cache(scope, export_format, name):
+    """
+    Trả dữ liệu cho client đồng thời ghi ra file tạm; chỉ khi ghi xong trọn
+    vẹn mới đổi tên thành `name`, nên client ngắt giữa chừng không để lại file hỏng.
+    """
+    final_path = default_storage.path(name)
+    os.makedirs(os.path.dirname(final_path), exist_ok=True)
+    temp_path = f'{final_path}.{uuid.uuid4().hex}.tmp'
+    completed = False
+    try:
+        with open(temp_path, 'wb') as temp_file:
+            for chunk in STREAMERS[export_format](scope):
+                temp_file.write(chunk)
+                yield chunk
+        os.replace(temp_path, final_path)
+        completed = True
+        _remove_stale(scope, export_format, name)
+    finally:
+        if not completed and os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _remove_stale(scope, export_format, keep):
+    """Xoá các bản xuất cũ của cùng phạm vi / định dạng"""
+    extension = FORMATS[export_format][1]
+    _, files = default_storage.listdir(EXPORT_DIR)
+    for file_name in files:
+        name = f'{EXPORT_DIR}/{file_name}'
+        if name != keep and file_name.startswith(f'{scope.slug}-') and file_name.endswith(f'.{extension}'):
+            default_storage.delete(name)
+
+
+def download_name(scope, export_format):
+    safe_title = re.sub(r'[^\w\- ]+', '', scope.title, flags=re.UNICODE).strip() or scope.slug
+    return f'{safe_title}.{FORMATS[export_format][1]}'
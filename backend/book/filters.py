@@ -0,0 +1,15 @@
+import django_filters
+from .models import BookSummary
+
+
+class BookFilter(django_filters.FilterSet):
+    """Lọc danh sách truyện trên BookSummary; trạng thái nằm sẵn trong document, các quan hệ khác nối qua Book"""
+    category = django_filters.NumberFilter(field_name='book__categories', distinct=True)
+    status = django_filters.CharFilter(field_name='status_code')
+    team = django_filters.NumberFilter(field_name='book__teams', distinct=True)
+    author = django_filters.NumberFilter(field_name='book__authors', distinct=True)
+    pen_name = django_filters.CharFilter(field_name='book__authors__pen_name', distinct=True)
+
+    class Meta:
+        model = BookSummary
+        fields = ['category', 'status', 'team', 'author', 'pen_name']
@@ -0,0 +1,100 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from backend import benchmark, write_behind
+from book.synthetic import generate_catalog
+
+
+class Command(BaseCommand):
+    help = (
+        'Tạo database test, sinh dữ liệu giả lập rồi đo throughput và latency '
+        'p50/p95/p99 của các API chính; ghi báo cáo JSON để so sánh giữa các bản phát hành'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--books', type=int, default=2000)
+        parser.add_argument('--volumes-per-book', type=int, default=5)
+        parser.add_argument('--chapters-per-volume', type=int, default=4)
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--requests', type=int, default=200, help='Số request cho mỗi endpoint')
+        parser.add_argument('--concurrency', type=int, default=1)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Chỉ chạy endpoint này (lặp lại được)')
+        parser.add_argument('--output', help='Ghi báo cáo JSON ra file')
+        parser.add_argument('--compare', help='Báo cáo JSON cũ để phát hiện hồi quy')
+        parser.add_argument('--tolerance', type=float, default=benchmark.DEFAULT_TOLERANCE)
+        parser.add_argument('--keepdb', action='store_true', help='Giữ lại database test (và dữ liệu) giữa các lần chạy')
+
+    def handle(self, *args, **options):
+        # Không bao giờ chạy trên database thật: luôn tạo database test riêng
+        setup_test_environment()
+        # Lượt xem / tiến độ đọc còn chờ phải vào database test, không phải database thật lúc thoát
+        write_behind.disable_exit_flush()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            report = self._run(options)
+        finally:
+            write_behind.flush_all()
+            write_behind.discard_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        for name, result in report['endpoints'].items():
+            self.stdout.write(
+                f"{name:<24} {result['throughput_rps']:>9} req/s  p50 {result['p50_ms']:>8} ms  "
+                f"p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms  "
+                f"cold {result['cold_ms']:>8} ms  {result['queries']} queries  {result['errors']} errors"
+            )
+        if options['output']:
+            benchmark.write_report(report, options['output'])
+            self.stdout.write(f"Report written to {options['output']}")
+
+        failures = benchmark.endpoint_errors(report) + benchmark.budget_violations(report)
+        if options['compare']:
+            failures += benchmark.compare_reports(
+                benchmark.load_report(options['compare']), report, options['tolerance'],
+            )
+        if failures:
+            raise CommandError('Benchmark regressions:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
+
+    def _run(self, options):
+        from django.contrib.auth.models import User
+
+        prefix = 'bench'
+        if options['keepdb'] and User.objects.filter(username__startswith=f'{prefix}-user-').exists():
+            sample = self._existing_sample(prefix)
+        else:
+            self.stdout.write('Seeding synthetic catalog...')
+            sample = generate_catalog(
+                books=options['books'],
+                volumes_per_book=options['volumes_per_book'],
+                chapters_per_volume=options['chapters_per_volume'],
+                users=options['users'],
+                seed=options['seed'],
+                prefix=prefix,
+                log=self.stdout.write,
+            )
+        return benchmark.run_benchmark(
+            sample,
+            endpoints=options['endpoints'],
+            requests=options['requests'],
+            concurrency=options['concurrency'],
+            warmup=options['warmup'],
+            seed=options['seed'],
+        )
+
+    def _existing_sample(self, prefix):
+        from django.contrib.auth.models import User
+        from contributors.models import Author
+        from book.models import Book
+        from book.synthetic import PASSWORD
+
+        return {
+            'book_ids': list(Book.objects.filter(title__startswith=f'{prefix}-book-').values_list('id', flat=True)),
+            'pen_names': list(Author.objects.filter(pen_name__startswith=f'{prefix}-pen-').values_list('pen_name', flat=True)),
+            'usernames': list(User.objects.filter(username__startswith=f'{prefix}-user-').values_list('username', flat=True)),
+            'password': PASSWORD,
+        }
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from book import trending
+
+
+class Command(BaseCommand):
+    help = 'Ghi các lượt xem đang chờ rồi tính lại bảng xếp hạng truyện thịnh hành (chạy định kỳ bằng cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size', type=int, default=trending.TRENDING_SIZE, help='Số truyện mỗi bảng xếp hạng')
+
+    def handle(self, *args, **options):
+        trending.counter.flush()
+        counts = trending.compute_trending(size=options['size'])
+        summary = ', '.join(f'{count} {period}' for period, count in counts.items())
+        self.stdout.write(self.style.SUCCESS(f'Ranked {summary}.'))
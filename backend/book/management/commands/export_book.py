@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand, CommandError
+from book import export
+from book.models import Book, Volume
+
+
+class Command(BaseCommand):
+    help = 'Xuất một quyển sách (hoặc một tập) ra EPUB / zip .txt, dùng lại bản đã lưu nếu nội dung chưa đổi'
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_id', nargs='?', type=int)
+        parser.add_argument('--volume', type=int, help='Chỉ xuất tập này')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='epub')
+        parser.add_argument('--output', help='Ghi thêm một bản ra đường dẫn này')
+
+    def handle(self, *args, **options):
+        if not options['book_id'] and not options['volume']:
+            raise CommandError('Give a book id or --volume.')
+        try:
+            scope = export.ExportScope.for_volume(options['volume']) if options['volume'] else export.ExportScope.for_book(options['book_id'])
+        except (Book.DoesNotExist, Volume.DoesNotExist):
+            raise CommandError('Book or volume not found.')
+
+        export_format = options['format']
+        name = export.cached_artifact(scope, export_format)
+        if name is None:
+            name = export.artifact_name(scope, export_format)
+            for _ in export.stream_and_cache(scope, export_format, name):
+                pass
+            self.stdout.write(f'Exported {name}')
+        else:
+            self.stdout.write(f'Up to date: {name}')
+
+        if options['output']:
+            from django.core.files.storage import default_storage
+            with default_storage.open(name) as source, open(options['output'], 'wb') as target:
+                for chunk in source.chunks():
+                    target.write(chunk)
+            self.stdout.write(self.style.SUCCESS(f"Wrote {options['output']}"))
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from book import search
+from book.synthetic import BATCH_SIZE, generate_catalog
+
+
+class Command(BaseCommand):
+    help = 'Sinh dữ liệu giả lập (truyện, tập, chương, user, nhóm...) bằng bulk_create để test với catalog lớn'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=float, default=1.0, help='Nhân mọi số lượng với hệ số này')
+        parser.add_argument('--books', type=int, default=1000)
+        parser.add_argument('--volumes-per-book', type=int, default=4, help='Số tập trung bình mỗi truyện')
+        parser.add_argument('--chapters-per-volume', type=int, default=8, help='Số chương trung bình mỗi tập')
+        parser.add_argument('--users', type=int, default=500)
+        parser.add_argument('--teams', type=int, default=None, help='Mặc định: users / members-per-team')
+        parser.add_argument('--members-per-team', type=int, default=5)
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--min-chapter-size', type=int, default=2000, help='Độ dài HTML tối thiểu của chương (ký tự)')
+        parser.add_argument('--max-chapter-size', type=int, default=12000)
+        parser.add_argument('--co-author-ratio', type=float, default=0.2, help='Tỉ lệ truyện có đồng tác giả / nhóm phụ')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--prefix', default='synthetic', help='Tiền tố tên, đổi khi chạy nhiều lần trên cùng database')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--index', action='store_true', help='Xây lại chỉ mục tìm kiếm sau khi sinh dữ liệu')
+
+    def handle(self, *args, **options):
+        if options['min_chapter_size'] > options['max_chapter_size']:
+            raise CommandError('--min-chapter-size must not exceed --max-chapter-size.')
+        scale = options['scale']
+        scaled = lambda name: max(1, int(options[name] * scale))
+        teams = scaled('teams') if options['teams'] else None
+
+        with transaction.atomic():
+            summary = generate_catalog(
+                books=scaled('books'),
+                volumes_per_book=options['volumes_per_book'],
+                chapters_per_volume=options['chapters_per_volume'],
+                users=scaled('users'),
+                teams=teams,
+                categories=options['categories'],
+                chapter_size=(options['min_chapter_size'], options['max_chapter_size']),
+                co_author_ratio=options['co_author_ratio'],
+                members_per_team=options['members_per_team'],
+                seed=options['seed'],
+                prefix=options['prefix'],
+                batch_size=options['batch_size'],
+                log=self.stdout.write,
+            )
+        if options['index']:
+            self.stdout.write('Rebuilding search index...')
+            search.rebuild_index(batch_size=options['batch_size'])
+
+        counts = ', '.join(f'{value} {key}' for key, value in summary.items() if isinstance(value, int))
+        self.stdout.write(self.style.SUCCESS(f'Created {counts}.'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from book import summary
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại bản tóm tắt phi chuẩn hoá (BookSummary) của mọi truyện theo lô; chạy sau khi migrate lần đầu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('book_ids', nargs='*', type=int, help='Chỉ dựng lại các truyện này')
+        parser.add_argument('--batch-size', type=int, default=summary.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['book_ids']:
+            total = summary.refresh_summaries(options['book_ids'], batch_size=options['batch_size'])
+        else:
+            total = summary.rebuild_all(batch_size=options['batch_size'], log=self.stdout.write)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} book summaries.'))
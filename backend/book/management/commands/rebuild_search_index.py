@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from book import search
+
+
+class Command(BaseCommand):
+    help = 'Xây lại toàn bộ chỉ mục tìm kiếm sách theo lô'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chapters', action='store_true', help='Đánh chỉ mục cả nội dung chương')
+        parser.add_argument('--batch-size', type=int, default=search.BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        include_chapters = options['chapters'] or None
+        written = search.rebuild_index(include_chapters=include_chapters, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {written} search entries.'))
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from backend.mongo import indexes
+from backend.query_planner import plan_queryset
+from book import reading_progress, search, trending
+from book.models import Book, BookStatus, BookSummary, Chapter, Volume
+from book.serializers import BookSerializer
+from contributors.membership import load_membership
+
+
+def hot_queries():
+    """Truy vấn của các endpoint nóng, chạy bằng chính code của view với id mẫu lấy từ database"""
+    book_id = Book.objects.values_list('id', flat=True).first() or 0
+    chapter_id = Chapter.objects.values_list('id', flat=True).first() or 0
+    user_id = User.objects.values_list('id', flat=True).first() or 0
+    volume_ids = list(Volume.objects.filter(book_id=book_id).values_list('id', flat=True))
+    return [
+        ('book-list', lambda: list(BookSummary.objects.filter(is_deleted=False).order_by('-date_update', '-book')[:20])),
+        ('book-list ?status', lambda: list(
+            BookSummary.objects.filter(is_deleted=False, status_code='ongoing').order_by('-date_update', '-book')[:20]
+        )),
+        ('book-detail', lambda: list(plan_queryset(Book.objects.filter(id=book_id), BookSerializer))),
+        ('book-toc', lambda: (
+            list(Volume.objects.filter(book_id=book_id).order_by('id')),
+            list(Chapter.objects.filter(volume__in=volume_ids).order_by('volume', 'number')[:200]),
+        )),
+        ('chapter-read', lambda: Chapter.objects.filter(id=chapter_id).first()),
+        ('book-search', lambda: search.search('a', limit=20)),
+        ('book-trending', lambda: trending.trending_books('daily', 20)),
+        ('continue-reading', lambda: reading_progress.continue_reading(user_id)),
+        ('membership', lambda: load_membership(user_id)),
+        ('book-save status', lambda: BookStatus.objects.filter(code='ongoing').first()),
+        ('check-email', lambda: User.objects.filter(email='nobody@example.com').exists()),
+    ]
+
+
+class Command(BaseCommand):
+    help = (
+        'So index khai báo trong model với index thật của từng collection MongoDB, '
+        'tạo index còn thiếu và in explain plan của các truy vấn nóng'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ in thay đổi, không tạo / xoá index')
+        parser.add_argument('--drop', action='store_true', help='Xoá cả index có trong MongoDB nhưng không được khai báo')
+        parser.add_argument('--no-explain', action='store_true', help='Bỏ qua báo cáo explain')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'djongo':
+            raise CommandError(f"Database '{options['database']}' is not MongoDB")
+        connection.ensure_connection()
+        database = connection.connection
+
+        errors = []
+        for model in indexes.synced_models():
+            plan = indexes.index_plan(database, model)
+            for spec in plan.missing:
+                unique = ' unique' if spec.unique else ''
+                self.stdout.write(f'+ {plan.collection}.{spec.name}{unique} {list(spec.keys)}')
+            for name in plan.replaced:
+                self.stdout.write(f'~ {plan.collection}.{name} (wrong key, recreated)')
+            for name in plan.undeclared:
+                self.stdout.write(f"{'-' if options['drop'] else '?'} {plan.collection}.{name} (not declared)")
+            if not options['dry_run']:
+                errors += indexes.apply_plan(database, plan, drop_undeclared=options['drop'])
+        for error in errors:
+            self.stderr.write(self.style.ERROR(error))
+
+        if not options['no_explain']:
+            self._explain(database)
+        if errors:
+            raise CommandError(f'{len(errors)} indexes could not be created')
+        self.stdout.write(self.style.SUCCESS('Indexes are in sync.' if not options['dry_run'] else 'Dry run finished.'))
+
+    def _explain(self, database):
+        self.stdout.write('\nExplain plans of hot queries:')
+        for name, run in hot_queries():
+            for report in indexes.explain_queries(database, run):
+                line = (
+                    f"{name:<20} {report['collection']:<28} {' > '.join(report['stages']) or '?':<36} "
+                    f"index {', '.join(report['indexes']) or '-'}  "
+                    f"examined {report['docs_examined']} / returned {report['returned']}"
+                )
+                self.stdout.write(self.style.WARNING(line) if 'COLLSCAN' in report['stages'] else line)
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0008_auto_20250305_2149'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chapter',
+            name='date_update',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
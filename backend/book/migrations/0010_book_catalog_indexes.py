@@ -0,0 +1,21 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0009_chapter_date_update'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_deleted', '-date_update', '-id'], name='book_catalog_update_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='book',
+            index=models.Index(fields=['is_deleted', '-date_upload', '-id'], name='book_catalog_upload_idx'),
+        ),
+    ]
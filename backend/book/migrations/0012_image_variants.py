@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0011_searchentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='img_variants',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='volume',
+            name='img_variants',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:33
+
+import backend.image_utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0012_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='book',
+            name='img',
+            field=models.URLField(blank=True, default=backend.image_utils.default_cover_url, null=True),
+        ),
+        migrations.AlterField(
+            model_name='volume',
+            name='img',
+            field=models.URLField(blank=True, default=backend.image_utils.default_cover_url, null=True),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:56
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0014_readingprogress'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='book',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chapter',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='BookViewBucket',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='view_buckets', to='book.book')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TrendingBook',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hourly', 'Hourly'), ('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.FloatField()),
+                ('views', models.PositiveIntegerField(default=0)),
+                ('date_compute', models.DateTimeField()),
+                ('book', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='book.book')),
+            ],
+            options={
+                'ordering': ['period', 'rank'],
+                'unique_together': {('period', 'rank')},
+            },
+        ),
+        migrations.AddIndex(
+            model_name='bookviewbucket',
+            index=models.Index(fields=['hour'], name='view_bucket_hour_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='bookviewbucket',
+            unique_together={('book', 'hour')},
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0015_view_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BookSummary',
+            fields=[
+                ('book', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='book.book')),
+                ('title', models.CharField(blank=True, max_length=100, null=True)),
+                ('another_name', models.CharField(blank=True, max_length=200, null=True)),
+                ('img', models.URLField(blank=True, null=True)),
+                ('img_variants', models.JSONField(blank=True, default=None, null=True)),
+                ('status_name', models.CharField(blank=True, max_length=50, null=True)),
+                ('status_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('authors', models.JSONField(default=list)),
+                ('teams', models.JSONField(default=list)),
+                ('categories', models.JSONField(default=list)),
+                ('volume_count', models.PositiveIntegerField(default=0)),
+                ('chapter_count', models.PositiveIntegerField(default=0)),
+                ('latest_chapter', models.JSONField(blank=True, default=None, null=True)),
+                ('is_deleted', models.BooleanField(default=False)),
+                ('date_upload', models.DateField(blank=True, null=True)),
+                ('date_update', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='booksummary',
+            index=models.Index(fields=['is_deleted', '-date_update', '-book'], name='summary_catalog_update_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booksummary',
+            index=models.Index(fields=['is_deleted', '-date_upload', '-book'], name='summary_catalog_upload_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booksummary',
+            index=models.Index(fields=['status_code'], name='summary_status_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0016_booksummary'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='volume',
+            index=models.Index(fields=['book', 'id'], name='volume_book_idx'),
+        ),
+    ]
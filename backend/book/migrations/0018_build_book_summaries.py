@@ -0,0 +1,18 @@
+from django.db import migrations
+
+
+def build_summaries(apps, schema_editor):
+    # Truyện có từ trước khi thêm BookSummary chưa có bản tóm tắt (signal chỉ chạy khi dữ liệu đổi)
+    from book import summary
+    summary.rebuild_all(apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('book', '0017_volume_book_idx'),
+    ]
+
+    operations = [
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
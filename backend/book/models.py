@@ -1,8 +1,10 @@
 from django.db import models
-from backend.imgur_utils import upload_image_to_imgur
 from django.utils.timezone import now
 from contributors.models import *
 from ckeditor.fields import RichTextField
+from backend import reference_data
+from backend.image_utils import default_cover_url
+from images.models import ImageReferencesMixin
 
 class Category(models.Model):
     name = models.CharField(max_length=100)
@@ -19,12 +21,14 @@ class BookStatus(models.Model):
     def __str__(self):
         return self.name
 
-class Book(models.Model):
+class Book(ImageReferencesMixin, models.Model):
     id = models.AutoField(primary_key=True)
     title = models.CharField(max_length=100, null=True, blank=True)
     description = models.TextField(null=True, blank=True)
     another_name = models.CharField(max_length=200, null=True)
-    img = models.URLField(null=True, blank=True, default='https://i.imgur.com/OJbZSFy.jpeg') 
+    img = models.URLField(null=True, blank=True, default=default_cover_url) 
+    # Các biến thể thumbnail / cover / full của ảnh bìa theo từng định dạng
+    img_variants = models.JSONField(null=True, blank=True, default=None)
     authors = models.ManyToManyField(Author, through='BookAuthor', related_name='books')
     artist = models.CharField(max_length=100, null=True)
     status = models.ForeignKey(
@@ -42,13 +46,24 @@ class Book(models.Model):
     date_update = models.DateTimeField(auto_now=True)
     categories = models.ManyToManyField(Category, related_name='books', blank=True)
     is_deleted = models.BooleanField(default=False)
+    # Tăng dần theo lô từ bộ đếm trong RAM (book.trending), không cập nhật qua save()
+    view_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Phục vụ danh sách truyện: lọc is_deleted rồi phân trang keyset
+            models.Index(fields=['is_deleted', '-date_update', '-id'], name='book_catalog_update_idx'),
+            models.Index(fields=['is_deleted', '-date_upload', '-id'], name='book_catalog_upload_idx'),
+        ]
 
     def __str__(self):
         return self.title or "Unnamed Book"
 
     def save(self, *args, **kwargs):
-        if not self.status:
-            self.status = BookStatus.objects.filter(code='ongoing').first()
+        if self.status_id is None:
+            # Bảng trạng thái nằm sẵn trong RAM, không query mỗi lần lưu
+            ongoing = reference_data.book_statuses.get_by('code', 'ongoing')
+            self.status_id = ongoing.pk if ongoing else None
         super().save(*args, **kwargs)
 
 
@@ -76,12 +91,19 @@ class BookTeam(models.Model):
         role = "Nhóm chính" if self.is_main_team else "Nhóm phụ"
         return f"{self.team.name} ({role})"
     
-class Volume(models.Model):
+class Volume(ImageReferencesMixin, models.Model):
     book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name="volumes")
     title = models.CharField(max_length=200)
-    img = models.URLField(null=True, blank=True, default='https://i.imgur.com/OJbZSFy.jpeg') 
+    img = models.URLField(null=True, blank=True, default=default_cover_url) 
+    img_variants = models.JSONField(null=True, blank=True, default=None)
     date_upload = models.DateField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Mục lục: các tập của một truyện theo thứ tự id
+            models.Index(fields=['book', 'id'], name='volume_book_idx'),
+        ]
+
     def __str__(self):
         return f"{self.book.title} - {self.title}"
 
@@ -93,6 +115,8 @@ class Chapter(models.Model):
     number = models.FloatField()
     content = RichTextField()
     date_upload = models.DateField(auto_now_add=True)
+    date_update = models.DateTimeField(auto_now=True)
+    view_count = models.PositiveIntegerField(default=0)
 
     class Meta:
         unique_together = ('volume', 'number')
@@ -101,3 +125,119 @@ class Chapter(models.Model):
     def __str__(self):
         return f"{self.volume.book.title} - {self.volume.title} - Chap {self.number}"
 
+
+
+class ReadingProgress(models.Model):
+    """Chỗ đọc gần nhất của một user trong một truyện; mỗi cặp user / truyện một dòng"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reading_progress')
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='reading_progress')
+    chapter = models.ForeignKey(Chapter, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    # Vị trí cuộn trong chương (tỉ lệ 0..1 hoặc pixel, do client quy ước)
+    offset = models.FloatField(default=0)
+    date_update = models.DateTimeField(default=now)
+
+    class Meta:
+        unique_together = ('user', 'book')
+        indexes = [
+            # Danh sách "đọc tiếp" của một user, mới nhất trước
+            models.Index(fields=['user', '-date_update'], name='progress_user_recent_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} -> {self.book_id} ({self.chapter_id})"
+
+
+class BookSummary(models.Model):
+    """
+    Bản tóm tắt phi chuẩn hoá của một truyện (book.summary): tên tác giả, nhóm,
+    thể loại, trạng thái, số tập, chương mới nhất... nằm sẵn trong một document,
+    để danh sách / tìm kiếm / phần đầu trang chi tiết không phải nối nhiều collection.
+    """
+    book = models.OneToOneField(Book, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    title = models.CharField(max_length=100, null=True, blank=True)
+    another_name = models.CharField(max_length=200, null=True, blank=True)
+    img = models.URLField(null=True, blank=True)
+    img_variants = models.JSONField(null=True, blank=True, default=None)
+    status_name = models.CharField(max_length=50, null=True, blank=True)
+    status_code = models.CharField(max_length=20, null=True, blank=True)
+    # [{'id', 'pen_name', 'is_main_author'}]
+    authors = models.JSONField(default=list)
+    # [{'id', 'name', 'is_main_team'}]
+    teams = models.JSONField(default=list)
+    # [{'id', 'name'}]
+    categories = models.JSONField(default=list)
+    volume_count = models.PositiveIntegerField(default=0)
+    chapter_count = models.PositiveIntegerField(default=0)
+    # {'id', 'title', 'number', 'volume', 'date_upload'} hoặc None
+    latest_chapter = models.JSONField(null=True, blank=True, default=None)
+    is_deleted = models.BooleanField(default=False)
+    date_upload = models.DateField(null=True, blank=True)
+    date_update = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['is_deleted', '-date_update', '-book'], name='summary_catalog_update_idx'),
+            models.Index(fields=['is_deleted', '-date_upload', '-book'], name='summary_catalog_upload_idx'),
+            models.Index(fields=['status_code'], name='summary_status_idx'),
+        ]
+
+    def __str__(self):
+        return self.title or "Unnamed Book"
+
+
+class BookViewBucket(models.Model):
+    """Số lượt xem của một truyện trong một giờ; nguồn để tính xếp hạng thịnh hành"""
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='view_buckets')
+    hour = models.DateTimeField()
+    views = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('book', 'hour')
+        indexes = [
+            models.Index(fields=['hour'], name='view_bucket_hour_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.book_id} @ {self.hour}: {self.views}"
+
+
+class TrendingBook(models.Model):
+    """Bảng xếp hạng đã tính sẵn cho từng khoảng thời gian"""
+    PERIOD_CHOICES = [
+        ('hourly', 'Hourly'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+    ]
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    rank = models.PositiveIntegerField()
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+    views = models.PositiveIntegerField(default=0)
+    date_compute = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('period', 'rank')
+        ordering = ['period', 'rank']
+
+    def __str__(self):
+        return f"{self.period} #{self.rank}: {self.book_id}"
+
+
+class SearchEntry(models.Model):
+    """
+    Một dòng của chỉ mục đảo ngược: từ khoá (đã bỏ dấu) -> sách, kèm trọng số.
+    Entry của metadata sách có chapter = None, entry của nội dung chương trỏ tới chương.
+    """
+    term = models.CharField(max_length=64)
+    book = models.ForeignKey(Book, on_delete=models.CASCADE, related_name='search_entries')
+    chapter = models.ForeignKey(Chapter, on_delete=models.CASCADE, null=True, blank=True, related_name='search_entries')
+    weight = models.FloatField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'book'], name='search_term_idx'),
+            models.Index(fields=['book', 'chapter'], name='search_book_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.book_id}"
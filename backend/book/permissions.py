@@ -1,25 +1,43 @@
 from rest_framework.permissions import BasePermission
-from .models import TeamMember
-from contributors.models import Author
+from django.db.models import Q
+from contributors.membership import get_membership
+from .models import Book
 
 class IsAuthor(BasePermission):
     """
     Permission to check if the user is an author.
     """
     def has_permission(self, request, view):
-        user = request.user
-        # Kiểm tra nếu người dùng có đối tượng Author
-        return Author.objects.filter(user=user).exists()
+        # Kiểm tra nếu người dùng có đối tượng Author (đọc từ snapshot vai trò, không query lại)
+        return get_membership(request.user).is_author
 
 class IsLeaderOfTeam(BasePermission):
     """
     Permission to check if the user is the leader of a specific team.
     """
     def has_permission(self, request, view):
-        user = request.user
         team_id = view.kwargs.get('team_id')  # Lấy id nhóm từ URL
         if not team_id:
             return False
         
         # Kiểm tra nếu người dùng là trưởng nhóm của nhóm dịch
-        return TeamMember.objects.filter(user=user, team_id=team_id, role__name='Leader').exists()
\ No newline at end of file
+        return get_membership(request.user).is_leader_of(team_id)
+
+class IsVolumeContributor(BasePermission):
+    """
+    Permission to check if the user is an author of the volume's book or a member of one of its teams.
+    """
+    def has_permission(self, request, view):
+        user = request.user
+        volume_id = view.kwargs.get('volume_id')  # Lấy id tập từ URL
+        if not volume_id or not user.is_authenticated:
+            return False
+        if user.is_staff:
+            return True
+
+        membership = get_membership(user)
+        if not membership.is_author and not membership.teams:
+            return False
+        return Book.objects.filter(
+            Q(authors__id=membership.author_id) | Q(teams__id__in=list(membership.teams)), volumes__id=volume_id,
+        ).exists()
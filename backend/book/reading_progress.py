@@ -0,0 +1,108 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.timezone import now
+from backend.write_behind import WriteBehindBuffer
+from .content_cache import get_cached_chapter
+from .models import Chapter, ReadingProgress
+
+FLUSH_INTERVAL = getattr(settings, 'READING_PROGRESS_FLUSH_INTERVAL', 5.0)
+MAX_PENDING = getattr(settings, 'READING_PROGRESS_MAX_PENDING', 10000)
+CONTINUE_READING_LIMIT = 20
+CONTINUE_READING_MAX_LIMIT = 100
+
+
+def _write(batch):
+    """
+    Ghi một lô {(user_id, book_id): progress}. Dòng trong database mới hơn
+    (do process khác ghi) được giữ nguyên; chương / user đã bị xoá thì bỏ qua.
+    """
+    user_ids = {user_id for user_id, _ in batch}
+    book_ids = {book_id for _, book_id in batch}
+    chapter_ids = {progress['chapter_id'] for progress in batch.values()}
+    with transaction.atomic():
+        live_users = set(User.objects.filter(id__in=user_ids).values_list('id', flat=True))
+        live_chapters = set(Chapter.objects.filter(id__in=chapter_ids).values_list('id', flat=True))
+        existing = {
+            (row.user_id, row.book_id): row
+            for row in ReadingProgress.objects.filter(user_id__in=user_ids, book_id__in=book_ids)
+        }
+        to_create = []
+        to_update = []
+        for (user_id, book_id), progress in batch.items():
+            if user_id not in live_users or progress['chapter_id'] not in live_chapters:
+                continue
+            row = existing.get((user_id, book_id))
+            if row is None:
+                to_create.append(ReadingProgress(user_id=user_id, book_id=book_id, **progress))
+            elif row.date_update < progress['date_update']:
+                for field, value in progress.items():
+                    setattr(row, field, value)
+                to_update.append(row)
+        ReadingProgress.objects.bulk_create(to_create)
+        ReadingProgress.objects.bulk_update(to_update, ['chapter_id', 'offset', 'date_update'])
+
+
+buffer = WriteBehindBuffer('reading-progress', _write, interval=FLUSH_INTERVAL, max_pending=MAX_PENDING)
+
+
+def chapter_book_id(chapter_id):
+    """Truyện chứa chương; lấy từ bản render trong cache nếu có (thường có, vì user vừa đọc chương đó)"""
+    entry = get_cached_chapter(chapter_id)
+    if entry is not None and 'book' in entry:
+        return entry['book']
+    return Chapter.objects.filter(id=chapter_id).values_list('volume__book_id', flat=True).first()
+
+
+def record_progress(user_id, book_id, chapter_id, offset):
+    """Ghi nhận chỗ đọc; chỉ đưa vào buffer, việc ghi database diễn ra theo lô"""
+    progress = {'chapter_id': chapter_id, 'offset': offset, 'date_update': now()}
+    buffer.put((user_id, book_id), progress)
+    return dict(progress, book_id=book_id)
+
+
+def get_progress(user_id, book_id):
+    pending = buffer.get((user_id, book_id))
+    if pending is not None:
+        return dict(pending, book_id=book_id)
+    return ReadingProgress.objects.filter(user_id=user_id, book_id=book_id).values(
+        'book_id', 'chapter_id', 'offset', 'date_update',
+    ).first()
+
+
+def forget_progress(user_id, book_id):
+    """Xoá truyện khỏi lịch sử đọc của user"""
+    buffer.discard((user_id, book_id))
+    ReadingProgress.objects.filter(user_id=user_id, book_id=book_id).delete()
+
+
+def continue_reading(user_id, limit=CONTINUE_READING_LIMIT):
+    """
+    Các truyện user đọc gần đây, mới nhất trước: đọc theo index (user, -date_update)
+    rồi trộn với các lần ghi còn nằm trong buffer của process này.
+    """
+    pending = {
+        book_id: dict(progress, book_id=book_id)
+        for (pending_user, book_id), progress in buffer.pending().items() if pending_user == user_id
+    }
+    rows = ReadingProgress.objects.filter(user_id=user_id).order_by('-date_update').values(
+        'book_id', 'chapter_id', 'offset', 'date_update',
+    )[:limit + len(pending)]
+    items = {row['book_id']: row for row in rows}
+    for book_id, progress in pending.items():
+        if book_id not in items or items[book_id]['date_update'] < progress['date_update']:
+            items[book_id] = progress
+    items = sorted(items.values(), key=lambda item: item['date_update'], reverse=True)[:limit]
+
+    chapters = Chapter.objects.select_related('volume__book').only(
+        'id', 'title', 'number', 'volume', 'volume__id', 'volume__title', 'volume__book',
+        'volume__book__id', 'volume__book__title', 'volume__book__img', 'volume__book__img_variants',
+        'volume__book__is_deleted',
+    ).in_bulk([item['chapter_id'] for item in items if item['chapter_id']])
+    results = []
+    for item in items:
+        chapter = chapters.get(item['chapter_id'])
+        if chapter is None or chapter.volume.book.is_deleted:
+            continue
+        results.append(dict(item, chapter=chapter, book=chapter.volume.book))
+    return results
@@ -0,0 +1,173 @@
+import math
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from functools import reduce
+from operator import or_
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q, Sum
+from django.utils.html import strip_tags
+from .models import Book, Chapter, SearchEntry
+
+# Trọng số theo vị trí xuất hiện của từ khoá
+FIELD_WEIGHTS = {
+    'title': 10.0,
+    'another_name': 8.0,
+    'pen_name': 6.0,
+    'description': 2.0,
+    'chapter': 0.5,
+}
+MAX_TERM_LENGTH = 64
+# Tiền tố ngắn hơn ngưỡng này chỉ khớp chính xác để tránh quét quá nhiều từ
+MIN_PREFIX_LENGTH = 2
+# Mỗi từ là một subquery; từ thừa trong câu truy vấn quá dài bị bỏ
+MAX_QUERY_TOKENS = 8
+INDEX_CHAPTERS = getattr(settings, 'SEARCH_INDEX_CHAPTERS', False)
+BATCH_SIZE = 1000
+
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold(text):
+    """Chuyển về chữ thường và bỏ dấu tiếng Việt: 'Đường Tăng' -> 'duong tang'"""
+    text = (text or '').lower().replace('đ', 'd')
+    decomposed = unicodedata.normalize('NFD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(fold(text))]
+
+
+def _weigh(fields):
+    """Tính trọng số cho từng từ từ các cặp (field, text); tần suất được giảm dần theo log"""
+    weights = defaultdict(float)
+    for field, text in fields:
+        for term, count in Counter(tokenize(text)).items():
+            weights[term] += FIELD_WEIGHTS[field] * (1 + math.log(count))
+    return weights
+
+
+def _book_entries(book):
+    fields = [
+        ('title', book.title),
+        ('another_name', book.another_name),
+        ('description', book.description),
+    ]
+    fields += [('pen_name', author.pen_name) for author in book.authors.all()]
+    return [
+        SearchEntry(term=term, book_id=book.id, weight=weight)
+        for term, weight in _weigh(fields).items()
+    ]
+
+
+def _chapter_entries(chapter, book_id):
+    weights = _weigh([('chapter', strip_tags(chapter.content or ''))])
+    return [
+        SearchEntry(term=term, book_id=book_id, chapter_id=chapter.id, weight=weight)
+        for term, weight in weights.items()
+    ]
+
+
+def index_book(book):
+    """Đánh chỉ mục lại metadata của một quyển sách (không đụng tới entry của chương)"""
+    with transaction.atomic():
+        SearchEntry.objects.filter(book_id=book.id, chapter__isnull=True).delete()
+        SearchEntry.objects.bulk_create(_book_entries(book), batch_size=BATCH_SIZE)
+
+
+def index_book_by_id(book_id):
+    book = Book.objects.filter(id=book_id).prefetch_related('authors').first()
+    if book is not None:
+        index_book(book)
+
+
+def index_books(book_ids):
+    """Đánh chỉ mục lại metadata của nhiều sách bằng số query cố định (dùng sau các thao tác bulk)"""
+    books = list(Book.objects.filter(id__in=book_ids).only('id', 'title', 'another_name', 'description').prefetch_related('authors'))
+    with transaction.atomic():
+        SearchEntry.objects.filter(book_id__in=[book.id for book in books], chapter__isnull=True).delete()
+        entries = [entry for book in books for entry in _book_entries(book)]
+        SearchEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+def index_chapter(chapter):
+    if not INDEX_CHAPTERS:
+        return
+    with transaction.atomic():
+        SearchEntry.objects.filter(chapter_id=chapter.id).delete()
+        SearchEntry.objects.bulk_create(
+            _chapter_entries(chapter, chapter.volume.book_id), batch_size=BATCH_SIZE,
+        )
+
+
+def index_chapters(chapters, book_id):
+    """Đánh chỉ mục lại nhiều chương của cùng một sách (dùng sau các thao tác bulk)"""
+    if not INDEX_CHAPTERS:
+        return
+    chapters = list(chapters)
+    with transaction.atomic():
+        SearchEntry.objects.filter(chapter_id__in=[chapter.id for chapter in chapters]).delete()
+        entries = [entry for chapter in chapters for entry in _chapter_entries(chapter, book_id)]
+        SearchEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE)
+
+
+def rebuild_index(include_chapters=None, batch_size=BATCH_SIZE):
+    """
+    Xây lại toàn bộ chỉ mục, mỗi lô `batch_size` quyển sách trong một transaction
+    riêng: entry cũ của lô bị thay bằng entry mới cùng lúc, nên trong khi chạy
+    tìm kiếm vẫn thấy mọi sách. Trả về số entry đã ghi.
+    """
+    if include_chapters is None:
+        include_chapters = INDEX_CHAPTERS
+    books = Book.objects.only('id', 'title', 'another_name', 'description').prefetch_related('authors')
+    chapters = Chapter.objects.select_related('volume').only('id', 'content', 'volume', 'volume__book')
+    written = 0
+    last_id = 0
+    while True:
+        batch = list(books.filter(id__gt=last_id).order_by('id')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+        book_ids = [book.id for book in batch]
+        entries = [entry for book in batch for entry in _book_entries(book)]
+        if include_chapters:
+            for chapter in chapters.filter(volume__book_id__in=book_ids).iterator(chunk_size=batch_size):
+                entries.extend(_chapter_entries(chapter, chapter.volume.book_id))
+        with transaction.atomic():
+            SearchEntry.objects.filter(book_id__in=book_ids).delete()
+            SearchEntry.objects.bulk_create(entries, batch_size=batch_size)
+        written += len(entries)
+    return written
+
+
+def _token_condition(token, prefix):
+    if prefix and len(token) >= MIN_PREFIX_LENGTH:
+        return Q(term__startswith=token)
+    return Q(term=token)
+
+
+def search(query, limit=20, prefix=True, offset=0):
+    """
+    Tìm sách theo từ khoá, trả về danh sách (book_id, score) giảm dần theo score,
+    bỏ qua `offset` kết quả đầu.
+
+    Mọi từ trong câu truy vấn đều phải khớp; từ cuối cùng được khớp theo tiền tố
+    khi `prefix=True` để phục vụ gợi ý khi đang gõ. Lọc theo từ, cộng điểm theo
+    sách, sắp xếp và cắt trang đều chạy trong database: số dòng trả về chỉ bằng
+    kích thước trang, không phụ thuộc số entry khớp.
+    """
+    tokens = list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+
+    conditions = [Q(term=token) for token in tokens[:-1]] + [_token_condition(tokens[-1], prefix)]
+    entries = SearchEntry.objects.filter(reduce(or_, conditions), book__is_deleted=False)
+    if len(conditions) > 1:
+        # Sách phải có entry cho từng từ
+        for condition in conditions:
+            entries = entries.filter(book_id__in=SearchEntry.objects.filter(condition).values('book_id'))
+
+    ranked = entries.order_by().values('book_id').annotate(score=Sum('weight')).order_by('-score', 'book_id')
+    return [(row['book_id'], row['score']) for row in ranked[offset:offset + limit]]
@@ -1,20 +1,49 @@
-import django_filters
 from rest_framework import serializers
 from .models import *
+from contributors.membership import get_membership
 from contributors.serializers import AuthorSerializer, TeamSerializer
-from backend.image_utils import is_base64_string, save_base64_image
+from backend import reference_data
+from backend.image_utils import InvalidImageError, is_base64_string, save_base64_image
+from backend.reference_data import ReferenceRelatedField
+from backend.upload_queue import stage_image_upload
+from . import batch_update
 
 class ChapterSerializer(serializers.ModelSerializer):
     class Meta:
         model = Chapter
         fields = ['id', 'title', 'date_upload']
 
+class ImportChapterSerializer(serializers.Serializer):
+    number = serializers.FloatField(min_value=0)
+    title = serializers.CharField(max_length=200, required=False, allow_blank=True)
+    content = serializers.CharField(allow_blank=True, trim_whitespace=False)
+
+class ReadingProgressInputSerializer(serializers.Serializer):
+    chapter = serializers.IntegerField(min_value=1)
+    offset = serializers.FloatField(min_value=0, default=0)
+
+class ReadingProgressSerializer(serializers.Serializer):
+    book = serializers.IntegerField(source='book_id')
+    chapter = serializers.IntegerField(source='chapter_id', allow_null=True)
+    offset = serializers.FloatField()
+    date_update = serializers.DateTimeField()
+
+class TocChapterSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Chapter
+        fields = ['id', 'title', 'number', 'date_upload']
+
+class TocVolumeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Volume
+        fields = ['id', 'title', 'img', 'img_variants', 'date_upload']
+
 class VolumeSerializer(serializers.ModelSerializer):
     chapters = ChapterSerializer(many=True, read_only=True)
 
     class Meta:
         model = Volume
-        fields = ['id', 'title', 'date_upload', 'chapters', 'book', 'img']
+        fields = ['id', 'title', 'date_upload', 'chapters', 'book', 'img', 'img_variants']
 
 class CreateVolumeSerializer(serializers.ModelSerializer):
     img = serializers.CharField(required=False, allow_blank=True)
@@ -25,23 +54,29 @@ class CreateVolumeSerializer(serializers.ModelSerializer):
     
     def create(self, validated_data):
         img_data = validated_data.get('img', None)
+        pending_upload = None
         if img_data:
             if isinstance(img_data, str):
                 if img_data.startswith('http'):
                     # Nếu img là URL, lưu trực tiếp
                     validated_data['img'] = img_data
                 elif is_base64_string(img_data):
-                    # Nếu img là base64, lưu ảnh từ base64
-                    image_file = save_base64_image(img_data)
-                    validated_data['img'] = upload_image_to_imgur(image_file)  # Giả sử upload lên Imgur
+                    # Nếu img là base64, tạo các biến thể rồi upload lên Imgur ở nền
+                    try:
+                        pending_upload = stage_image_upload(save_base64_image(img_data))
+                    except InvalidImageError as e:
+                        raise serializers.ValidationError(str(e))
+                    validated_data['img'] = pending_upload.placeholder_url
+                    validated_data['img_variants'] = pending_upload.placeholder_variants
                 else:
                     raise serializers.ValidationError("Invalid image data format.")
 
-        return Volume.objects.create(**validated_data)
+        volume = Volume.objects.create(**validated_data)
+        if pending_upload:
+            pending_upload.submit(volume, 'img', 'img_variants')
+        return volume
 
 class CategorySerializer(serializers.ModelSerializer):
-    name = django_filters.CharFilter(lookup_expr='icontains')
-
     class Meta:
         model = Category
         fields = '__all__'
@@ -56,6 +91,44 @@ class BookSerializer(serializers.ModelSerializer):
         model = Book
         fields = '__all__'
 
+class BookSummarySerializer(serializers.ModelSerializer):
+    """Đọc từ bản tóm tắt phi chuẩn hoá (BookSummary): một document, không nối bảng"""
+    id = serializers.IntegerField(source='book_id', read_only=True)
+    status = serializers.CharField(source='status_code', read_only=True, allow_null=True)
+
+    class Meta:
+        model = BookSummary
+        fields = [
+            'id', 'title', 'another_name', 'img', 'img_variants', 'status', 'status_name', 'authors', 'teams',
+            'categories', 'volume_count', 'chapter_count', 'latest_chapter', 'date_upload', 'date_update',
+        ]
+
+class TrendingBookSerializer(serializers.ModelSerializer):
+    book = BookSummarySerializer(source='book.summary')
+
+    class Meta:
+        model = TrendingBook
+        fields = ['rank', 'score', 'views', 'book']
+
+class ContinueReadingSerializer(serializers.Serializer):
+    book = serializers.SerializerMethodField()
+    chapter = serializers.SerializerMethodField()
+    offset = serializers.FloatField()
+    date_update = serializers.DateTimeField()
+
+    def get_book(self, item):
+        book = item['book']
+        return {'id': book.id, 'title': book.title, 'img': book.img, 'img_variants': book.img_variants}
+
+    def get_chapter(self, item):
+        chapter = item['chapter']
+        return {
+            'id': chapter.id,
+            'title': chapter.title,
+            'number': chapter.number,
+            'volume': {'id': chapter.volume.id, 'title': chapter.volume.title},
+        }
+
 class BookStatusSerializer(serializers.ModelSerializer):
     class Meta:
         model = BookStatus
@@ -70,25 +143,23 @@ class CreateBookSerializer(serializers.ModelSerializer):
         # Tạo sách mới
         book = Book.objects.create(**validated_data)
 
-        # Lấy user hiện tại (tác giả)
-        user = self.context['request'].user
+        # Lấy vai trò của user hiện tại (đã được permission nạp sẵn, không query lại)
+        membership = get_membership(self.context['request'].user)
 
         # Kiểm tra xem user có phải là tác giả không
-        try:
-            author = Author.objects.get(user=user)
-        except Author.DoesNotExist:
+        if not membership.is_author:
             raise serializers.ValidationError("User is not an author.")
 
         # Thêm tác giả vào sách và đánh dấu là tác giả chính
-        BookAuthor.objects.create(book=book, author=author, is_main_author=True)
+        BookAuthor.objects.create(book=book, author_id=membership.author_id, is_main_author=True)
 
         return book
     
 class BookUpdateSerializer(serializers.ModelSerializer):
     authors = serializers.PrimaryKeyRelatedField(queryset=Author.objects.all(), many=True, required=False)
     teams = serializers.PrimaryKeyRelatedField(queryset=Team.objects.all(), many=True, required=False)
-    categories = serializers.PrimaryKeyRelatedField(queryset=Category.objects.all(), many=True, required=False)
-    status = serializers.PrimaryKeyRelatedField(queryset=BookStatus.objects.all(), required=False)
+    categories = ReferenceRelatedField(reference_data.categories, many=True, required=False)
+    status = ReferenceRelatedField(reference_data.book_statuses, required=False)
     img = serializers.CharField(required=False)
 
     class Meta:
@@ -103,18 +174,23 @@ class BookUpdateSerializer(serializers.ModelSerializer):
         instance.status = validated_data.get('status', instance.status)
         instance.note = validated_data.get('note', instance.note)
 
-        # Upload the image to Imgur
+        # Upload the image to Imgur (in the background)
         img_data = validated_data.get('img', None)
+        pending_upload = None
         if img_data:
             if isinstance(img_data, str):
                 if img_data.startswith('http'):
                     # Nếu img là URL, lưu trực tiếp
                     instance.img = img_data
+                    instance.img_variants = None
                 elif is_base64_string(img_data):
-                    # Nếu img là base64, lưu ảnh từ base64
-                    image_file = save_base64_image(img_data)
-                    # Giả sử bạn lưu ảnh vào hệ thống hoặc dịch vụ cloud
-                    instance.img = upload_image_to_imgur(image_file)  # Ví dụ upload lên Imgur
+                    # Nếu img là base64, lưu các biến thể tạm; worker sẽ thay bằng URL Imgur
+                    try:
+                        pending_upload = stage_image_upload(save_base64_image(img_data))
+                    except InvalidImageError as e:
+                        raise serializers.ValidationError(str(e))
+                    instance.img = pending_upload.placeholder_url
+                    instance.img_variants = pending_upload.placeholder_variants
                 else:
                     raise Exception("Invalid image data format.")
 
@@ -127,4 +203,48 @@ class BookUpdateSerializer(serializers.ModelSerializer):
             instance.categories.set(validated_data['categories'])
 
         instance.save()
-        return instance
\ No newline at end of file
+        if pending_upload:
+            pending_upload.submit(instance, 'img', 'img_variants')
+        return instance
+class RelationChangeSerializer(serializers.Serializer):
+    """Thay cả danh sách ('set') hoặc thêm / gỡ một số id ('add', 'remove')"""
+    set = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    add = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+    remove = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False)
+
+    def validate(self, data):
+        if 'set' in data and ('add' in data or 'remove' in data):
+            raise serializers.ValidationError("Use either 'set' or 'add'/'remove', not both.")
+        if not data:
+            raise serializers.ValidationError("Provide 'set', 'add' or 'remove'.")
+        if set(data.get('add', ())) & set(data.get('remove', ())):
+            raise serializers.ValidationError("The same id cannot be both added and removed.")
+        return data
+
+class BookBatchUpdateSerializer(serializers.Serializer):
+    books = serializers.ListField(child=serializers.IntegerField(min_value=1), min_length=1, max_length=batch_update.MAX_BOOKS)
+    status = ReferenceRelatedField(reference_data.book_statuses, required=False)
+    categories = RelationChangeSerializer(required=False)
+    teams = RelationChangeSerializer(required=False)
+    authors = RelationChangeSerializer(required=False)
+
+    def _validate_ids(self, change, existing):
+        ids = {related_id for values in change.values() for related_id in values}
+        missing = sorted(ids - existing(ids))
+        if missing:
+            raise serializers.ValidationError(f'Unknown ids: {missing}')
+        return change
+
+    def validate_categories(self, change):
+        return self._validate_ids(change, lambda ids: {pk for pk in ids if reference_data.categories.get(pk)})
+
+    def validate_teams(self, change):
+        return self._validate_ids(change, lambda ids: set(Team.objects.filter(id__in=ids).values_list('id', flat=True)))
+
+    def validate_authors(self, change):
+        return self._validate_ids(change, lambda ids: set(Author.objects.filter(id__in=ids).values_list('id', flat=True)))
+
+    def validate(self, data):
+        if len(data) == 1:
+            raise serializers.ValidationError('Nothing to update.')
+        return data
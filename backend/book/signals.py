@@ -0,0 +1,285 @@
+import threading
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from backend import reference_data
+from backend.response_cache import invalidate_tags
+from contributors.models import Author, Role, Team, TeamMember
+from . import search, summary
+from .content_cache import invalidate_chapter
+from .models import Book, BookAuthor, BookStatus, BookTeam, Category, Chapter, Volume
+
+_local = threading.local()
+
+
+@receiver([post_save, post_delete], sender=Chapter)
+def invalidate_chapter_content(sender, instance, **kwargs):
+    invalidate_chapter(instance.id)
+
+
+@receiver(post_save, sender=Book)
+def index_book(sender, instance, **kwargs):
+    search.index_book(instance)
+
+
+@receiver([post_save, post_delete], sender=BookAuthor)
+def index_book_authors(sender, instance, **kwargs):
+    search.index_book_by_id(instance.book_id)
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def index_book_authors_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        search.index_book_by_id(instance.id)
+    elif pk_set:
+        for book_id in pk_set:
+            search.index_book_by_id(book_id)
+
+
+@receiver(post_save, sender=Author)
+def index_author_books(sender, instance, **kwargs):
+    # Đổi bút danh thì các sách của tác giả phải được đánh chỉ mục lại
+    for book_id in BookAuthor.objects.filter(author=instance).values_list('book_id', flat=True):
+        search.index_book_by_id(book_id)
+
+
+@receiver(post_save, sender=Chapter)
+def index_chapter(sender, instance, **kwargs):
+    search.index_chapter(instance)
+
+
+# Xoá response đã cache của các API công khai khi dữ liệu bên dưới thay đổi
+
+def _book_id_of_volume(volume_id):
+    return Volume.objects.filter(id=volume_id).values_list('book_id', flat=True).first()
+
+
+def _book_id_of_chapter(chapter):
+    """book_id của chương, tra một lần cho mỗi instance dù nhiều handler cùng cần"""
+    cached = getattr(chapter, '_book_id', None)
+    if cached is None or cached[0] != chapter.volume_id:
+        if Chapter.volume.is_cached(chapter):
+            book_id = chapter.volume.book_id
+        else:
+            book_id = _book_id_of_volume(chapter.volume_id)
+        cached = chapter._book_id = (chapter.volume_id, book_id)
+    return cached[1]
+
+
+def _deleting_volumes():
+    volume_ids = getattr(_local, 'deleting_volumes', None)
+    if volume_ids is None:
+        volume_ids = _local.deleting_volumes = set()
+    return volume_ids
+
+
+@receiver(pre_delete, sender=Volume)
+def remember_deleting_volume(sender, instance, **kwargs):
+    # Chương bị xoá theo tập (hoặc theo sách) không cần tự làm mới: handler của Volume đã làm cho cả tập
+    _deleting_volumes().add(instance.id)
+
+
+@receiver(post_delete, sender=Volume)
+def forget_deleting_volume(sender, instance, **kwargs):
+    _deleting_volumes().discard(instance.id)
+
+
+def _deleted_with_volume(chapter, signal):
+    return signal is post_delete and chapter.volume_id in _deleting_volumes()
+
+
+def _pen_name_tags(author_ids):
+    return [f'pen-name:{pen_name}' for pen_name in Author.objects.filter(id__in=author_ids).values_list('pen_name', flat=True)]
+
+
+@receiver([post_save, post_delete], sender=Book)
+def invalidate_book_responses(sender, instance, **kwargs):
+    invalidate_tags(f'book:{instance.id}')
+
+
+@receiver([post_save, post_delete], sender=Volume)
+def invalidate_volume_responses(sender, instance, **kwargs):
+    invalidate_tags(f'book:{instance.book_id}')
+
+
+@receiver([post_save, post_delete], sender=Chapter)
+def invalidate_chapter_responses(sender, instance, signal, **kwargs):
+    if not _deleted_with_volume(instance, signal):
+        invalidate_tags(f'book:{_book_id_of_chapter(instance)}')
+
+
+@receiver([post_save, post_delete], sender=BookAuthor)
+def invalidate_book_author_responses(sender, instance, **kwargs):
+    invalidate_tags(f'book:{instance.book_id}', *_pen_name_tags([instance.author_id]))
+
+
+@receiver([post_save, post_delete], sender=BookTeam)
+def invalidate_book_team_responses(sender, instance, **kwargs):
+    invalidate_tags(f'book:{instance.book_id}')
+
+
+@receiver(m2m_changed, sender=Book.teams.through)
+@receiver(m2m_changed, sender=Book.categories.through)
+def invalidate_book_relation_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        invalidate_tags(f'book:{instance.id}')
+    elif action == 'post_clear':
+        # Không biết sách nào bị gỡ: xoá theo tag của chính nhóm / thể loại
+        invalidate_tags(f'team:{instance.id}' if sender is Book.teams.through else 'categories')
+    else:
+        invalidate_tags(*[f'book:{book_id}' for book_id in pk_set])
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+def invalidate_book_authors_responses(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # post_clear không có pk_set nên ghi lại trước những phía sẽ bị gỡ
+        related = instance.books if reverse else instance.authors
+        instance._cleared_ids = set(related.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if action == 'post_clear':
+        pk_set = getattr(instance, '_cleared_ids', set())
+    if not reverse:
+        invalidate_tags(f'book:{instance.id}', *_pen_name_tags(pk_set))
+    else:
+        invalidate_tags(f'pen-name:{instance.pen_name}', *[f'book:{book_id}' for book_id in pk_set])
+
+
+@receiver(pre_save, sender=Author)
+def remember_pen_name(sender, instance, update_fields=None, **kwargs):
+    # Đổi bút danh thì response của URL bút danh cũ cũng phải bị xoá
+    if instance.pk and (update_fields is None or 'pen_name' in update_fields):
+        instance._old_pen_name = Author.objects.filter(pk=instance.pk).values_list('pen_name', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Author)
+def invalidate_author_responses(sender, instance, **kwargs):
+    invalidate_tags(
+        f'author:{instance.id}', f'pen-name:{instance.pen_name}',
+        f'pen-name:{getattr(instance, "_old_pen_name", None) or instance.pen_name}',
+    )
+
+
+@receiver([post_save, post_delete], sender=Team)
+def invalidate_team_responses(sender, instance, **kwargs):
+    invalidate_tags(f'team:{instance.id}')
+
+
+@receiver([post_save, post_delete], sender=TeamMember)
+def invalidate_team_member_responses(sender, instance, **kwargs):
+    invalidate_tags(f'team:{instance.team_id}')
+
+
+@receiver(post_save, sender=Role)
+def invalidate_role_responses(sender, instance, created, **kwargs):
+    # Tên vai trò nằm trong danh sách thành viên nhóm; xoá vai trò thì TeamMember bị xoá theo và tự gửi signal
+    if not created:
+        team_ids = TeamMember.objects.filter(role=instance).values_list('team_id', flat=True).distinct()
+        invalidate_tags(*[f'team:{team_id}' for team_id in team_ids])
+
+
+@receiver(post_save, sender=User)
+def invalidate_username_responses(sender, instance, created, **kwargs):
+    # username của tác giả và thành viên nhóm nằm trong dữ liệu sách (_old_username do user.signals ghi lại)
+    old_username = getattr(instance, '_old_username', None)
+    if created or old_username is None or old_username == instance.username:
+        return
+    author_ids = Author.objects.filter(user=instance).values_list('id', flat=True)
+    team_ids = TeamMember.objects.filter(user=instance).values_list('team_id', flat=True)
+    invalidate_tags(*[f'author:{author_id}' for author_id in author_ids], *[f'team:{team_id}' for team_id in team_ids])
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalidate_category_responses(sender, instance, **kwargs):
+    invalidate_tags('categories')
+
+
+# Làm mới bản tóm tắt phi chuẩn hoá (book.summary) của các truyện bị ảnh hưởng
+
+@receiver(post_save, sender=Book)
+def refresh_book_summary(sender, instance, **kwargs):
+    summary.schedule_refresh(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Volume)
+@receiver([post_save, post_delete], sender=BookAuthor)
+@receiver([post_save, post_delete], sender=BookTeam)
+def refresh_related_summary(sender, instance, **kwargs):
+    summary.schedule_refresh(instance.book_id)
+
+
+@receiver([post_save, post_delete], sender=Chapter)
+def refresh_chapter_summary(sender, instance, signal, **kwargs):
+    if not _deleted_with_volume(instance, signal):
+        summary.schedule_refresh(_book_id_of_chapter(instance))
+
+
+@receiver(m2m_changed, sender=Book.authors.through)
+@receiver(m2m_changed, sender=Book.teams.through)
+@receiver(m2m_changed, sender=Book.categories.through)
+def refresh_relation_summaries(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        # post_clear không có pk_set: ghi lại các sách sẽ bị gỡ
+        instance._summary_book_ids = set(instance.books.values_list('id', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        summary.schedule_refresh(instance.id)
+    elif action == 'post_clear':
+        summary.schedule_refresh(*getattr(instance, '_summary_book_ids', ()))
+    else:
+        summary.schedule_refresh(*pk_set)
+
+
+@receiver(post_save, sender=Author)
+def refresh_author_summaries(sender, instance, created, **kwargs):
+    if not created and getattr(instance, '_old_pen_name', instance.pen_name) != instance.pen_name:
+        summary.schedule_refresh(*BookAuthor.objects.filter(author=instance).values_list('book_id', flat=True))
+
+
+@receiver(post_save, sender=Team)
+def refresh_team_summaries(sender, instance, created, **kwargs):
+    if not created:
+        summary.schedule_refresh(*BookTeam.objects.filter(team=instance).values_list('book_id', flat=True))
+
+
+@receiver(post_save, sender=Category)
+def refresh_category_summaries(sender, instance, created, **kwargs):
+    if not created:
+        summary.schedule_refresh(*instance.books.values_list('id', flat=True))
+
+
+@receiver(post_save, sender=BookStatus)
+def refresh_status_summaries(sender, instance, created, **kwargs):
+    if not created:
+        summary.schedule_refresh(*instance.books.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=BookStatus)
+def remember_summary_books(sender, instance, **kwargs):
+    # Xoá thể loại / trạng thái không gửi signal cho bảng trung gian hay cho Book
+    instance._summary_book_ids = set(instance.books.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=BookStatus)
+def refresh_deleted_relation_summaries(sender, instance, **kwargs):
+    summary.schedule_refresh(*getattr(instance, '_summary_book_ids', ()))
+
+
+@receiver([post_save, post_delete], sender=BookStatus)
+def refresh_book_statuses(sender, instance, **kwargs):
+    reference_data.book_statuses.invalidate()
+
+
+@receiver([post_save, post_delete], sender=Category)
+def refresh_categories(sender, instance, **kwargs):
+    reference_data.categories.invalidate()
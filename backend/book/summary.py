@@ -0,0 +1,155 @@
+import operator
+import threading
+from collections import defaultdict
+from functools import reduce
+from django.apps import apps as global_apps
+from django.db import transaction
+from django.db.models import Count, Max, Q
+
+BATCH_SIZE = 500
+FIELDS = [
+    'title', 'another_name', 'img', 'img_variants', 'status_name', 'status_code', 'authors', 'teams',
+    'categories', 'volume_count', 'chapter_count', 'latest_chapter', 'is_deleted', 'date_upload', 'date_update',
+]
+
+_local = threading.local()
+
+
+def _build(book_ids, apps):
+    """
+    Dựng bản tóm tắt cho cả lô bằng một số query cố định (mỗi loại quan hệ
+    một query cho mọi truyện), không phụ thuộc số truyện trong lô.
+    """
+    Book, BookAuthor, BookSummary, BookTeam, Chapter, Volume = (
+        apps.get_model('book', name) for name in ('Book', 'BookAuthor', 'BookSummary', 'BookTeam', 'Chapter', 'Volume')
+    )
+    books = Book.objects.filter(id__in=book_ids).select_related('status').only(
+        'id', 'title', 'another_name', 'img', 'img_variants', 'is_deleted', 'date_upload', 'date_update',
+        'status__name', 'status__code',
+    )
+    authors = defaultdict(list)
+    for book_id, author_id, pen_name, is_main in BookAuthor.objects.filter(book_id__in=book_ids).order_by(
+        '-is_main_author', 'id',
+    ).values_list('book_id', 'author_id', 'author__pen_name', 'is_main_author'):
+        authors[book_id].append({'id': author_id, 'pen_name': pen_name, 'is_main_author': is_main})
+    teams = defaultdict(list)
+    for book_id, team_id, name, is_main in BookTeam.objects.filter(book_id__in=book_ids).order_by(
+        '-is_main_team', 'id',
+    ).values_list('book_id', 'team_id', 'team__name', 'is_main_team'):
+        teams[book_id].append({'id': team_id, 'name': name, 'is_main_team': is_main})
+    categories = defaultdict(list)
+    for book_id, category_id, name in Book.categories.through.objects.filter(book_id__in=book_ids).order_by(
+        'category_id',
+    ).values_list('book_id', 'category_id', 'category__name'):
+        categories[book_id].append({'id': category_id, 'name': name})
+    volume_counts = dict(
+        Volume.objects.filter(book_id__in=book_ids).order_by().values('book_id').annotate(count=Count('id')).values_list('book_id', 'count')
+    )
+    chapter_stats = {
+        row['volume__book_id']: row
+        # order_by() bỏ Meta.ordering của Chapter, nếu không 'number' sẽ lọt vào GROUP BY
+        for row in Chapter.objects.filter(volume__book_id__in=book_ids).order_by().values('volume__book_id').annotate(
+            count=Count('id'), last_volume=Max('volume_id'),
+        )
+    }
+    # Chương mới nhất là chương có số lớn nhất của tập cuối (tập xếp theo id như mục lục),
+    # không phải chương thêm sau cùng: chương bổ sung cho tập cũ không được tính
+    last_numbers = list(
+        Chapter.objects.filter(volume_id__in=[row['last_volume'] for row in chapter_stats.values()]).order_by()
+        .values('volume_id').annotate(last_number=Max('number')).values_list('volume_id', 'last_number')
+    )
+    latest = {
+        chapter['volume_id']: chapter
+        for chapter in Chapter.objects.filter(
+            reduce(operator.or_, (Q(volume_id=volume_id, number=number) for volume_id, number in last_numbers)),
+        ).values('id', 'title', 'number', 'volume_id', 'date_upload')
+    } if last_numbers else {}
+
+    summaries = []
+    for book in books:
+        stats = chapter_stats.get(book.id)
+        chapter = latest.get(stats['last_volume']) if stats else None
+        summaries.append(BookSummary(
+            book_id=book.id,
+            title=book.title,
+            another_name=book.another_name,
+            img=book.img,
+            img_variants=book.img_variants,
+            status_name=book.status.name if book.status else None,
+            status_code=book.status.code if book.status else None,
+            authors=authors[book.id],
+            teams=teams[book.id],
+            categories=categories[book.id],
+            volume_count=volume_counts.get(book.id, 0),
+            chapter_count=stats['count'] if stats else 0,
+            latest_chapter={
+                'id': chapter['id'],
+                'title': chapter['title'],
+                'number': chapter['number'],
+                'volume': chapter['volume_id'],
+                'date_upload': chapter['date_upload'].isoformat(),
+            } if chapter else None,
+            is_deleted=book.is_deleted,
+            date_upload=book.date_upload,
+            date_update=book.date_update,
+        ))
+    return summaries
+
+
+def refresh_summaries(book_ids, batch_size=BATCH_SIZE, apps=global_apps):
+    """
+    Dựng lại bản tóm tắt của các truyện này (truyện đã bị xoá thì bỏ qua).
+    `apps` là registry model, để data migration truyền model lịch sử vào.
+    """
+    BookSummary = apps.get_model('book', 'BookSummary')
+    book_ids = sorted({book_id for book_id in book_ids if book_id is not None})
+    refreshed = 0
+    for start in range(0, len(book_ids), batch_size):
+        batch = book_ids[start:start + batch_size]
+        summaries = _build(batch, apps)
+        with transaction.atomic():
+            existing = set(BookSummary.objects.filter(book_id__in=batch).values_list('book_id', flat=True))
+            BookSummary.objects.bulk_create([summary for summary in summaries if summary.book_id not in existing])
+            BookSummary.objects.bulk_update([summary for summary in summaries if summary.book_id in existing], FIELDS)
+        refreshed += len(summaries)
+    return refreshed
+
+
+def rebuild_all(batch_size=BATCH_SIZE, log=None, apps=global_apps):
+    """Dựng lại toàn bộ, theo lô id tăng dần"""
+    Book = apps.get_model('book', 'Book')
+    last_id = 0
+    total = 0
+    while True:
+        book_ids = list(Book.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not book_ids:
+            return total
+        total += refresh_summaries(book_ids, batch_size, apps)
+        last_id = book_ids[-1]
+        if log:
+            log(f'{total} summaries rebuilt')
+
+
+def _pending():
+    book_ids = getattr(_local, 'book_ids', None)
+    if book_ids is None:
+        book_ids = _local.book_ids = set()
+    return book_ids
+
+
+def _flush_pending():
+    book_ids = _pending()
+    if book_ids:
+        _local.book_ids = set()
+        refresh_summaries(book_ids)
+
+
+def schedule_refresh(*book_ids):
+    """
+    Đánh dấu truyện cần làm mới; việc dựng lại chạy một lần cho cả transaction
+    sau khi commit, nên nhiều thay đổi trong cùng transaction chỉ tốn một lô.
+    """
+    book_ids = {book_id for book_id in book_ids if book_id is not None}
+    if book_ids:
+        _pending().update(book_ids)
+        transaction.on_commit(_flush_pending)
@@ -0,0 +1,200 @@
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from contributors.models import Author, Role, Team, TeamMember, TeamType
+from user.models import UserInfo
+from . import summary
+from .models import Book, BookAuthor, BookStatus, BookTeam, Category, Chapter, Volume
+
+BATCH_SIZE = 1000
+PASSWORD = 'benchmark-password'
+
+WORDS = (
+    'truyện', 'nhân vật', 'thế giới', 'phép thuật', 'hành trình', 'bí mật', 'ánh sáng', 'bóng tối',
+    'thanh kiếm', 'học viện', 'vương quốc', 'rồng', 'ký ức', 'lời hứa', 'cô gái', 'chàng trai',
+    'mùa hè', 'thành phố', 'chiến tranh', 'định mệnh', 'giấc mơ', 'nụ cười', 'bầu trời', 'ngày mai',
+)
+STATUSES = (('Đang tiến hành', 'ongoing'), ('Đã hoàn thành', 'completed'), ('Tạm ngưng', 'paused'))
+ROLES = ('Leader', 'Translator', 'Editor', 'Member')
+TEAM_TYPES = ('Translation', 'Composition')
+# Số đoạn văn soạn sẵn; nội dung chương được ghép từ các đoạn này cho nhanh
+PARAGRAPH_POOL = 256
+
+
+def _bulk_create(model, objects, batch_size=BATCH_SIZE):
+    for start in range(0, len(objects), batch_size):
+        model.objects.bulk_create(objects[start:start + batch_size], batch_size=batch_size)
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def _paragraph_pool(rng):
+    pool = []
+    for index in range(PARAGRAPH_POOL):
+        text = '. '.join(_sentence(rng, rng.randint(8, 20)).capitalize() for _ in range(rng.randint(2, 6)))
+        if index % 7 == 0:
+            text = f'<strong>{text}</strong>'
+        elif index % 11 == 0:
+            text = f'<em>{text}</em>'
+        pool.append(f'<p>{text}.</p>')
+    return pool
+
+
+def _html(rng, pool, size):
+    """Ghép các đoạn văn cho tới khi đạt khoảng `size` ký tự"""
+    parts = []
+    total = 0
+    while total < size:
+        paragraph = rng.choice(pool)
+        parts.append(paragraph)
+        total += len(paragraph)
+    return ''.join(parts)
+
+
+def _spread(rng, average):
+    """Số ngẫu nhiên trong [1, 2 * average - 1], trung bình xấp xỉ `average`"""
+    return rng.randint(1, max(1, 2 * average - 1))
+
+
+def generate_catalog(books=100, volumes_per_book=3, chapters_per_volume=10, users=50, teams=None,
+                     categories=20, chapter_size=(2000, 12000), co_author_ratio=0.2, members_per_team=5,
+                     seed=0, prefix='bench', batch_size=BATCH_SIZE, log=None):
+    """
+    Sinh một catalog giả lập bằng bulk_create theo lô.
+
+    Cùng `seed` và cùng tham số thì dữ liệu sinh ra giống hệt nhau. Số tập mỗi
+    truyện và số chương mỗi tập dao động quanh giá trị trung bình; nội dung
+    chương là HTML dài trong khoảng `chapter_size` ký tự. Mọi tên đều mang
+    `prefix` để chạy nhiều lần không trùng, và id được đọc lại theo các tên này
+    vì bulk_create không trả về id trên mọi backend. Không gửi signal, nên bản
+    tóm tắt truyện được dựng ở cuối hàm, còn chỉ mục tìm kiếm cần được xây lại sau đó.
+
+    Trả về dict tóm tắt số lượng đã tạo kèm vài khoá mẫu để gọi API.
+    """
+    rng = random.Random(seed)
+    log = log or (lambda message: None)
+    teams = teams if teams is not None else max(1, users // members_per_team)
+    pool = _paragraph_pool(rng)
+
+    statuses = [
+        BookStatus.objects.get_or_create(code=code, defaults={'name': name})[0]
+        for name, code in STATUSES
+    ]
+    roles = [Role.objects.get_or_create(name=name)[0] for name in ROLES]
+    team_types = [TeamType.objects.get_or_create(name=name)[0] for name in TEAM_TYPES]
+    _bulk_create(Category, [
+        Category(name=f'{prefix}-category-{i}', description=_sentence(rng, 12)[:200]) for i in range(categories)
+    ], batch_size)
+    category_ids = list(Category.objects.filter(name__startswith=f'{prefix}-category-').values_list('id', flat=True))
+
+    log(f'Creating {users} users...')
+    # Hash mật khẩu một lần: PBKDF2 cho từng user sẽ chiếm gần hết thời gian chạy
+    password = make_password(PASSWORD)
+    _bulk_create(User, [
+        User(username=f'{prefix}-user-{i}', email=f'{prefix}-user-{i}@example.com', password=password)
+        for i in range(users)
+    ], batch_size)
+    user_ids = list(User.objects.filter(username__startswith=f'{prefix}-user-').order_by('id').values_list('id', flat=True))
+    _bulk_create(UserInfo, [
+        UserInfo(user_id=user_id, full_name=_sentence(rng, 3).title()[:100]) for user_id in user_ids
+    ], batch_size)
+    _bulk_create(Author, [Author(user_id=user_id, pen_name=f'{prefix}-pen-{user_id}') for user_id in user_ids], batch_size)
+    authors = list(Author.objects.filter(pen_name__startswith=f'{prefix}-pen-').values_list('id', 'pen_name'))
+
+    log(f'Creating {teams} teams...')
+    _bulk_create(Team, [
+        Team(name=f'{prefix}-team-{i}', description=_sentence(rng, 10), type=rng.choice(team_types))
+        for i in range(teams)
+    ], batch_size)
+    team_ids = list(Team.objects.filter(name__startswith=f'{prefix}-team-').values_list('id', flat=True))
+    members = []
+    for index, team_id in enumerate(team_ids):
+        team_users = rng.sample(user_ids, min(len(user_ids), members_per_team))
+        for position, user_id in enumerate(team_users):
+            members.append(TeamMember(user_id=user_id, team_id=team_id, role=roles[0] if position == 0 else rng.choice(roles[1:])))
+    _bulk_create(TeamMember, members, batch_size)
+
+    log(f'Creating {books} books...')
+    volume_counts = [_spread(rng, volumes_per_book) for _ in range(books)]
+    _bulk_create(Book, [
+        Book(
+            title=f'{prefix}-book-{i}',
+            another_name=_sentence(rng, 4).title(),
+            description=_html(rng, pool, rng.randint(300, 1500)),
+            artist=_sentence(rng, 2).title(),
+            note=_sentence(rng, 8),
+            status=rng.choice(statuses),
+            quantity_volome=volume_counts[i],
+        )
+        for i in range(books)
+    ], batch_size)
+    book_ids = list(Book.objects.filter(title__startswith=f'{prefix}-book-').order_by('id').values_list('id', flat=True))
+
+    book_authors = []
+    book_teams = []
+    book_categories = []
+    through = Book.categories.through
+    for book_id in book_ids:
+        picked = rng.sample(authors, 2 if len(authors) > 1 and rng.random() < co_author_ratio else 1)
+        book_authors += [
+            BookAuthor(book_id=book_id, author_id=author_id, is_main_author=position == 0)
+            for position, (author_id, _) in enumerate(picked)
+        ]
+        picked = rng.sample(team_ids, 2 if len(team_ids) > 1 and rng.random() < co_author_ratio else 1)
+        book_teams += [
+            BookTeam(book_id=book_id, team_id=team_id, is_main_team=position == 0)
+            for position, team_id in enumerate(picked)
+        ]
+        book_categories += [
+            through(book_id=book_id, category_id=category_id)
+            for category_id in rng.sample(category_ids, min(len(category_ids), rng.randint(1, 4)))
+        ]
+    _bulk_create(BookAuthor, book_authors, batch_size)
+    _bulk_create(BookTeam, book_teams, batch_size)
+    _bulk_create(through, book_categories, batch_size)
+
+    log(f'Creating {sum(volume_counts)} volumes...')
+    _bulk_create(Volume, [
+        Volume(book_id=book_id, title=f'Tập {number + 1}')
+        for book_id, count in zip(book_ids, volume_counts) for number in range(count)
+    ], batch_size)
+    volume_ids = list(
+        Volume.objects.filter(book__title__startswith=f'{prefix}-book-').order_by('id').values_list('id', flat=True)
+    )
+
+    # Chương được tạo và ghi từng lô để không giữ toàn bộ nội dung trong RAM
+    log('Creating chapters...')
+    chapters = 0
+    batch = []
+    for volume_id in volume_ids:
+        for number in range(_spread(rng, chapters_per_volume)):
+            batch.append(Chapter(
+                volume_id=volume_id,
+                title=f'Chương {number + 1}: {_sentence(rng, 4)}',
+                number=number + 1,
+                content=_html(rng, pool, rng.randint(*chapter_size)),
+            ))
+            if len(batch) >= batch_size:
+                Chapter.objects.bulk_create(batch, batch_size=batch_size)
+                chapters += len(batch)
+                batch = []
+    Chapter.objects.bulk_create(batch, batch_size=batch_size)
+    chapters += len(batch)
+
+    log('Building book summaries...')
+    summary.refresh_summaries(book_ids, batch_size=batch_size)
+
+    return {
+        'books': len(book_ids),
+        'volumes': len(volume_ids),
+        'chapters': chapters,
+        'users': len(user_ids),
+        'teams': len(team_ids),
+        'categories': len(category_ids),
+        'book_ids': book_ids,
+        'pen_names': [pen_name for _, pen_name in authors],
+        'usernames': [f'{prefix}-user-{i}' for i in range(users)],
+        'password': PASSWORD,
+    }
@@ -0,0 +1,741 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import transaction
+from django.http import FileResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.test import APIClient
+from backend import write_behind
+from . import batch_update, export, reading_progress, search, signals, summary, trending
+from .chapter_import import ChapterImportError, import_chapters, parse_upload
+from .models import *
+
+
+# Đo query của chính view nên tắt cache response
+@override_settings(CACHES={
+    **settings.CACHES,
+    'responses': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+})
+class BookDetailQueryCountTest(TestCase):
+    # book, authors, categories, teams, team members, volumes, chapters
+    EXPECTED_QUERIES = 7
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.status = BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.book = Book.objects.create(title='Test book')
+        leader = Role.objects.create(name='Leader')
+        for i in range(3):
+            user = User.objects.create_user(username=f'user{i}', password='password123')
+            author = Author.objects.create(user=user, pen_name=f'pen{i}')
+            BookAuthor.objects.create(book=cls.book, author=author, is_main_author=(i == 0))
+            team = Team.objects.create(name=f'team{i}')
+            TeamMember.objects.create(user=user, team=team, role=leader)
+            BookTeam.objects.create(book=cls.book, team=team)
+            cls.book.categories.add(Category.objects.create(name=f'category{i}', description=''))
+
+    def add_volumes(self, count, chapters_per_volume):
+        for i in range(count):
+            volume = Volume.objects.create(book=self.book, title=f'Volume {i}')
+            for number in range(chapters_per_volume):
+                Chapter.objects.create(volume=volume, title=f'Chap {number}', number=number, content='<p>...</p>')
+
+    def get_detail(self):
+        return self.client.get(reverse('book-detail', args=[self.book.id]))
+
+    def test_detail_query_count_is_constant(self):
+        self.add_volumes(2, 2)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.get_detail()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['volumes']), 2)
+
+        self.add_volumes(8, 10)
+        with self.assertNumQueries(self.EXPECTED_QUERIES):
+            response = self.get_detail()
+        self.assertEqual(len(response.data['volumes']), 10)
+        self.assertEqual(len(response.data['volumes'][-1]['chapters']), 10)
+
+    def test_detail_payload(self):
+        self.add_volumes(1, 3)
+        data = self.get_detail().data
+        self.assertEqual(data['status'], self.status.id)
+        self.assertEqual(sorted(a['username'] for a in data['authors']), ['user0', 'user1', 'user2'])
+        self.assertEqual(data['teams'][0]['members'][0]['role']['name'], 'Leader')
+        self.assertEqual([c['title'] for c in data['volumes'][0]['chapters']], ['Chap 0', 'Chap 1', 'Chap 2'])
+
+
+class ChapterReadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.book = Book.objects.create(title='Test book')
+        volume = Volume.objects.create(book=cls.book, title='Volume 1')
+        cls.chapter = Chapter.objects.create(volume=volume, title='Chap 1', number=1, content='<p>Nội dung.</p>' * 100)
+
+    def setUp(self):
+        cache.clear()
+        write_behind.discard_all()
+
+    def read(self, **headers):
+        return self.client.get(reverse('chapter-read', args=[self.chapter.id]), **headers)
+
+    def test_revalidation_returns_304_and_is_not_counted(self):
+        response = self.read()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.content)['title'], 'Chap 1')
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        for headers in (
+            {'HTTP_IF_NONE_MATCH': etag},
+            {'HTTP_IF_NONE_MATCH': f'"other", W/{etag}'},
+            {'HTTP_IF_NONE_MATCH': '*'},
+            {'HTTP_IF_MODIFIED_SINCE': last_modified},
+        ):
+            response = self.read(**headers)
+            self.assertEqual(response.status_code, 304, headers)
+            self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.read(HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+        # Hai lượt tải nội dung, các lần 304 không tính
+        self.assertEqual(trending.counter.pending()[('chapter', self.chapter.id)], 2)
+
+    def test_compressed_variant_is_negotiated(self):
+        identity = self.read().content
+        response = self.read(HTTP_ACCEPT_ENCODING='br;q=0, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), identity)
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertFalse(self.read(HTTP_ACCEPT_ENCODING='gzip;q=0').has_header('Content-Encoding'))
+
+    def test_saving_the_chapter_invalidates_the_render(self):
+        etag = self.read()['ETag']
+        self.chapter.title = 'Chap 1 (sửa)'
+        self.chapter.save()
+        response = self.read(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(json.loads(response.content)['title'], 'Chap 1 (sửa)')
+
+
+class TableOfContentsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.book = Book.objects.create(title='Test book')
+        cls.volumes = [Volume.objects.create(book=cls.book, title=f'Volume {i}') for i in range(3)]
+        # Tạo lệch thứ tự để kiểm tra sắp xếp theo số chương; tập giữa không có chương nào
+        for volume in (cls.volumes[0], cls.volumes[2]):
+            for number in (3, 1, 2):
+                Chapter.objects.create(volume=volume, title=f'Chap {number}', number=number, content='<p>...</p>' * 50)
+
+    def toc(self, url=None, **params):
+        return self.client.get(url or reverse('book-toc', args=[self.book.id]), params)
+
+    def test_volumes_and_chapters_are_ordered(self):
+        data = self.toc().data
+        self.assertEqual([volume['id'] for volume in data['volumes']], [volume.id for volume in self.volumes])
+        self.assertEqual([chapter['number'] for chapter in data['volumes'][0]['chapters']], [1, 2, 3])
+        self.assertEqual(data['volumes'][1]['chapters'], [])
+        self.assertNotIn('content', data['volumes'][0]['chapters'][0])
+        self.assertIsNone(data['next'])
+
+    def test_query_count_does_not_depend_on_size(self):
+        # volumes, chapters
+        with self.assertNumQueries(2):
+            self.toc()
+        volume = Volume.objects.create(book=self.book, title='Volume 3')
+        for number in range(20):
+            Chapter.objects.create(volume=volume, title=f'Chap {number}', number=number, content='')
+        with self.assertNumQueries(2):
+            data = self.toc().data
+        self.assertEqual(len(data['volumes'][-1]['chapters']), 20)
+
+    def test_pages_split_volumes_without_repeating_chapters(self):
+        pages = [self.toc(page_size=2).data]
+        while pages[-1]['next']:
+            pages.append(self.toc(pages[-1]['next']).data)
+        chapters = [
+            (volume['id'], chapter['number'])
+            for page in pages for volume in page['volumes'] for chapter in volume['chapters']
+        ]
+        self.assertEqual(chapters, [(volume.id, number) for volume in (self.volumes[0], self.volumes[2]) for number in (1, 2, 3)])
+        # Tập rỗng xuất hiện đúng một lần
+        empty = [volume for page in pages for volume in page['volumes'] if volume['id'] == self.volumes[1].id]
+        self.assertEqual(len(empty), 1)
+
+    def test_unknown_book_is_404(self):
+        self.assertEqual(self.client.get(reverse('book-toc', args=[999])).status_code, 404)
+
+
+class BookCatalogPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.books = [Book.objects.create(title=f'Book {i}') for i in range(5)]
+        summary.refresh_summaries([book.id for book in cls.books])
+
+    def set_dates(self, *dates):
+        for book, date in zip(self.books, dates):
+            BookSummary.objects.filter(book=book).update(date_update=date)
+
+    def walk(self, page_size, **params):
+        """Đi theo link `next` tới hết, trả về id theo thứ tự"""
+        response = self.client.get(reverse('book-list'), {'page_size': page_size, **params})
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            ids += [book['id'] for book in response.data['results']]
+            if not response.data['next']:
+                return ids
+            response = self.client.get(response.data['next'])
+
+    def test_ties_on_date_update_are_broken_by_id(self):
+        moment = now()
+        self.set_dates(*[moment] * 5)
+        self.assertEqual(self.walk(2), sorted((book.id for book in self.books), reverse=True))
+        self.assertEqual(self.walk(2, ordering='date_update'), sorted(book.id for book in self.books))
+
+    def test_cursor_keeps_microseconds(self):
+        # Cùng một mili giây: cursor cắt xuống mili giây sẽ bỏ sót các truyện sau ranh giới trang
+        moment = now().replace(microsecond=123000)
+        self.set_dates(*[moment + timedelta(microseconds=100 * i) for i in range(5)])
+        self.assertEqual(self.walk(1), [book.id for book in reversed(self.books)])
+
+    def test_invalid_cursor_is_404(self):
+        for cursor in ('not-base64!', 'W10=', 'WyJ4IiwxXQ=='):
+            response = self.client.get(reverse('book-list'), {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+
+class SearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        # Book.save() đánh chỉ mục qua signal; bản tóm tắt chỉ được dựng sau commit nên dựng ở đây
+        cls.sword = Book.objects.create(title='Thanh kiếm ánh sáng', description='<p>Một hành trình dài</p>')
+        cls.story = Book.objects.create(title='Ký ức mùa hè', description='<p>Cô gái tìm lại thanh kiếm của cha</p>')
+        cls.dragon = Book.objects.create(title='Rồng và thanh kiếm', another_name='Dragon sword')
+        author = Author.objects.create(user=User.objects.create_user(username='writer'), pen_name='Hoàng Tử Bé')
+        BookAuthor.objects.create(book=cls.story, author=author, is_main_author=True)
+        summary.refresh_summaries([cls.sword.id, cls.story.id, cls.dragon.id])
+
+    def ids(self, query, **kwargs):
+        return [book_id for book_id, _ in search.search(query, **kwargs)]
+
+    def test_accents_are_ignored_and_title_outranks_description(self):
+        self.assertEqual(self.ids('thanh kiem')[-1], self.story.id)
+        self.assertEqual(set(self.ids('THANH KIẾM')), {self.sword.id, self.story.id, self.dragon.id})
+
+    def test_every_word_must_match(self):
+        self.assertEqual(self.ids('thanh kiem rong'), [self.dragon.id])
+        self.assertEqual(self.ids('thanh kiem khong co'), [])
+
+    def test_pen_name_is_indexed(self):
+        self.assertEqual(self.ids('hoang tu be'), [self.story.id])
+
+    def test_last_word_is_a_prefix_only_when_asked(self):
+        self.assertEqual(self.ids('anh sa', prefix=True), [self.sword.id])
+        self.assertEqual(self.ids('anh sa', prefix=False), [])
+
+    def test_search_view_pages_with_offset(self):
+        first = self.client.get(reverse('book-search'), {'q': 'thanh kiem', 'limit': 2}).data
+        self.assertEqual(len(first['results']), 2)
+        self.assertEqual(first['next_offset'], 2)
+        second = self.client.get(reverse('book-search'), {'q': 'thanh kiem', 'limit': 2, 'offset': 2}).data
+        self.assertEqual([book['id'] for book in second['results']], [self.story.id])
+        self.assertIsNone(second['next_offset'])
+
+
+class ChapterImportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.book = Book.objects.create(title='Test book')
+        cls.volume = Volume.objects.create(book=cls.book, title='Volume 1')
+
+    def numbers(self):
+        return list(Chapter.objects.filter(volume=self.volume).order_by('number').values_list('number', flat=True))
+
+    def test_chapters_are_created_and_sanitized(self):
+        result = import_chapters(self.volume, [
+            {'number': 2, 'title': 'Hai', 'content': '<p>Hai</p>'},
+            {'number': 1, 'content': '<p>Một</p><script>alert(1)</script>'},
+        ])
+        self.assertEqual(result, {'created': 2, 'updated': 0, 'numbers': [1.0, 2.0]})
+        chapter = Chapter.objects.get(volume=self.volume, number=1)
+        self.assertEqual(chapter.title, 'Chương 1')
+        self.assertNotIn('<script>', chapter.content)
+
+    def test_existing_numbers_are_rejected_unless_upserting(self):
+        import_chapters(self.volume, [{'number': 1, 'title': 'Cũ', 'content': '<p>cũ</p>'}])
+        with self.assertRaises(ChapterImportError):
+            import_chapters(self.volume, [
+                {'number': 2, 'content': '<p>hai</p>'},
+                {'number': 1, 'content': '<p>mới</p>'},
+            ])
+        # Cả lần import bị huỷ, kể cả chương 2
+        self.assertEqual(self.numbers(), [1])
+
+        result = import_chapters(self.volume, [{'number': 1, 'title': 'Mới', 'content': '<p>mới</p>'}], upsert=True)
+        self.assertEqual((result['created'], result['updated']), (0, 1))
+        self.assertEqual(Chapter.objects.get(volume=self.volume, number=1).title, 'Mới')
+
+    def test_duplicate_numbers_in_one_import_are_rejected(self):
+        with self.assertRaises(ChapterImportError):
+            import_chapters(self.volume, [{'number': 3, 'content': ''}, {'number': 3, 'content': ''}])
+        self.assertEqual(self.numbers(), [])
+
+    def test_zip_files_are_ordered_by_the_number_in_their_name(self):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            archive.writestr('chapter-10.html', '<html><body><h1>Mười</h1><p>...</p></body></html>')
+            archive.writestr('chapter-2.html', '<html><body><h1>Hai</h1><p>...</p></body></html>')
+        upload = SimpleUploadedFile('chapters.zip', buffer.getvalue())
+        import_chapters(self.volume, parse_upload(upload))
+        chapters = Chapter.objects.filter(volume=self.volume).order_by('number')
+        self.assertEqual([(chapter.number, chapter.title) for chapter in chapters], [(2, 'Hai'), (10, 'Mười')])
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.book = Book.objects.create(title='Test book')
+        cls.volumes = [Volume.objects.create(book=cls.book, title=f'Volume {i}') for i in (1, 2)]
+        for volume in cls.volumes:
+            for number in (2, 1):
+                Chapter.objects.create(volume=volume, number=number, title=f'{volume.title} - {number}', content=f'<p>Chương {number}<br></p>')
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def download(self, url, **headers):
+        response = self.client.get(url, **headers)
+        content = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, content
+
+    def exports(self):
+        return sorted(default_storage.listdir(export.EXPORT_DIR)[1])
+
+    def test_epub_is_streamed_then_served_from_storage(self):
+        url = reverse('book-export', args=[self.book.id])
+        response, content = self.download(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/epub+zip')
+        self.assertIn("filename*=UTF-8''Test%20book.epub", response['Content-Disposition'])
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            first = archive.infolist()[0]
+            self.assertEqual((first.filename, first.compress_type), ('mimetype', zipfile.ZIP_STORED))
+            pages = [name for name in archive.namelist() if name.startswith('OEBPS/chapter-')]
+            self.assertEqual(len(pages), 4)
+            # Theo thứ tự tập rồi số chương; thẻ rỗng được tự đóng cho XHTML
+            self.assertIn('Volume 1 - 1', archive.read(pages[0]).decode())
+            self.assertIn('<br/>', archive.read(pages[0]).decode())
+        self.assertEqual(len(self.exports()), 1)
+
+        cached, cached_content = self.download(url)
+        self.assertIsInstance(cached, FileResponse)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        self.assertEqual(cached_content, content)
+
+    def test_if_none_match_is_parsed(self):
+        url = reverse('book-export', args=[self.book.id])
+        etag = self.download(url)[0]['ETag']
+        for header in (etag, f'"other", W/{etag}', '*'):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=header).status_code, 304, header)
+        # ETag khác chỉ trùng phần đầu thì không khớp
+        response, _ = self.download(url, HTTP_IF_NONE_MATCH=f'{etag[:-1]}-old"')
+        self.assertEqual(response.status_code, 200)
+        # ETag gắn với định dạng
+        response, _ = self.download(f'{url}?type=txt', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_changes_produce_a_new_artifact_and_remove_the_old_one(self):
+        url = reverse('book-export', args=[self.book.id])
+        old_etag = self.download(url)[0]['ETag']
+        old_files = self.exports()
+        Chapter.objects.filter(volume=self.volumes[0], number=1).first().save()
+
+        response, _ = self.download(url, HTTP_IF_NONE_MATCH=old_etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], old_etag)
+        self.assertEqual(len(self.exports()), 1)
+        self.assertNotEqual(self.exports(), old_files)
+
+    def test_volume_text_export(self):
+        response, content = self.download(f"{reverse('volume-export', args=[self.volumes[1].id])}?type=txt")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertEqual(archive.namelist(), ['001 - Volume 2.txt'])
+            text = archive.read('001 - Volume 2.txt').decode()
+        self.assertLess(text.index('Volume 2 - 1'), text.index('Volume 2 - 2'))
+        self.assertNotIn('<p>', text)
+
+    def test_unknown_format_and_missing_book(self):
+        self.assertEqual(self.client.get(f"{reverse('book-export', args=[self.book.id])}?type=pdf").status_code, 400)
+        self.assertEqual(self.client.get(reverse('book-export', args=[self.book.id + 100])).status_code, 404)
+
+    def test_export_book_command(self):
+        stdout = io.StringIO()
+        call_command('export_book', self.book.id, stdout=stdout)
+        self.assertIn('Exported', stdout.getvalue())
+        self.assertEqual(len(self.exports()), 1)
+
+        output = os.path.join(tempfile.mkdtemp(), 'book.epub')
+        self.addCleanup(shutil.rmtree, os.path.dirname(output), True)
+        stdout = io.StringIO()
+        call_command('export_book', self.book.id, output=output, stdout=stdout)
+        self.assertIn('Up to date', stdout.getvalue())
+        with open(output, 'rb') as exported, default_storage.open(f'{export.EXPORT_DIR}/{self.exports()[0]}') as stored:
+            self.assertEqual(exported.read(), stored.read())
+
+        with self.assertRaises(CommandError):
+            call_command('export_book')
+        with self.assertRaises(CommandError):
+            call_command('export_book', volume=self.volumes[1].id + 100)
+
+
+class ResponseCacheInvalidationTest(TransactionTestCase):
+    """TransactionTestCase: response cache chỉ bị xoá sau khi transaction commit"""
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.status = BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        self.completed = BookStatus.objects.create(name='Đã hoàn thành', code='completed')
+        self.book = Book.objects.create(title='Test book', status=self.status)
+        self.volume = Volume.objects.create(book=self.book, title='Volume 1')
+        self.user = User.objects.create_user(username='writer', password='password123')
+        self.author = Author.objects.create(user=self.user, pen_name='pen')
+        BookAuthor.objects.create(book=self.book, author=self.author, is_main_author=True)
+        self.role = Role.objects.create(name='Leader')
+        team = Team.objects.create(name='team')
+        TeamMember.objects.create(user=self.user, team=team, role=self.role)
+        BookTeam.objects.create(book=self.book, team=team)
+
+    def get_detail(self):
+        return self.client.get(reverse('book-detail', args=[self.book.id]))
+
+    def get_by_pen_name(self):
+        return self.client.get(reverse('books-by-pen-name', args=['pen']))
+
+    def assertCached(self, response, hit=True):
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Cache'], 'HIT' if hit else 'MISS')
+
+    def test_responses_are_cached(self):
+        self.assertCached(self.get_detail(), hit=False)
+        self.assertCached(self.get_detail())
+        self.assertCached(self.get_by_pen_name(), hit=False)
+        self.assertCached(self.get_by_pen_name())
+
+    def test_username_change_invalidates_books_of_the_author_and_team(self):
+        self.get_detail()
+        self.get_by_pen_name()
+        self.user.username = 'renamed'
+        self.user.save()
+
+        response = self.get_detail()
+        self.assertCached(response, hit=False)
+        self.assertEqual(response.data['authors'][0]['username'], 'renamed')
+        self.assertEqual(response.data['teams'][0]['members'][0]['user'], 'renamed')
+        response = self.get_by_pen_name()
+        self.assertCached(response, hit=False)
+        self.assertEqual(response.data[0]['authors'][0]['username'], 'renamed')
+
+    def test_unrelated_user_changes_keep_the_cache(self):
+        self.get_detail()
+        self.user.last_login = now()
+        self.user.save(update_fields=['last_login'])
+        self.user.first_name = 'Writer'
+        self.user.save()
+        self.assertCached(self.get_detail())
+
+    def test_role_change_invalidates_books_of_teams_using_it(self):
+        self.get_detail()
+        self.role.name = 'Trưởng nhóm'
+        self.role.save()
+        response = self.get_detail()
+        self.assertCached(response, hit=False)
+        self.assertEqual(response.data['teams'][0]['members'][0]['role']['name'], 'Trưởng nhóm')
+
+        # Xoá vai trò xoá luôn thành viên nhóm
+        self.role.delete()
+        response = self.get_detail()
+        self.assertCached(response, hit=False)
+        self.assertEqual(response.data['teams'][0]['members'], [])
+
+    def test_batch_update_invalidates_after_commit(self):
+        self.get_detail()
+        with transaction.atomic():
+            batch_update.apply_batch_update([self.book.id], status=self.completed)
+            self.assertCached(self.get_detail())
+        response = self.get_detail()
+        self.assertCached(response, hit=False)
+        self.assertEqual(response.data['status'], self.completed.id)
+
+    def test_chapter_import_invalidates_after_commit(self):
+        self.get_detail()
+        with transaction.atomic():
+            import_chapters(self.volume, [{'number': 1, 'content': '<p>Một</p>'}])
+            self.assertCached(self.get_detail())
+        response = self.get_detail()
+        self.assertCached(response, hit=False)
+        self.assertEqual(len(response.data['volumes'][0]['chapters']), 1)
+
+
+class BufferTestCase(TestCase):
+    """Trong test buffer chỉ ghi khi gọi flush_all() (backend.test_runner)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='reader')
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.book = Book.objects.create(title='Test book')
+        volume = Volume.objects.create(book=cls.book, title='Volume 1')
+        cls.chapters = [
+            Chapter.objects.create(volume=volume, title=f'Chap {number}', number=number, content='<p>...</p>')
+            for number in (1, 2)
+        ]
+
+    def setUp(self):
+        write_behind.discard_all()
+        cache.clear()
+
+
+class ReadingProgressBufferTest(BufferTestCase):
+    def test_reading_progress_keeps_the_last_position(self):
+        reading_progress.record_progress(self.user.id, self.book.id, self.chapters[0].id, 0.5)
+        reading_progress.record_progress(self.user.id, self.book.id, self.chapters[1].id, 0.25)
+        self.assertFalse(ReadingProgress.objects.exists())
+
+        write_behind.flush_all()
+        progress = ReadingProgress.objects.get()
+        self.assertEqual((progress.chapter_id, progress.offset), (self.chapters[1].id, 0.25))
+
+    def test_failed_flush_is_retried(self):
+        reading_progress.record_progress(self.user.id, self.book.id, self.chapters[0].id, 0)
+        with mock.patch.object(reading_progress.buffer, 'write', side_effect=RuntimeError), \
+                self.assertLogs('backend.write_behind', 'ERROR'):
+            self.assertEqual(reading_progress.buffer.flush(), 0)
+        self.assertEqual(reading_progress.buffer.flush(), 1)
+        self.assertTrue(ReadingProgress.objects.exists())
+
+
+class ViewCounterTest(BufferTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        summary.refresh_summaries([cls.book.id])
+
+    def test_views_are_summed_and_ranked(self):
+        for _ in range(3):
+            trending.record_book_view(self.book.id)
+        trending.record_chapter_view(self.chapters[0].id, self.book.id)
+        self.assertEqual(trending.counter.pending(), {('book', self.book.id): 4, ('chapter', self.chapters[0].id): 1})
+
+        write_behind.flush_all()
+        self.assertEqual(Book.objects.get(id=self.book.id).view_count, 4)
+        self.assertEqual(Chapter.objects.get(id=self.chapters[0].id).view_count, 1)
+        self.assertEqual(BookViewBucket.objects.get(book=self.book).views, 4)
+        # Lần flush đầu tiên cũng tính lại bảng xếp hạng
+        self.assertEqual([row.book_id for row in trending.trending_books('daily', 10)], [self.book.id])
+
+    def test_deleted_books_leave_the_ranking(self):
+        trending.record_book_view(self.book.id)
+        write_behind.flush_all()
+        Book.objects.filter(id=self.book.id).update(is_deleted=True)
+        self.assertEqual(trending.trending_books('daily', 10), [])
+
+    def test_books_without_a_summary_are_skipped(self):
+        pending = Book.objects.create(title='Pending book')
+        trending.record_book_view(self.book.id)
+        for _ in range(2):
+            trending.record_book_view(pending.id)
+        write_behind.flush_all()
+        self.assertEqual(TrendingBook.objects.filter(period='daily').count(), 2)
+
+        with self.assertNumQueries(1):
+            rows = trending.trending_books('daily', 10)
+        self.assertEqual([row.book_id for row in rows], [self.book.id])
+        response = self.client.get(reverse('book-trending'), {'period': 'daily'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['book']['id'] for item in response.data['results']], [self.book.id])
+
+    def test_discarded_counter_is_not_written(self):
+        trending.record_book_view(self.book.id)
+        trending.record_chapter_view(self.chapters[0].id, None)
+        trending.counter.discard(('book', self.book.id))
+        self.assertEqual(trending.counter.pending(), {('chapter', self.chapters[0].id): 1})
+
+
+class BookSummaryTest(TransactionTestCase):
+    """TransactionTestCase: bản tóm tắt được dựng lại sau commit"""
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.status = BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        self.book = Book.objects.create(title='Test book', status=self.status)
+        self.author = Author.objects.create(pen_name='pen')
+        BookAuthor.objects.create(book=self.book, author=self.author, is_main_author=True)
+        self.team = Team.objects.create(name='team')
+        BookTeam.objects.create(book=self.book, team=self.team, is_main_team=True)
+        self.category = Category.objects.create(name='Fantasy', description='')
+        self.book.categories.add(self.category)
+        self.volumes = [Volume.objects.create(book=self.book, title=f'Volume {i}') for i in (1, 2)]
+
+    def add_chapter(self, volume, number):
+        return Chapter.objects.create(volume=volume, number=number, title=f'{volume.title} - {number}', content='<p>...</p>')
+
+    def summary(self):
+        return BookSummary.objects.get(book=self.book)
+
+    def test_summary_follows_the_book_and_its_relations(self):
+        book_summary = self.summary()
+        self.assertEqual((book_summary.title, book_summary.status_code), ('Test book', 'ongoing'))
+        self.assertEqual(book_summary.authors, [{'id': self.author.id, 'pen_name': 'pen', 'is_main_author': True}])
+        self.assertEqual(book_summary.teams, [{'id': self.team.id, 'name': 'team', 'is_main_team': True}])
+        self.assertEqual(book_summary.categories, [{'id': self.category.id, 'name': 'Fantasy'}])
+        self.assertEqual((book_summary.volume_count, book_summary.chapter_count), (2, 0))
+        self.assertIsNone(book_summary.latest_chapter)
+
+        self.author.pen_name = 'new-pen'
+        self.author.save()
+        self.category.name = 'Fantasy cổ điển'
+        self.category.save()
+        self.team.name = 'new team'
+        self.team.save()
+        book_summary = self.summary()
+        self.assertEqual(book_summary.authors[0]['pen_name'], 'new-pen')
+        self.assertEqual(book_summary.categories[0]['name'], 'Fantasy cổ điển')
+        self.assertEqual(book_summary.teams[0]['name'], 'new team')
+
+        response = self.client.get(reverse('book-summary', args=[self.book.id]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['authors'][0]['pen_name'], 'new-pen')
+
+    def test_latest_chapter_is_the_highest_number_of_the_last_volume(self):
+        self.add_chapter(self.volumes[1], 2)
+        self.add_chapter(self.volumes[1], 1)
+        # Chương bổ sung cho tập cũ, thêm sau cùng
+        self.add_chapter(self.volumes[0], 5)
+        book_summary = self.summary()
+        self.assertEqual(book_summary.chapter_count, 3)
+        self.assertEqual(
+            (book_summary.latest_chapter['volume'], book_summary.latest_chapter['number']), (self.volumes[1].id, 2),
+        )
+
+        Chapter.objects.get(volume=self.volumes[1], number=2).delete()
+        self.assertEqual(self.summary().latest_chapter['number'], 1)
+        self.volumes[1].delete()
+        book_summary = self.summary()
+        self.assertEqual((book_summary.volume_count, book_summary.chapter_count), (1, 1))
+        self.assertEqual(book_summary.latest_chapter['title'], 'Volume 1 - 5')
+
+    def test_chapter_book_is_resolved_once(self):
+        with mock.patch.object(signals, '_book_id_of_volume', wraps=signals._book_id_of_volume) as lookup:
+            chapter = Chapter.objects.create(volume_id=self.volumes[0].id, number=1, title='Một', content='<p>...</p>')
+            self.assertEqual(lookup.call_count, 1)
+            chapter.title = 'Sửa'
+            chapter.save()
+            self.assertEqual(lookup.call_count, 1)
+            # Tập đã load sẵn thì không cần tra
+            Chapter.objects.select_related('volume').get(id=chapter.id).delete()
+            self.assertEqual(lookup.call_count, 1)
+
+    def test_chapters_deleted_with_their_volume_are_not_refreshed_one_by_one(self):
+        for number in range(1, 4):
+            self.add_chapter(self.volumes[0], number)
+        self.add_chapter(self.volumes[1], 1)
+        with mock.patch.object(signals, '_book_id_of_volume', wraps=signals._book_id_of_volume) as lookup, \
+                mock.patch.object(summary, 'refresh_summaries', wraps=summary.refresh_summaries) as refresh:
+            self.volumes[0].delete()
+        self.assertEqual(lookup.call_count, 0)
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual(self.summary().chapter_count, 1)
+        self.assertEqual(signals._deleting_volumes(), set())
+
+    def test_changes_in_one_transaction_are_refreshed_once(self):
+        with mock.patch.object(summary, 'refresh_summaries', wraps=summary.refresh_summaries) as refresh:
+            with transaction.atomic():
+                for number in range(1, 4):
+                    self.add_chapter(self.volumes[0], number)
+                self.book.title = 'Renamed'
+                self.book.save()
+        self.assertEqual(refresh.call_count, 1)
+        self.assertEqual((self.summary().title, self.summary().chapter_count), ('Renamed', 3))
+
+
+class BatchUpdateTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', password='password123', is_staff=True)
+        cls.ongoing = BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        cls.completed = BookStatus.objects.create(name='Đã hoàn thành', code='completed')
+        cls.authors = [
+            Author.objects.create(user=User.objects.create_user(username=f'writer{i}'), pen_name=f'pen{i}')
+            for i in range(3)
+        ]
+        cls.books = [Book.objects.create(title=f'Book {i}', status=cls.ongoing) for i in range(2)]
+        for book in cls.books:
+            BookAuthor.objects.create(book=book, author=cls.authors[0], is_main_author=True)
+            BookAuthor.objects.create(book=book, author=cls.authors[1], is_main_author=False)
+
+    def authors_of(self, book):
+        return dict(BookAuthor.objects.filter(book=book).values_list('author_id', 'is_main_author'))
+
+    def post(self, data):
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        return client.post(reverse('book-batch-update'), data, format='json')
+
+    def test_status_and_results_per_book(self):
+        self.books[1].status = self.completed
+        self.books[1].save()
+        response = self.post({'books': [self.books[0].id, self.books[1].id, 999], 'status': self.completed.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['result'] for item in response.data['results']], ['updated', 'unchanged', 'not_found'])
+        self.assertEqual(Book.objects.get(id=self.books[0].id).status, self.completed)
+
+    def test_set_keeps_the_main_author(self):
+        main, co_author, new = self.authors
+        response = self.post({'books': [book.id for book in self.books], 'authors': {'set': [main.id, new.id]}})
+        self.assertEqual(response.status_code, 200)
+        for book in self.books:
+            self.assertEqual(self.authors_of(book), {main.id: True, new.id: False})
+        self.assertEqual(response.data['results'][0]['changes']['authors'], {'added': [new.id], 'removed': [co_author.id]})
+
+    def test_removing_the_main_author_is_rejected(self):
+        main, co_author, _ = self.authors
+        for change in ({'set': [co_author.id]}, {'remove': [main.id]}):
+            response = self.post({'books': [self.books[0].id], 'status': self.completed.id, 'authors': change})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.data['books'], [self.books[0].id])
+        # Cả lô bị huỷ
+        self.assertEqual(self.authors_of(self.books[0]), {main.id: True, co_author.id: False})
+        self.assertEqual(Book.objects.get(id=self.books[0].id).status, self.ongoing)
+
+    def test_relation_changes_are_indexed(self):
+        batch_update.apply_batch_update([self.books[0].id], changes={'authors': {'add': [self.authors[2].id]}})
+        self.assertEqual([book_id for book_id, _ in search.search('pen2')], [self.books[0].id])
@@ -0,0 +1,135 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+from backend.response_cache import invalidate_tags
+from backend.write_behind import CounterBuffer
+from .models import Book, BookViewBucket, Chapter, TrendingBook
+
+logger = logging.getLogger(__name__)
+
+FLUSH_INTERVAL = getattr(settings, 'VIEW_COUNTER_FLUSH_INTERVAL', 10.0)
+REFRESH_INTERVAL = getattr(settings, 'TRENDING_REFRESH_INTERVAL', 10 * 60)
+TRENDING_SIZE = getattr(settings, 'TRENDING_SIZE', 100)
+REFRESH_LOCK_KEY = 'trending-refresh'
+
+# period: (cửa sổ tính điểm, chu kỳ bán rã tính bằng giờ)
+PERIODS = {
+    'hourly': (timedelta(hours=6), 1.0),
+    'daily': (timedelta(days=2), 6.0),
+    'weekly': (timedelta(days=7), 24.0),
+}
+# Giữ bucket lâu hơn cửa sổ dài nhất một chút rồi xoá
+BUCKET_RETENTION = max(window for window, _ in PERIODS.values()) + timedelta(hours=1)
+
+
+def _increment(queryset, counts, field='view_count', key='id'):
+    """UPDATE ... SET field = field + n, gộp các dòng có cùng n vào một câu lệnh"""
+    groups = defaultdict(list)
+    for pk, amount in counts.items():
+        groups[amount].append(pk)
+    for amount, pks in groups.items():
+        queryset.filter(**{f'{key}__in': pks}).update(**{field: F(field) + amount})
+
+
+def _write(batch):
+    """
+    Ghi một lô {('book' | 'chapter', id): số lượt}. Lượt xem được tính vào
+    bucket của giờ lúc flush (lệch tối đa một chu kỳ flush).
+    """
+    books = {pk: amount for (kind, pk), amount in batch.items() if kind == 'book'}
+    chapters = {pk: amount for (kind, pk), amount in batch.items() if kind == 'chapter'}
+    hour = now().replace(minute=0, second=0, microsecond=0)
+    with transaction.atomic():
+        _increment(Chapter.objects.all(), chapters)
+        live = set(Book.objects.filter(id__in=books).values_list('id', flat=True))
+        books = {pk: amount for pk, amount in books.items() if pk in live}
+        _increment(Book.objects.all(), books)
+
+        buckets = BookViewBucket.objects.filter(hour=hour)
+        existing = set(buckets.filter(book_id__in=books).values_list('book_id', flat=True))
+        _increment(buckets, {pk: amount for pk, amount in books.items() if pk in existing}, field='views', key='book_id')
+        BookViewBucket.objects.bulk_create([
+            BookViewBucket(book_id=pk, hour=hour, views=amount) for pk, amount in books.items() if pk not in existing
+        ])
+    maybe_refresh_trending()
+
+
+counter = CounterBuffer('view-counter', _write, interval=FLUSH_INTERVAL)
+
+
+def record_book_view(book_id):
+    counter.incr(('book', book_id))
+
+
+def record_chapter_view(chapter_id, book_id):
+    """Một lượt đọc chương cũng là một lượt xem của truyện"""
+    counter.incr(('chapter', chapter_id))
+    if book_id is not None:
+        counter.incr(('book', book_id))
+
+
+def compute_trending(size=TRENDING_SIZE, at=None):
+    """
+    Tính lại bảng xếp hạng của mọi period từ các bucket theo giờ.
+
+    Điểm của một truyện là tổng lượt xem từng giờ nhân hệ số giảm dần theo
+    tuổi của giờ đó (0.5 ** (tuổi / chu kỳ bán rã)), nên lượt xem gần đây nặng
+    hơn. Bucket được đọc tuần tự một lần cho mọi period; bộ nhớ chỉ phụ thuộc số truyện.
+    """
+    at = at or now()
+    scores = {period: defaultdict(float) for period in PERIODS}
+    views = {period: defaultdict(int) for period in PERIODS}
+    buckets = BookViewBucket.objects.filter(hour__gte=at - BUCKET_RETENTION).values_list('book_id', 'hour', 'views')
+    for book_id, hour, count in buckets.iterator(chunk_size=2000):
+        age = max(0.0, (at - hour).total_seconds() / 3600)
+        for period, (window, half_life) in PERIODS.items():
+            if hour >= at - window:
+                scores[period][book_id] += count * 0.5 ** (age / half_life)
+                views[period][book_id] += count
+
+    candidates = {book_id for period_scores in scores.values() for book_id in period_scores}
+    deleted = set(Book.objects.filter(id__in=candidates, is_deleted=True).values_list('id', flat=True))
+    rows = []
+    for period, period_scores in scores.items():
+        ranked = sorted(
+            ((book_id, score) for book_id, score in period_scores.items() if book_id not in deleted),
+            key=lambda item: (-item[1], item[0]),
+        )[:size]
+        rows.extend(
+            TrendingBook(period=period, rank=rank, book_id=book_id, score=score, views=views[period][book_id], date_compute=at)
+            for rank, (book_id, score) in enumerate(ranked, start=1)
+        )
+
+    with transaction.atomic():
+        TrendingBook.objects.all().delete()
+        TrendingBook.objects.bulk_create(rows)
+        BookViewBucket.objects.filter(hour__lt=at - BUCKET_RETENTION).delete()
+    invalidate_tags('trending')
+    return {period: sum(1 for row in rows if row.period == period) for period in PERIODS}
+
+
+def maybe_refresh_trending():
+    """Tính lại bảng xếp hạng nếu đã quá REFRESH_INTERVAL; chỉ một process làm việc này nhờ khoá trong cache"""
+    if REFRESH_INTERVAL <= 0 or not cache.add(REFRESH_LOCK_KEY, True, REFRESH_INTERVAL):
+        return
+    try:
+        compute_trending()
+    except Exception:
+        cache.delete(REFRESH_LOCK_KEY)
+        logger.exception('Failed to refresh trending rankings')
+
+
+def trending_books(period, limit):
+    """
+    Một query theo index (period, rank), nối sang Book và bản tóm tắt của từng
+    truyện. Truyện chưa có bản tóm tắt (chưa build xong) bị bỏ qua.
+    """
+    return list(
+        TrendingBook.objects.filter(period=period, rank__lte=limit, book__is_deleted=False, book__summary__isnull=False)
+        .select_related('book__summary').order_by('rank')
+    )
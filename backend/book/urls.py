@@ -1,13 +1,27 @@
 from django.urls import path
+from backend.async_views import async_read_view
 from .views import *
 
 urlpatterns = [
+    path('', BookListView.as_view(), name='book-list'),
     path('create-book/author/', CreateBookByAuthorView.as_view(), name='create-book-author'),
     path('create-book/leader/<int:team_id>/', CreateBookByLeaderView.as_view(), name='create-book-leader'),
     path('update-book/<int:pk>/', BookPartialUpdateView.as_view(), name='book-update'),
+    path('update-books/', BookBatchUpdateView.as_view(), name='book-batch-update'),
     path('create-volume/', CreateVolumeAPIView.as_view(), name='create-volume'),
+    path('volume/<int:volume_id>/import/', ImportChaptersView.as_view(), name='import-chapters'),
     path('author/pen_name/<str:pen_name>/', BooksByPenNameView.as_view(), name='books-by-pen-name'), 
+    path('search/', BookSearchView.as_view(), name='book-search'),
+    path('search/autocomplete/', BookAutocompleteView.as_view(), name='book-autocomplete'),
+    path('trending/', TrendingBooksView.as_view(), name='book-trending'),
     path('categories/', CategoryListView.as_view(), name='category-list'),
     path('bookstatus/', BookStatusListAPIView.as_view(), name='bookstatus-list'),
-    path('<int:book_id>/', BookDetailView.as_view(), name='book-detail'),
+    path('chapter/<int:chapter_id>/', async_read_view(ChapterReadView.as_view(), fast_path=cached_chapter), name='chapter-read'),
+    path('progress/', ReadingProgressView.as_view(), name='reading-progress'),
+    path('volume/<int:volume_id>/export/', ExportView.as_view(), name='volume-export'),
+    path('<int:book_id>/export/', ExportView.as_view(), name='book-export'),
+    path('<int:book_id>/progress/', BookReadingProgressView.as_view(), name='book-reading-progress'),
+    path('<int:book_id>/summary/', BookSummaryView.as_view(), name='book-summary'),
+    path('<int:book_id>/toc/', async_read_view(BookTableOfContentsView.as_view()), name='book-toc'),
+    path('<int:book_id>/', async_read_view(BookDetailView.as_view(), fast_path=cached_book_detail), name='book-detail'),
 ]
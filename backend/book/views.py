@@ -8,27 +8,136 @@ from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
 from .models import *
 from .serializers import *
 from .permissions import *
+from .filters import BookFilter
+from django.core.files.storage import default_storage
+from django.db import IntegrityError
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe
+from urllib.parse import quote
 from django_filters.rest_framework import DjangoFilterBackend
+from backend.async_views import cached_api_response
+from backend import reference_data
+from backend.pagination import KeysetPagination
+from backend.query_planner import plan_queryset
+from backend.reference_data import reference_response
+from backend.response_cache import cache_response
+from .content_cache import get_cached_chapter, load_chapter
+from .chapter_import import ChapterImportError, import_chapters, parse_upload
+from . import batch_update, export, reading_progress, search, trending
 
-class BookStatusListAPIView(generics.ListAPIView):
-    serializer_class = BookStatusSerializer
+class BookStatusListAPIView(APIView):
     permission_classes = [permissions.IsAuthenticated]  # hoặc thay đổi theo nhu cầu
 
+    def get(self, request, *args, **kwargs):
+        # Đọc từ bảng tham chiếu trong RAM; chỉ staff thấy trạng thái 'banned'
+        statuses = reference_data.book_statuses.all()
+        if request.user.is_staff:
+            return reference_response(request, reference_data.book_statuses, BookStatusSerializer, statuses, 'staff')
+        statuses = [book_status for book_status in statuses if book_status.code != 'banned']
+        return reference_response(request, reference_data.book_statuses, BookStatusSerializer, statuses)
+
+class BookCatalogPagination(KeysetPagination):
+    ordering_query_param = 'ordering'
+    ordering_choices = ('date_update', '-date_update', 'date_upload', '-date_upload')
+    default_ordering = '-date_update'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+        if ordering not in self.ordering_choices:
+            ordering = self.default_ordering
+        # Thêm id truyện cùng chiều để khoá keyset luôn duy nhất
+        return (ordering, '-book' if ordering.startswith('-') else 'book')
+
+
+class BookListView(generics.ListAPIView):
+    """
+    API view to browse the book catalog.
+    Lọc theo category, status, team, author; sắp xếp theo date_update / date_upload
+    và phân trang keyset nên mỗi trang chỉ tốn O(page_size). Đọc từ BookSummary
+    nên mỗi truyện là một document, không nối bảng (trừ khi lọc theo quan hệ).
+    """
+    serializer_class = BookSummarySerializer
+    pagination_class = BookCatalogPagination
+    read_replica = True
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = BookFilter
+
     def get_queryset(self):
-        user = self.request.user
-        if user.is_staff:
-            return BookStatus.objects.all()
-        else:
-            return BookStatus.objects.exclude(code='banned')
+        return BookSummary.objects.filter(is_deleted=False)
+
+class BookSearchView(APIView):
+    """
+    API view to search books by title, alternate name, description and pen name.
+    Không phân biệt dấu tiếng Việt; kết quả được xếp hạng theo độ liên quan.
+    """
+    default_limit = 20
+    max_limit = 100
+    prefix = False
+    read_replica = True
+
+    def get(self, request, *args, **kwargs):
+        query = request.query_params.get('q', '').strip()
+        if not query:
+            return Response({'error': 'q parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = max(min(int(request.query_params.get('limit', self.default_limit)), self.max_limit), 1)
+        except ValueError:
+            limit = self.default_limit
+        try:
+            offset = max(int(request.query_params.get('offset', 0)), 0)
+        except ValueError:
+            offset = 0
+
+        # Lấy dư một kết quả để biết còn trang sau hay không
+        ranked = search.search(query, limit=limit + 1, prefix=self.prefix, offset=offset)
+        has_next = len(ranked) > limit
+        ranked = ranked[:limit]
+        books = BookSummary.objects.in_bulk([book_id for book_id, _ in ranked])
+        results = []
+        for book_id, score in ranked:
+            if book_id in books:
+                data = BookSummarySerializer(books[book_id]).data
+                data['score'] = round(score, 3)
+                results.append(data)
+        next_offset = offset + limit if has_next else None
+        return Response({'query': query, 'next_offset': next_offset, 'results': results}, status=status.HTTP_200_OK)
+
+class BookAutocompleteView(BookSearchView):
+    """
+    API view for search-as-you-type: the last word is matched as a prefix.
+    """
+    default_limit = 10
+    max_limit = 20
+    prefix = True
+
+def book_cache_tags(book):
+    """Các tag mà dữ liệu BookSerializer của một quyển sách phụ thuộc vào"""
+    tags = [f"book:{book['id']}", 'categories']
+    tags += [f"author:{author['id']}" for author in book['authors']]
+    tags += [f"team:{team['id']}" for team in book['teams']]
+    return tags
+
 
 class BookDetailView(APIView):
     """
     API view to retrieve details of a book by its ID.
     """
     def get(self, request, book_id, *args, **kwargs):
+        # Đếm lượt xem cả khi response lấy từ cache
+        response = self.get_book(request, book_id=book_id)
+        if response.status_code == status.HTTP_200_OK:
+            trending.record_book_view(book_id)
+        return response
+
+    @cache_response(
+        tags=lambda request, data, book_id: book_cache_tags(data),
+        key_tags=lambda request, book_id: [f'book:{book_id}'],
+    )
+    def get_book(self, request, book_id):
         try:
-            # Lấy thông tin quyển sách từ database theo ID
-            book = Book.objects.get(id=book_id)
+            # Lấy thông tin quyển sách kèm toàn bộ quan hệ với số truy vấn cố định
+            book = plan_queryset(Book.objects.all(), BookSerializer).get(id=book_id)
         except Book.DoesNotExist:
             # Nếu không tìm thấy quyển sách, trả về lỗi 404
             return Response({"error": "Book not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -39,10 +148,28 @@ class BookDetailView(APIView):
         # Trả về thông tin quyển sách dưới dạng JSON
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+class BookSummaryView(APIView):
+    """
+    Phần đầu trang chi tiết: tên, ảnh bìa, trạng thái, tác giả, nhóm, thể loại,
+    số tập và chương mới nhất, đọc từ một document BookSummary.
+    """
+    read_replica = True
+
+    def get(self, request, book_id, *args, **kwargs):
+        try:
+            book_summary = BookSummary.objects.get(book_id=book_id, is_deleted=False)
+        except BookSummary.DoesNotExist:
+            return Response({"error": "Book not found"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(BookSummarySerializer(book_summary).data)
+
 class BooksByPenNameView(APIView):
     """
     API view to retrieve all books by a specific author based on their pen name.
     """
+    @cache_response(
+        tags=lambda request, data, pen_name: [tag for book in data for tag in book_cache_tags(book)],
+        key_tags=lambda request, pen_name: [f'pen-name:{pen_name}'],
+    )
     def get(self, request, pen_name, *args, **kwargs):
         try:
             # Lấy tác giả theo pen_name
@@ -51,7 +178,7 @@ class BooksByPenNameView(APIView):
             return Response({"error": "Author not found"}, status=status.HTTP_404_NOT_FOUND)
 
         # Lấy tất cả các sách mà tác giả này tham gia sáng tác
-        books = Book.objects.filter(authors=author)
+        books = plan_queryset(Book.objects.filter(authors=author), BookSerializer)
 
         # Serialize danh sách sách
         serializer = BookSerializer(books, many=True)
@@ -88,11 +215,14 @@ class CreateBookByLeaderView(APIView):
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class CategoryListView(generics.ListAPIView):
-    queryset = Category.objects.all()
-    serializer_class = CategorySerializer
-    filter_backends = [DjangoFilterBackend]
-    filterset_fields = ['name']
+class CategoryListView(APIView):
+    def get(self, request, *args, **kwargs):
+        # Đọc từ bảng tham chiếu trong RAM, lọc theo ?name= như trước
+        categories = reference_data.categories.all()
+        name = request.query_params.get('name')
+        if name:
+            categories = [category for category in categories if category.name == name]
+        return reference_response(request, reference_data.categories, CategorySerializer, categories, name or '')
 
 class BookPartialUpdateView(generics.UpdateAPIView):
     queryset = Book.objects.all()
@@ -101,9 +231,294 @@ class BookPartialUpdateView(generics.UpdateAPIView):
     http_method_names = ['patch'] 
     parser_classes = [MultiPartParser, FormParser, JSONParser]
 
+class BookBatchUpdateView(APIView):
+    """
+    API view to update status, categories, teams and authors of many books at once.
+    Dùng bulk update / insert / delete trong một transaction; trả kết quả theo từng id.
+    """
+    permission_classes = [permissions.IsAdminUser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BookBatchUpdateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        try:
+            results = batch_update.apply_batch_update(
+                data['books'],
+                status=data.get('status'),
+                changes={name: data[name] for name in batch_update.RELATIONS if name in data},
+            )
+        except batch_update.MainRelationRemoved as error:
+            return Response({"error": str(error), "books": error.book_ids}, status=status.HTTP_400_BAD_REQUEST)
+        except IntegrityError:
+            # Một request khác vừa sửa cùng các truyện này
+            return Response({"error": "Conflicting concurrent update, please retry"}, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'updated': sum(1 for item in results if item['result'] == 'updated'),
+            'results': results,
+        }, status=status.HTTP_200_OK)
+
 class CreateVolumeAPIView(generics.CreateAPIView):
     queryset = Volume.objects.all()
     serializer_class = CreateVolumeSerializer
     permission_classes = [IsAuthenticated]  
     http_method_names = ['post'] 
     parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+
+class ImportChaptersView(APIView):
+    """
+    API view to import many chapters into a volume in one request.
+    Nhận JSON (danh sách chương hoặc {"chapters": [...]}) hoặc file EPUB / zip
+    HTML, DOCX / JSON qua field `file`. Gửi `upsert=true` để ghi đè chương trùng số.
+    """
+    permission_classes = [IsAuthenticated, IsVolumeContributor]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    def post(self, request, volume_id, *args, **kwargs):
+        try:
+            volume = Volume.objects.only('id', 'book').get(id=volume_id)
+        except Volume.DoesNotExist:
+            return Response({"error": "Volume not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        data = request.data
+        if isinstance(data, list):
+            data = {'chapters': data}
+        upsert = str(data.get('upsert', request.query_params.get('upsert', ''))).lower() in ('1', 'true', 'yes')
+
+        try:
+            if data.get('file') is not None:
+                items = parse_upload(data['file'])
+            elif isinstance(data.get('chapters'), list):
+                items = data['chapters']
+            else:
+                return Response({"error": "Provide a file or a list of chapters."}, status=status.HTTP_400_BAD_REQUEST)
+            result = import_chapters(volume, items, upsert=upsert)
+        except ChapterImportError as e:
+            return Response({"error": e.args[0]}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(result, status=status.HTTP_201_CREATED)
+
+
+class ExportView(APIView):
+    """
+    API view to download a book or a volume as EPUB (mặc định) hoặc zip các file .txt (?type=txt).
+    Lần đầu file được tạo và stream thẳng cho client, đồng thời lưu lại; các lần
+    sau dùng lại file đã lưu cho tới khi có chương trong phạm vi thay đổi.
+    """
+    def get(self, request, book_id=None, volume_id=None, *args, **kwargs):
+        export_format = request.query_params.get('type', 'epub')
+        if export_format not in export.FORMATS:
+            return Response({"error": "Unsupported format"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            scope = export.ExportScope.for_volume(volume_id) if volume_id else export.ExportScope.for_book(book_id)
+        except (Book.DoesNotExist, Volume.DoesNotExist):
+            return Response({"error": "Not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        fingerprint = scope.fingerprint()
+        etag = f'"{fingerprint}-{export_format}"'
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            return not_modified
+
+        name = export.artifact_name(scope, export_format, fingerprint)
+        content_type = export.FORMATS[export_format][0]
+        if default_storage.exists(name):
+            response = FileResponse(default_storage.open(name), content_type=content_type)
+        else:
+            response = StreamingHttpResponse(export.stream_and_cache(scope, export_format, name), content_type=content_type)
+        response['Content-Disposition'] = f"attachment; filename*=UTF-8''{quote(export.download_name(scope, export_format))}"
+        response['ETag'] = etag
+        return response
+
+
+class TableOfContentsPagination(KeysetPagination):
+    ordering = ('volume', 'number')
+    page_size = 200
+    max_page_size = 1000
+
+
+class BookTableOfContentsView(APIView):
+    """
+    API view to retrieve a book's table of contents (volumes and chapters).
+    Chỉ load các cột cần hiển thị, không bao giờ load nội dung chương.
+    """
+    read_replica = True
+
+    def get(self, request, book_id, *args, **kwargs):
+        volumes = list(
+            Volume.objects.filter(book_id=book_id)
+            .only('id', 'title', 'img', 'img_variants', 'date_upload')
+            .order_by('id')
+        )
+        if not volumes and not Book.objects.filter(id=book_id).exists():
+            return Response({"error": "Book not found"}, status=status.HTTP_404_NOT_FOUND)
+
+        paginator = TableOfContentsPagination()
+        chapters = paginator.paginate_queryset(
+            Chapter.objects.filter(volume__in=[volume.id for volume in volumes])
+            .only('id', 'title', 'number', 'date_upload', 'volume'),
+            request, self,
+        )
+
+        # Mỗi trang chứa các tập nằm giữa cursor và chương cuối của trang,
+        # nên tập chưa có chương nào vẫn xuất hiện đúng một lần
+        first_volume = paginator.position[0] if paginator.position else None
+        last_volume = chapters[-1].volume_id if paginator.has_next else None
+        grouped = {}
+        for chapter in chapters:
+            grouped.setdefault(chapter.volume_id, []).append(chapter)
+
+        results = []
+        for volume in volumes:
+            if first_volume is not None and volume.id < first_volume:
+                continue
+            if last_volume is not None and volume.id > last_volume:
+                break
+            data = TocVolumeSerializer(volume).data
+            data['chapters'] = TocChapterSerializer(grouped.get(volume.id, []), many=True).data
+            results.append(data)
+
+        return Response({
+            'book': book_id,
+            'next': paginator.get_next_link(),
+            'volumes': results,
+        }, status=status.HTTP_200_OK)
+
+
+def _accepted_encodings(header):
+    """Parse Accept-Encoding thành tập các encoding có q > 0"""
+    accepted = set()
+    for item in header.split(','):
+        name, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if name:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class ChapterReadView(APIView):
+    """
+    API view to read a chapter's sanitized content.
+    Chương đã được render sẵn và nén lưu trong cache nên lượt đọc lặp lại
+    không chạm tới database; client gửi lại ETag / Last-Modified sẽ nhận 304.
+    """
+    def get(self, request, chapter_id, *args, **kwargs):
+        try:
+            entry = load_chapter(chapter_id)
+        except Chapter.DoesNotExist:
+            return Response({"error": "Chapter not found"}, status=status.HTTP_404_NOT_FOUND)
+        return chapter_response(request, chapter_id, entry)
+
+
+def chapter_response(request, chapter_id, entry):
+    """Response cho một bản render của chương (304 nếu client đã có bản này)"""
+    response = get_conditional_response(
+        request, etag=entry['etag'], last_modified=parse_http_date_safe(entry['last_modified']),
+    )
+    if response is None:
+        # Chỉ lượt tải nội dung mới là một lượt đọc; client kiểm tra lại (304) thì không tính
+        trending.record_chapter_view(chapter_id, entry.get('book'))
+        accepted = _accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        encoding = next((name for name in ('br', 'gzip') if name in accepted and name in entry['variants']), 'identity')
+        response = HttpResponse(entry['variants'][encoding], content_type='application/json; charset=utf-8')
+        if encoding != 'identity':
+            response['Content-Encoding'] = encoding
+
+    response['ETag'] = entry['etag']
+    response['Last-Modified'] = entry['last_modified']
+    response['Cache-Control'] = 'public, no-cache'
+    response['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def cached_chapter(request, chapter_id, *args, **kwargs):
+    """fast_path cho async_read_view: chỉ đọc cache, None nếu chương chưa được render"""
+    entry = get_cached_chapter(chapter_id)
+    return chapter_response(request, chapter_id, entry) if entry is not None else None
+
+
+def cached_book_detail(request, book_id, *args, **kwargs):
+    response = cached_api_response(request)
+    if response is not None:
+        trending.record_book_view(book_id)
+    return response
+
+
+class TrendingBooksView(APIView):
+    """
+    Truyện thịnh hành theo giờ / ngày / tuần. Bảng xếp hạng được tính sẵn
+    (book.trending.compute_trending) nên mỗi request chỉ cần một query.
+    """
+    default_limit = 20
+
+    @cache_response(
+        tags=lambda request, data: ['trending'] + [f"book:{item['book']['id']}" for item in data['results']],
+        key_tags=lambda request: ['trending'],
+    )
+    def get(self, request, *args, **kwargs):
+        period = request.query_params.get('period', 'daily')
+        if period not in trending.PERIODS:
+            return Response({"error": f"period must be one of {', '.join(trending.PERIODS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', self.default_limit))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, trending.TRENDING_SIZE))
+        rows = trending.trending_books(period, limit)
+        return Response({
+            'period': period,
+            'date_compute': rows[0].date_compute if rows else None,
+            'results': TrendingBookSerializer(rows, many=True).data,
+        })
+
+
+class ReadingProgressView(APIView):
+    """
+    POST: ghi nhận chỗ đọc (chương + vị trí cuộn). Lần ghi được gom trong RAM
+    và ghi xuống database theo lô, nên client có thể gửi thường xuyên.
+    GET: danh sách "đọc tiếp" của user, mới nhất trước.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', reading_progress.CONTINUE_READING_LIMIT))
+        except ValueError:
+            return Response({"error": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, reading_progress.CONTINUE_READING_MAX_LIMIT))
+        items = reading_progress.continue_reading(request.user.pk, limit)
+        return Response(ContinueReadingSerializer(items, many=True).data)
+
+    def post(self, request):
+        serializer = ReadingProgressInputSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        chapter_id = serializer.validated_data['chapter']
+        book_id = reading_progress.chapter_book_id(chapter_id)
+        if book_id is None:
+            return Response({"error": "Chapter not found"}, status=status.HTTP_404_NOT_FOUND)
+        progress = reading_progress.record_progress(
+            request.user.pk, book_id, chapter_id, serializer.validated_data['offset'],
+        )
+        return Response(ReadingProgressSerializer(progress).data, status=status.HTTP_202_ACCEPTED)
+
+
+class BookReadingProgressView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, book_id):
+        progress = reading_progress.get_progress(request.user.pk, book_id)
+        if progress is None:
+            return Response({"error": "No reading progress for this book"}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ReadingProgressSerializer(progress).data)
+
+    def delete(self, request, book_id):
+        reading_progress.forget_progress(request.user.pk, book_id)
+        return Response(status=status.HTTP_204_NO_CONTENT)
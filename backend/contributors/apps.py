@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class ContributorsConfig(AppConfig):
     name = 'contributors'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from backend import reference_data
+from .models import Author, Role, TeamMember
+
+CACHE_ALIAS = getattr(settings, 'MEMBERSHIP_CACHE_ALIAS', 'default')
+CACHE_TIMEOUT = getattr(settings, 'MEMBERSHIP_CACHE_TIMEOUT', 60 * 60)
+LEADER_ROLE = 'Leader'
+
+
+class Membership:
+    """Ảnh chụp vai trò của một user: tác giả nào, thuộc nhóm nào với vai trò gì"""
+
+    def __init__(self, author_id=None, pen_name=None, teams=None):
+        self.author_id = author_id
+        self.pen_name = pen_name
+        # {team_id: role_id}: tên vai trò tra lúc kiểm tra quyền, nên đổi tên / thêm vai trò không làm cache sai
+        self.teams = teams or {}
+
+    @property
+    def is_author(self):
+        return self.author_id is not None
+
+    def role_in(self, team_id):
+        """Tên vai trò trong nhóm, None nếu không phải thành viên"""
+        try:
+            role_id = self.teams.get(int(team_id))
+        except (TypeError, ValueError):
+            return None
+        if role_id is None:
+            return None
+        role = reference_data.roles.get(role_id)
+        if role is not None:
+            return role.name
+        # Vai trò vừa tạo ở process khác, bảng tham chiếu chưa kịp nạp lại
+        return Role.objects.filter(pk=role_id).values_list('name', flat=True).first()
+
+    def is_leader_of(self, team_id):
+        return self.role_in(team_id) == LEADER_ROLE
+
+    def to_dict(self):
+        return {'author_id': self.author_id, 'pen_name': self.pen_name, 'teams': self.teams}
+
+
+ANONYMOUS = Membership()
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _cache_key(user_id):
+    return f'membership:{user_id}'
+
+
+def load_membership(user_id):
+    """Đọc từ database (2 query, không nối bảng Role)"""
+    author = Author.objects.filter(user_id=user_id).values_list('id', 'pen_name').first()
+    teams = dict(TeamMember.objects.filter(user_id=user_id).values_list('team_id', 'role_id'))
+    author_id, pen_name = author if author else (None, None)
+    return Membership(author_id, pen_name, teams)
+
+
+def get_membership(user):
+    """
+    Vai trò của `user`, chỉ đọc database một lần: kết quả được gắn vào chính
+    object user (sống cùng request) và lưu cache cho các request sau cho tới
+    khi Author / TeamMember của user thay đổi.
+    """
+    if user is None or not user.is_authenticated:
+        return ANONYMOUS
+    membership = getattr(user, '_membership', None)
+    if membership is not None:
+        return membership
+
+    key = _cache_key(user.pk)
+    data = _cache().get(key)
+    if data is not None:
+        membership = Membership(**data)
+    else:
+        membership = load_membership(user.pk)
+        _cache().set(key, membership.to_dict(), CACHE_TIMEOUT)
+    user._membership = membership
+    return membership
+
+
+def invalidate_membership(user_id):
+    if user_id is not None:
+        transaction.on_commit(lambda: _cache().delete(_cache_key(user_id)))
+
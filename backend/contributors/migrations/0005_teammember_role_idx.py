@@ -0,0 +1,17 @@
+# Generated by Django 3.1.12 on 2026-10-18 17:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contributors', '0004_auto_20250201_2004'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='teammember',
+            index=models.Index(fields=['team', 'role'], name='team_member_role_idx'),
+        ),
+    ]
@@ -49,6 +49,10 @@ class TeamMember(models.Model):
 
     class Meta:
         unique_together = ('user', 'team')
+        indexes = [
+            # Thành viên của một nhóm theo vai trò (vd. tìm leader)
+            models.Index(fields=['team', 'role'], name='team_member_role_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.role.name} in {self.team.name}"
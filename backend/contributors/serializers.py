@@ -1,17 +1,16 @@
 from rest_framework import serializers
+from backend import reference_data
+from backend.reference_data import ReferenceRelatedField
 from .models import *
 
 class AuthorSerializer(serializers.ModelSerializer):
-    username = serializers.SerializerMethodField()
+    # Lấy username từ user liên kết với Author (None nếu chưa liên kết)
+    username = serializers.CharField(source='user.username', read_only=True, allow_null=True)
     
     class Meta:
         model = Author
         fields = ['id', 'pen_name', 'username']  
 
-    def get_username(self, obj):
-        # Lấy username từ user liên kết với Author
-        return obj.user.username if obj.user else None
-
     def create(self, validated_data):
         validated_data['user'] = self.context['request'].user
         return super().create(validated_data)
@@ -34,6 +33,7 @@ class TeamMemberSerializer(serializers.ModelSerializer):
 
 class TeamSerializer(serializers.ModelSerializer):
     members = TeamMemberSerializer(source='teammember_set', many=True)
+    type = ReferenceRelatedField(reference_data.team_types, required=False, allow_null=True)
 
     class Meta:
         model = Team
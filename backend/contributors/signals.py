@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from backend import reference_data
+from .membership import invalidate_membership
+from .models import Author, Role, TeamMember, TeamType
+
+
+@receiver([post_save, post_delete], sender=Author)
+def invalidate_author_membership(sender, instance, **kwargs):
+    invalidate_membership(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=TeamMember)
+def invalidate_team_membership(sender, instance, **kwargs):
+    invalidate_membership(instance.user_id)
+
+
+@receiver([post_save, post_delete], sender=Role)
+def refresh_roles(sender, instance, **kwargs):
+    reference_data.roles.invalidate()
+
+
+@receiver([post_save, post_delete], sender=TeamType)
+def refresh_team_types(sender, instance, **kwargs):
+    reference_data.team_types.invalidate()
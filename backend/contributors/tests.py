@@ -1,3 +1,64 @@
-from django.test import TestCase
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from backend import reference_data
+from .membership import get_membership
+from .models import Author, Role, Team, TeamMember
 
-# Create your tests here.
+
+class MembershipCacheTest(TransactionTestCase):
+    """TransactionTestCase: cache vai trò bị xoá sau commit"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member', password='password123')
+        self.leader = Role.objects.create(name='Leader')
+        self.member = Role.objects.create(name='Member')
+        self.team = Team.objects.create(name='team')
+        self.other_team = Team.objects.create(name='other')
+        TeamMember.objects.create(user=self.user, team=self.team, role=self.leader)
+
+    def membership(self):
+        # Mỗi request có object user riêng
+        return get_membership(User.objects.get(pk=self.user.pk))
+
+    def test_membership_is_cached_between_requests(self):
+        membership = self.membership()
+        self.assertTrue(membership.is_leader_of(self.team.id))
+        self.assertFalse(membership.is_leader_of(self.other_team.id))
+        self.assertFalse(membership.is_leader_of('abc'))
+        self.assertFalse(membership.is_author)
+
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            membership = get_membership(user)
+            self.assertTrue(membership.is_leader_of(self.team.id))
+            self.assertIs(get_membership(user), membership)
+
+    def test_author_and_team_changes_invalidate_the_cache(self):
+        self.membership()
+        author = Author.objects.create(user=self.user, pen_name='pen')
+        TeamMember.objects.create(user=self.user, team=self.other_team, role=self.member)
+        membership = self.membership()
+        self.assertEqual((membership.author_id, membership.pen_name), (author.id, 'pen'))
+        self.assertEqual(membership.role_in(self.other_team.id), 'Member')
+
+        TeamMember.objects.filter(team=self.team).get().delete()
+        self.assertIsNone(self.membership().role_in(self.team.id))
+
+    def test_role_names_are_resolved_at_check_time(self):
+        self.membership()
+        self.leader.name = 'Former leader'
+        self.leader.save()
+        self.assertFalse(self.membership().is_leader_of(self.team.id))
+
+        self.leader.name = 'Leader'
+        self.leader.save()
+        self.assertTrue(self.membership().is_leader_of(self.team.id))
+
+    def test_role_missing_from_a_stale_reference_table(self):
+        # Bảng tham chiếu của process này chưa biết vai trò (tạo ở process khác): đọc từ database
+        with mock.patch.object(reference_data.roles, 'get', return_value=None):
+            self.assertTrue(self.membership().is_leader_of(self.team.id))
+            self.assertTrue(self.membership().is_leader_of(self.team.id))
@@ -2,6 +2,8 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
+from backend import reference_data
+from .membership import get_membership
 from .models import Author
 from .serializers import *
 
@@ -9,7 +11,7 @@ class RegisterAuthorView(APIView):
     permission_classes = [IsAuthenticated] 
 
     def post(self, request):
-        if Author.objects.filter(user=request.user).exists():
+        if get_membership(request.user).is_author:
             return Response({"error": "User is already registered as an author."}, status=status.HTTP_400_BAD_REQUEST)
 
         serializer = AuthorSerializer(data=request.data, context={'request': request})
@@ -22,11 +24,10 @@ class GetPenNameView(APIView):
     permission_classes = [IsAuthenticated]  
 
     def get(self, request):
-        try:
-            author = Author.objects.get(user=request.user)
-            return Response({"pen_name": author.pen_name}, status=200)
-        except Author.DoesNotExist:
-            return Response({"error": "User does not have a pen name."}, status=404)
+        membership = get_membership(request.user)
+        if membership.is_author:
+            return Response({"pen_name": membership.pen_name}, status=200)
+        return Response({"error": "User does not have a pen name."}, status=404)
         
 class UpdatePenNameView(APIView):
     permission_classes = [IsAuthenticated]  # Ensure the user is authenticated
@@ -70,11 +71,14 @@ class AddMemberToTeamView(APIView):
         try:
             user = User.objects.get(id=user_id)
             team = Team.objects.get(id=team_id)
-            role = Role.objects.get(name=role_name)
-        except (User.DoesNotExist, Team.DoesNotExist, Role.DoesNotExist):
+        except (User.DoesNotExist, Team.DoesNotExist):
+            return Response({"error": "Invalid user, team, or role"}, status=status.HTTP_400_BAD_REQUEST)
+        # Vai trò lấy từ bảng tham chiếu trong RAM
+        role = reference_data.roles.get_by('name', role_name)
+        if role is None:
             return Response({"error": "Invalid user, team, or role"}, status=status.HTTP_400_BAD_REQUEST)
 
-        team_member = TeamMember.objects.create(user=user, team=team, role=role)
+        team_member = TeamMember.objects.create(user=user, team=team, role_id=role.pk)
         return Response({
             "message": "Member added to team successfully",
             "user": user.username,
@@ -0,0 +1,8 @@
+from django.contrib import admin
+from .models import StoredImage
+
+@admin.register(StoredImage)
+class StoredImageAdmin(admin.ModelAdmin):
+    list_display = ('digest', 'profile', 'url', 'ref_count', 'date_update')
+    list_filter = ('profile',)
+    search_fields = ('digest', 'url')
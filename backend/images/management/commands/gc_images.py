@@ -0,0 +1,38 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils.timezone import now
+from images.models import StoredImage
+
+
+class Command(BaseCommand):
+    help = 'Xoá các ảnh không còn được tham chiếu (ref_count <= 0) quá thời gian chờ'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24,
+                            help='Chỉ xoá ảnh đã không được dùng ít nhất chừng này giờ')
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = now() - timedelta(hours=options['grace_hours'])
+        orphans = StoredImage.objects.filter(ref_count__lte=0, date_update__lt=cutoff)
+        removed = 0
+        for stored in orphans.iterator():
+            self.stdout.write(f'Removing {stored.digest} {stored.url}')
+            if not options['dry_run']:
+                self._delete_local_files(stored)
+                stored.delete()
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f'Removed {removed} orphaned images.'))
+
+    def _delete_local_files(self, stored):
+        # Chỉ xoá được file do image host local lưu; ảnh trên Imgur giữ nguyên
+        urls = {stored.url}
+        for variant in (stored.variants or {}).values():
+            urls.update(value for key, value in variant.items() if key not in ('width', 'height'))
+        base_url = getattr(settings, 'LOCAL_IMAGE_HOST_URL', '')
+        for url in urls:
+            url = url[len(base_url):] if base_url and url.startswith(base_url) else url
+            if url.startswith(settings.MEDIA_URL):
+                default_storage.delete(url[len(settings.MEDIA_URL):])
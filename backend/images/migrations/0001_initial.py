@@ -0,0 +1,27 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredImage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('digest', models.CharField(max_length=64, unique=True)),
+                ('profile', models.CharField(max_length=20)),
+                ('url', models.CharField(db_index=True, max_length=255)),
+                ('variants', models.JSONField(blank=True, default=None, null=True)),
+                ('ref_count', models.IntegerField(default=0)),
+                ('date_upload', models.DateTimeField(auto_now_add=True)),
+                ('date_update', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
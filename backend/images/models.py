@@ -0,0 +1,48 @@
+from django.db import models
+
+
+class StoredImage(models.Model):
+    """
+    Ảnh đã upload, định danh theo hash nội dung đã chuẩn hoá (content-addressed).
+    Ảnh trùng được dùng lại thay vì encode và upload lại; `ref_count` đếm số
+    field đang trỏ tới ảnh để dọn các ảnh không còn ai dùng.
+    """
+    digest = models.CharField(max_length=64, unique=True)
+    profile = models.CharField(max_length=20)
+    url = models.CharField(max_length=255, db_index=True)
+    variants = models.JSONField(null=True, blank=True, default=None)
+    ref_count = models.IntegerField(default=0)
+    date_upload = models.DateTimeField(auto_now_add=True)
+    date_update = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.digest[:12]} ({self.ref_count} refs)"
+
+
+class ImageReferencesMixin:
+    """
+    Cho model có field URL ảnh được đếm tham chiếu (images.signals.TRACKED_IMAGE_FIELDS):
+    nhớ giá trị đọc từ database để lúc lưu biết URL cũ mà không cần truy vấn.
+    Lúc load chỉ gán một thuộc tính; dict giá trị chỉ được dựng khi lưu.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = (field_names, values)
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None):
+        # Gồm cả field bị defer được load lúc truy cập lần đầu
+        super().refresh_from_db(using=using, fields=fields)
+        saved = self.saved_values()
+        refreshed = fields or [field.attname for field in self._meta.concrete_fields]
+        saved.update((name, self.__dict__[name]) for name in refreshed if name in self.__dict__)
+
+    def saved_values(self):
+        """Giá trị các field đã load, như đang lưu trong database (theo lần đọc / lưu gần nhất)"""
+        saved = self.__dict__.get('_saved_values')
+        if saved is None:
+            field_names, values = self.__dict__.get('_loaded_values', ((), ()))
+            saved = self._saved_values = dict(zip(field_names, values))
+        return saved
@@ -0,0 +1,52 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, pre_delete, pre_save
+from .store import change_references, change_references_from
+
+# Các field URL ảnh được đếm tham chiếu trong StoredImage
+TRACKED_IMAGE_FIELDS = {
+    'book.Book': ('img',),
+    'book.Volume': ('img',),
+    'user.UserInfo': ('img_avatar', 'img_background'),
+}
+
+
+def _update_references(sender, instance, update_fields=None, **kwargs):
+    fields = TRACKED_IMAGE_FIELDS[sender._meta.label]
+    saved = {} if instance._state.adding else instance.saved_values()
+    for field in fields:
+        if field not in instance.__dict__ or (update_fields is not None and field not in update_fields):
+            continue  # field bị defer và chưa gán thì không đổi
+        new = instance.__dict__[field]
+        if field in saved or instance._state.adding:
+            old = saved.get(field)
+            if old != new:
+                change_references(old, -1)
+                change_references(new, +1)
+        else:
+            # Field bị defer rồi gán thẳng: URL cũ chỉ có trong database, trừ luôn trong câu UPDATE
+            change_references_from(sender.objects.filter(pk=instance.pk).values(field), -1)
+            change_references(new, +1)
+    instance.saved_values().update((field, instance.__dict__[field]) for field in fields if field in instance.__dict__)
+
+
+def _release_deferred_references(sender, instance, **kwargs):
+    # Field chưa load: URL chỉ còn trong database, phải trừ trước khi dòng bị xoá
+    saved = instance.saved_values()
+    for field in TRACKED_IMAGE_FIELDS[sender._meta.label]:
+        if field not in saved and field not in instance.__dict__:
+            change_references_from(sender.objects.filter(pk=instance.pk).values(field), -1)
+
+
+def _release_references(sender, instance, **kwargs):
+    saved = instance.saved_values()
+    for field in TRACKED_IMAGE_FIELDS[sender._meta.label]:
+        if field in saved or field in instance.__dict__:
+            change_references(saved.get(field, instance.__dict__.get(field)), -1)
+
+
+def connect_tracked_fields():
+    for label in TRACKED_IMAGE_FIELDS:
+        model = apps.get_model(label)
+        pre_save.connect(_update_references, sender=model, dispatch_uid=f'images-save-{label}')
+        pre_delete.connect(_release_deferred_references, sender=model, dispatch_uid=f'images-pre-delete-{label}')
+        post_delete.connect(_release_references, sender=model, dispatch_uid=f'images-delete-{label}')
@@ -0,0 +1,32 @@
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.timezone import now
+from .models import StoredImage
+
+
+def find_image(digest):
+    """Ảnh đã lưu có cùng nội dung, hoặc None"""
+    return StoredImage.objects.filter(digest=digest).first()
+
+
+def register_image(digest, profile, url, variants):
+    """
+    Ghi nhận ảnh vừa upload xong. Nếu một worker khác đã lưu cùng nội dung
+    trước đó thì trả về bản đã có để mọi nơi dùng chung một asset.
+    """
+    try:
+        with transaction.atomic():
+            return StoredImage.objects.create(digest=digest, profile=profile, url=url, variants=variants)
+    except IntegrityError:
+        return StoredImage.objects.get(digest=digest)
+
+
+def change_references(url, delta):
+    if url:
+        # update() bỏ qua auto_now nên cập nhật date_update thủ công cho gc_images
+        StoredImage.objects.filter(url=url).update(ref_count=F('ref_count') + delta, date_update=now())
+
+
+def change_references_from(urls, delta):
+    """Như change_references, với URL lấy từ một queryset `.values(field)` (chạy như subquery)"""
+    StoredImage.objects.filter(url__in=urls).update(ref_count=F('ref_count') + delta, date_update=now())
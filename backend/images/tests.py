@@ -0,0 +1,223 @@
+import base64
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+from PIL import Image
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from django.test import SimpleTestCase, TransactionTestCase, override_settings
+from backend import image_utils, upload_queue
+from backend.image_hosts import upload_image_to_local
+from backend.image_utils import InvalidImageError
+from book.models import Book, BookStatus, Volume
+from .models import StoredImage
+
+
+def make_image(color=(200, 30, 30), size=(900, 1300), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, image_format)
+    return ContentFile(buffer.getvalue(), name=f'cover.{image_format.lower()}')
+
+
+class Base64DecodeTest(SimpleTestCase):
+    def setUp(self):
+        self.data = make_image(size=(64, 48)).read()
+
+    def decode(self, payload, **kwargs):
+        with image_utils.decode_base64_image(payload, **kwargs) as image_file:
+            return image_file.read(), image_file.name
+
+    def test_chunk_boundaries_and_padding(self):
+        # Mọi độ dài phần dư (0, 1, 2 byte -> '', '==', '=') và xuống dòng kiểu MIME cắt ngang chunk
+        for trim in range(3):
+            data = self.data[:len(self.data) - trim]
+            encoded = base64.b64encode(data).decode('ascii')
+            wrapped = '\n'.join(encoded[i:i + 76] for i in range(0, len(encoded), 76))
+            for chunk_size in (5, 8, 13, 76, 4096):
+                with mock.patch.object(image_utils, 'BASE64_CHUNK_SIZE', chunk_size):
+                    for payload in (encoded, wrapped, f'data:image/png;base64,{encoded}'):
+                        self.assertEqual(self.decode(payload), (data, 'uploaded_image.png'), (trim, chunk_size))
+
+    def test_size_cap(self):
+        encoded = base64.b64encode(self.data).decode('ascii')
+        # Ước lượng từ độ dài chuỗi, và kiểm tra lại trên số byte đã giải mã
+        for max_bytes in (len(self.data) // 2, len(self.data) - 10):
+            with self.assertRaises(InvalidImageError):
+                self.decode(encoded, max_bytes=max_bytes)
+        self.assertEqual(self.decode(encoded, max_bytes=len(self.data))[0], self.data)
+
+    def test_invalid_data_is_rejected(self):
+        encoded = base64.b64encode(self.data).decode('ascii')
+        for payload in (
+            base64.b64encode(b'<html>not an image</html>' * 4).decode('ascii'),
+            encoded[:-1],
+            encoded[:40] + '*' + encoded[41:],
+        ):
+            with self.assertRaises(InvalidImageError):
+                self.decode(payload)
+
+
+class FlakyUploader:
+    """Image host giả lập: lỗi `failures` lần đầu rồi lưu ảnh bằng upload_image_to_local"""
+    failures = 0
+    calls = 0
+
+    @classmethod
+    def upload(cls, image_file):
+        cls.calls += 1
+        if cls.failures > 0:
+            cls.failures -= 1
+            raise ConnectionError('image host unavailable')
+        return upload_image_to_local(image_file)
+
+
+def flaky_upload(image_file):
+    return FlakyUploader.upload(image_file)
+
+
+@override_settings(
+    IMAGE_UPLOADER='images.tests.flaky_upload',
+    IMAGE_UPLOAD_ASYNC=False,
+    IMAGE_UPLOAD_MAX_RETRIES=2,
+)
+class ImageUploadPipelineTest(TransactionTestCase):
+    """Worker chạy đồng bộ trong callback on_commit (IMAGE_UPLOAD_ASYNC=False)"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        FlakyUploader.failures = 0
+        FlakyUploader.calls = 0
+        sleep = mock.patch.object(upload_queue.time, 'sleep')
+        self.sleep = sleep.start()
+        self.addCleanup(sleep.stop)
+
+        BookStatus.objects.create(name='Đang tiến hành', code='ongoing')
+        self.book = Book.objects.create(title='Test book')
+
+    def stage_volume(self, image=None):
+        """Lưu một tập với ảnh đang chờ, như CreateVolumeSerializer"""
+        pending = upload_queue.stage_image_upload(image or make_image())
+        volume = Volume.objects.create(book=self.book, title='Volume 1', img=pending.placeholder_url)
+        pending.submit(volume, 'img', 'img_variants')
+        return pending, volume
+
+    def listdir(self, directory):
+        return default_storage.listdir(directory)[1] if default_storage.exists(directory) else []
+
+    def test_placeholder_is_swapped_after_commit(self):
+        with transaction.atomic():
+            pending, volume = self.stage_volume()
+            # Chưa commit: model trỏ tới bản gốc local, chưa gọi image host
+            self.assertTrue(pending.placeholder_url.startswith('/media/pending_uploads/'))
+            self.assertEqual(len(self.listdir(upload_queue.PENDING_DIR)), 1)
+            self.assertEqual(FlakyUploader.calls, 0)
+
+        volume.refresh_from_db()
+        self.assertTrue(volume.img.startswith('/media/hosted/'))
+        self.assertEqual(set(volume.img_variants), {'thumbnail', 'cover', 'full'})
+        self.assertEqual(volume.img_variants['thumbnail']['width'], 160)
+        self.assertEqual(FlakyUploader.calls, 1)
+        self.assertEqual(self.listdir(upload_queue.PENDING_DIR), [])
+        self.assertEqual(StoredImage.objects.get().ref_count, 1)
+
+    def test_nothing_is_uploaded_when_the_transaction_rolls_back(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.stage_volume()
+            raise RuntimeError
+        self.assertEqual(FlakyUploader.calls, 0)
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_upload_is_retried_with_backoff(self):
+        FlakyUploader.failures = 2
+        with self.assertLogs('backend.upload_queue', 'WARNING'):
+            _, volume = self.stage_volume()
+
+        volume.refresh_from_db()
+        self.assertTrue(volume.img.startswith('/media/hosted/'))
+        self.assertEqual(FlakyUploader.calls, 3)
+        delays = [call.args[0] for call in self.sleep.call_args_list]
+        self.assertEqual(len(delays), 2)
+        # backoff 1s rồi 2s, nhân jitter trong [0.5, 1]
+        self.assertTrue(0.5 <= delays[0] <= 1.0 and 1.0 <= delays[1] <= 2.0)
+
+    def test_placeholder_is_kept_when_the_upload_gives_up(self):
+        FlakyUploader.failures = 10
+        with self.assertLogs('backend.upload_queue', 'ERROR'):
+            pending, volume = self.stage_volume()
+
+        volume.refresh_from_db()
+        self.assertEqual(volume.img, pending.placeholder_url)
+        self.assertIsNone(volume.img_variants)
+        self.assertEqual(FlakyUploader.calls, 3)
+        # Bản gốc còn được phục vụ; các biến thể đã tạo bị xoá
+        self.assertEqual(len(self.listdir(upload_queue.PENDING_DIR)), 1)
+        self.assertEqual(self.listdir(upload_queue.IMAGE_DIR), [])
+        self.assertFalse(StoredImage.objects.exists())
+
+    def test_image_changed_before_upload_finishes_is_kept(self):
+        with transaction.atomic():
+            _, volume = self.stage_volume()
+            volume.img = 'https://example.com/other.jpg'
+            volume.save()
+
+        volume.refresh_from_db()
+        self.assertEqual(volume.img, 'https://example.com/other.jpg')
+        self.assertEqual(self.listdir(upload_queue.PENDING_DIR), [])
+
+    def test_invalid_image_is_rejected_before_anything_is_stored(self):
+        with self.assertRaises(InvalidImageError):
+            upload_queue.stage_image_upload(ContentFile(b'\x89PNG\r\n\x1a\nnot really a png', name='broken.png'))
+        self.assertEqual(self.listdir(upload_queue.PENDING_DIR), [])
+
+    def test_identical_images_share_one_stored_image(self):
+        _, first = self.stage_volume()
+        _, second = self.stage_volume()
+
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.img, second.img)
+        self.assertEqual(FlakyUploader.calls, 1)
+        self.assertEqual(StoredImage.objects.get().ref_count, 2)
+
+    def test_references_follow_field_changes(self):
+        _, volume = self.stage_volume()
+        volume.refresh_from_db()
+        stored = StoredImage.objects.get()
+
+        volume.img = 'https://example.com/other.jpg'
+        volume.save()
+        stored.refresh_from_db()
+        self.assertEqual(stored.ref_count, 0)
+
+        volume.img = stored.url
+        volume.save()
+        stored.refresh_from_db()
+        self.assertEqual(stored.ref_count, 1)
+
+        # Xoá khi field ảnh bị defer: URL được đọc từ database trước khi xoá
+        Volume.objects.defer('img').get(id=volume.id).delete()
+        stored.refresh_from_db()
+        self.assertEqual(stored.ref_count, 0)
+
+    def test_gc_removes_only_unreferenced_images(self):
+        _, kept = self.stage_volume(make_image(color=(10, 120, 10)))
+        _, dropped = self.stage_volume(make_image(color=(10, 10, 120)))
+        Volume.objects.get(id=dropped.id).delete()
+        self.assertEqual(sorted(StoredImage.objects.values_list('ref_count', flat=True)), [0, 1])
+        self.assertEqual(len(self.listdir('hosted')), 2)
+
+        call_command('gc_images', grace_hours=0, stdout=StringIO())
+        kept.refresh_from_db()
+        stored = StoredImage.objects.get()
+        self.assertEqual(stored.url, kept.img)
+        self.assertEqual(stored.ref_count, 1)
+        # Chỉ còn các biến thể và file trên image host của ảnh được giữ
+        self.assertTrue(all(name.startswith(stored.digest) for name in self.listdir(upload_queue.IMAGE_DIR)))
+        self.assertEqual(len(self.listdir('hosted')), 1)
@@ -0,0 +1,177 @@
+import copy
+import threading
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+CACHE_ALIAS = getattr(settings, 'AUTH_CACHE_ALIAS', 'default')
+# Kết quả kiểm tra thu hồi được giữ trong process bấy nhiêu giây: token bị thu
+# hồi ở worker khác có thể còn dùng được tối đa chừng đó thời gian
+LOCAL_TTL = getattr(settings, 'AUTH_LOCAL_CACHE_TTL', 30)
+LOCAL_MAX_SIZE = 10000
+# Các claim mà request.user được dựng lại từ đó, không cần đọc bảng User
+USER_CLAIMS = ('username', 'is_staff')
+
+
+class _LocalCache:
+    """Dict có TTL, sống trong process"""
+
+    def __init__(self, ttl, max_size=LOCAL_MAX_SIZE):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            return None
+        return entry[1]
+
+    def set(self, key, value):
+        with self.lock:
+            if len(self.data) >= self.max_size:
+                self.data.clear()
+            self.data[key] = (time.monotonic() + self.ttl, value)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+_verdicts = _LocalCache(LOCAL_TTL)
+_users = _LocalCache(LOCAL_TTL)
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def _deny_key(jti):
+    return f'jwt-deny:{jti}'
+
+
+def _revoked_before_key(user_id):
+    return f'jwt-revoked-before:{user_id}'
+
+
+def deny_token(token):
+    """Thu hồi một token (theo jti) cho tới khi nó tự hết hạn"""
+    remaining = int(token['exp'] - time.time()) + 1
+    if remaining > 0:
+        _cache().set(_deny_key(token[api_settings.JTI_CLAIM]), True, remaining)
+    _verdicts.clear()
+
+
+def revoke_user_tokens(user_id):
+    """Thu hồi mọi token đã cấp cho user trước thời điểm này (đổi mật khẩu, khoá tài khoản...)"""
+    def revoke():
+        lifetime = int(api_settings.REFRESH_TOKEN_LIFETIME.total_seconds())
+        _cache().set(_revoked_before_key(user_id), time.time(), lifetime)
+        _verdicts.clear()
+        _users.clear()
+
+    transaction.on_commit(revoke)
+
+
+def deactivate_users(users):
+    """
+    Khoá nhiều tài khoản bằng một UPDATE. QuerySet.update() không gửi signal nên
+    token của các user này phải được thu hồi tại đây; trả về số tài khoản bị khoá.
+    """
+    with transaction.atomic():
+        user_ids = list(users.filter(is_active=True).values_list('pk', flat=True))
+        User.objects.filter(pk__in=user_ids).update(is_active=False)
+        for user_id in user_ids:
+            revoke_user_tokens(user_id)
+    return len(user_ids)
+
+
+def is_revoked(token):
+    """Một lần get_many trên cache dùng chung, sau đó nhớ kết quả trong process"""
+    jti = token[api_settings.JTI_CLAIM]
+    revoked = _verdicts.get(jti)
+    if revoked is None:
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        deny_key, revoked_key = _deny_key(jti), _revoked_before_key(user_id)
+        found = _cache().get_many([deny_key, revoked_key])
+        revoked_before = found.get(revoked_key)
+        revoked = deny_key in found or (revoked_before is not None and token.get('iat', 0) <= revoked_before)
+        _verdicts.set(jti, revoked)
+    return revoked
+
+
+class AikoRefreshToken(RefreshToken):
+    """Refresh token (và access token sinh ra từ nó) mang sẵn thông tin user mà các view cần"""
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        token['iat'] = time.time()
+        token['username'] = user.username
+        token['is_staff'] = user.is_staff
+        return token
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Như JWTAuthentication nhưng không đọc bảng User: request.user được dựng từ
+    claim trong token. Token đã bị thu hồi (đăng xuất, đổi mật khẩu, khoá tài
+    khoản) bị từ chối qua denylist trong cache. Token cũ không có các claim
+    này vẫn được chấp nhận, khi đó user được đọc từ database và nhớ trong process.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        if is_revoked(token):
+            raise InvalidToken(_('Token has been revoked'))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        if all(claim in validated_token for claim in USER_CLAIMS):
+            return token_user(validated_token)
+
+        user = _users.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            _users.set(user_id, user)
+        # Mỗi request một bản sao: thuộc tính gắn vào request.user (vd. _membership) không sống sang request sau
+        return copy.copy(user)
+
+
+def token_user(token):
+    """
+    User chưa đọc từ database: chỉ có id / username / is_staff, đủ cho việc
+    lọc theo user và kiểm tra quyền. Không dùng để save().
+    """
+    user = User(
+        id=token[api_settings.USER_ID_CLAIM],
+        username=token['username'],
+        is_staff=token['is_staff'],
+        is_active=True,
+    )
+    user._state.adding = False
+    user._state.db = 'default'
+    return user
+
+
+def refresh_user(refresh):
+    """Đọc lại user khi refresh, để claim trong token mới không bị cũ"""
+    if is_revoked(refresh):
+        raise InvalidToken(_('Token has been revoked'))
+    user = User.objects.filter(pk=refresh.get(api_settings.USER_ID_CLAIM)).first()
+    if user is None or not user.is_active:
+        raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+    return user
@@ -0,0 +1,23 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0003_auto_20250117_0642'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userinfo',
+            name='img_avatar_variants',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+        migrations.AddField(
+            model_name='userinfo',
+            name='img_background_variants',
+            field=models.JSONField(blank=True, default=None, null=True),
+        ),
+    ]
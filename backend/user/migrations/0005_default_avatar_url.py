@@ -0,0 +1,19 @@
+# Generated by Django 3.1.12 on 2026-10-18 16:33
+
+import backend.image_utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('user', '0004_image_variants'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userinfo',
+            name='img_avatar',
+            field=models.CharField(blank=True, default=backend.image_utils.default_avatar_url, max_length=255, null=True),
+        ),
+    ]
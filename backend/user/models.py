@@ -1,30 +1,35 @@
 from django import forms
 from django.db import models
 from django.contrib.auth.models import User
-from backend.imgur_utils import upload_image_to_imgur
+from backend.image_utils import default_avatar_url
+from backend.upload_queue import stage_image_upload
+from images.models import ImageReferencesMixin
 
-class UserInfo(models.Model):
+class UserInfo(ImageReferencesMixin, models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE, db_index=True, primary_key=True)
     full_name = models.CharField(max_length=100, null=True)
-    img_avatar = models.CharField(max_length=255, null=True, blank=True, default='https://i.imgur.com/default-avatar.jpg')  # Sử dụng CharField để lưu URL
+    img_avatar = models.CharField(max_length=255, null=True, blank=True, default=default_avatar_url)  # Sử dụng CharField để lưu URL
     img_background = models.CharField(max_length=255, null=True, blank=True)
     img_background_position = models.IntegerField(default=0)
+    # Các biến thể kích thước / định dạng của avatar và ảnh nền
+    img_avatar_variants = models.JSONField(null=True, blank=True, default=None)
+    img_background_variants = models.JSONField(null=True, blank=True, default=None)
 
     def save(self, *args, **kwargs):
-        # Save image to Imgur 
-        if self.img_avatar and hasattr(self.img_avatar, 'file'):
-            if not self.img_avatar.startswith('http'):
-                image_file = self.img_avatar.file
-                img_url = upload_image_to_imgur(image_file)
-                self.img_avatar = img_url
-
-        if self.img_background and hasattr(self.img_background, 'file'):
-            if not self.img_background.startswith('http'):
-                image_file = self.img_background.file
-                img_url = upload_image_to_imgur(image_file)
-                self.img_background = img_url  
+        # Save image to Imgur: lưu tạm file và upload ở nền sau khi commit
+        pending_uploads = []
+        for field_name, profile in (('img_avatar', 'avatar'), ('img_background', 'background')):
+            value = getattr(self, field_name)
+            if value and hasattr(value, 'file'):
+                pending_upload = stage_image_upload(value, profile=profile)
+                setattr(self, field_name, pending_upload.placeholder_url)
+                setattr(self, f'{field_name}_variants', pending_upload.placeholder_variants)
+                pending_uploads.append((pending_upload, field_name))
 
         super().save(*args, **kwargs)  
 
+        for pending_upload, field_name in pending_uploads:
+            pending_upload.submit(self, field_name, f'{field_name}_variants')
+
     def __str__(self):
         return self.user.username
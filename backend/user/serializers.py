@@ -1,5 +1,8 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .authentication import AikoRefreshToken, deny_token, refresh_user
 from .models import *
 
 class RegisterSerializer(serializers.ModelSerializer):
@@ -27,7 +30,7 @@ class UserInfoSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = UserInfo
-        fields = ['username', 'full_name', 'img_avatar', 'img_background', 'img_background_position']
+        fields = ['username', 'full_name', 'img_avatar', 'img_avatar_variants', 'img_background', 'img_background_variants', 'img_background_position']
 
 class UpdateFullNameSerializer(serializers.ModelSerializer):
     class Meta:
@@ -54,4 +57,22 @@ class UpdateBackgroundSerializer(serializers.ModelSerializer):
     def validate_img_background(self, value):
         if value and not value.startswith("http"):
             raise serializers.ValidationError("Background must be a valid URL.")
-        return value
\ No newline at end of file
+        return value
+
+
+class AikoTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return AikoRefreshToken.for_user(user)
+
+
+class AikoTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = AikoRefreshToken(attrs['refresh'])
+        # Cấp token mới từ dữ liệu hiện tại của user thay vì chép claim cũ
+        token = AikoRefreshToken.for_user(refresh_user(refresh))
+        data = {'access': str(token.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            deny_token(refresh)
+            data['refresh'] = str(token)
+        return data
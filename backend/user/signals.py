@@ -0,0 +1,42 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+from backend.response_cache import invalidate_tags
+from .authentication import revoke_user_tokens
+from .models import UserInfo
+
+
+@receiver([post_save, post_delete], sender=UserInfo)
+def invalidate_user_info_responses(sender, instance, **kwargs):
+    invalidate_tags(f'username:{instance.user.username}')
+
+
+@receiver(pre_save, sender=User)
+def remember_credentials(sender, instance, update_fields=None, **kwargs):
+    # Chỉ tra giá trị cũ khi chúng có thể đổi (bỏ qua các lần cập nhật last_login)
+    watched = ('username', 'password', 'is_active', 'is_staff')
+    if instance.pk and (update_fields is None or set(watched) & set(update_fields)):
+        old = User.objects.filter(pk=instance.pk).values(*watched).first()
+        if old:
+            instance._old_username = old['username']
+            instance._credentials_changed = any(old[field] != getattr(instance, field) for field in watched)
+
+
+@receiver(post_save, sender=User)
+def revoke_tokens_on_credentials_change(sender, instance, created, **kwargs):
+    # Token mang sẵn username / is_staff nên phải thu hồi khi chúng, mật khẩu hoặc trạng thái khoá đổi.
+    # update() không qua đây: khoá tài khoản hàng loạt dùng authentication.deactivate_users
+    if not created and getattr(instance, '_credentials_changed', False):
+        revoke_user_tokens(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_tokens_on_delete(sender, instance, **kwargs):
+    revoke_user_tokens(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_responses(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and 'username' not in update_fields:
+        return
+    invalidate_tags(f'username:{instance.username}', f'username:{getattr(instance, "_old_username", None) or instance.username}')
@@ -1,3 +1,104 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from contributors.membership import get_membership
+from .authentication import AikoRefreshToken, StatelessJWTAuthentication, _users, _verdicts, deactivate_users
+from .models import UserInfo
 
-# Create your tests here.
+
+class TokenRevocationTest(TransactionTestCase):
+    """TransactionTestCase: thu hồi mọi token của user chạy sau commit"""
+
+    def setUp(self):
+        cache.clear()
+        _verdicts.clear()
+        _users.clear()
+        self.user = User.objects.create_user(username='reader', password='password123')
+        UserInfo.objects.create(user=self.user, full_name='Reader')
+        self.client = APIClient()
+
+    def login(self, password='password123'):
+        response = self.client.post(reverse('login'), {'username': 'reader', 'password': password}, format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def get_info(self, access):
+        return self.client.get(reverse('user-info'), HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def refresh(self, refresh):
+        return self.client.post(reverse('token-refresh'), {'refresh': refresh}, format='json')
+
+    def test_user_is_built_from_token_claims(self):
+        access = self.login()['access']
+        # Chỉ query UserInfo (kèm User) của chính view, không đọc bảng User để xác thực
+        with self.assertNumQueries(1):
+            response = self.get_info(access)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'reader')
+
+    def test_logout_revokes_the_access_and_refresh_tokens(self):
+        tokens = self.login()
+        response = self.client.post(
+            reverse('logout'), {'refresh': tokens['refresh']}, format='json',
+            HTTP_AUTHORIZATION=f"Bearer {tokens['access']}",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.get_info(tokens['access']).status_code, 401)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        # Phiên khác của cùng user vẫn dùng được
+        self.assertEqual(self.get_info(self.login()['access']).status_code, 200)
+
+    def test_password_change_revokes_every_issued_token(self):
+        old = self.login()
+        self.assertEqual(self.get_info(old['access']).status_code, 200)
+        self.user.set_password('new-password')
+        self.user.save()
+
+        self.assertEqual(self.get_info(old['access']).status_code, 401)
+        self.assertEqual(self.refresh(old['refresh']).status_code, 401)
+        self.assertEqual(self.get_info(self.login('new-password')['access']).status_code, 200)
+
+    def test_deactivation_revokes_every_issued_token(self):
+        for update_fields in (None, ['is_active']):
+            tokens = self.login()
+            self.assertEqual(self.get_info(tokens['access']).status_code, 200)
+            self.user.is_active = False
+            self.user.save(update_fields=update_fields)
+            self.assertEqual(self.get_info(tokens['access']).status_code, 401)
+            self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+            self.user.is_active = True
+            self.user.save()
+
+    def test_bulk_deactivation_revokes_every_issued_token(self):
+        other = User.objects.create_user(username='other', password='password123')
+        tokens = self.login()
+        other_access = AikoRefreshToken.for_user(other).access_token
+        self.assertEqual(self.get_info(tokens['access']).status_code, 200)
+
+        self.assertEqual(deactivate_users(User.objects.filter(username='reader')), 1)
+        self.assertFalse(User.objects.get(pk=self.user.pk).is_active)
+        self.assertEqual(self.get_info(tokens['access']).status_code, 401)
+        self.assertEqual(self.refresh(tokens['refresh']).status_code, 401)
+        # Tài khoản không bị khoá vẫn dùng được (404 vì chưa có UserInfo, không phải 401)
+        self.assertEqual(self.get_info(other_access).status_code, 404)
+        self.assertEqual(deactivate_users(User.objects.filter(username='reader')), 0)
+
+    def test_refresh_reads_the_current_user(self):
+        refresh = AikoRefreshToken.for_user(self.user)
+        # Cập nhật thẳng, không qua signal: token không bị thu hồi nhưng user đã bị khoá
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertEqual(self.refresh(str(refresh)).status_code, 401)
+
+    def test_legacy_token_users_are_not_shared_between_requests(self):
+        # Token cũ không có claim username / is_staff: user đọc từ database rồi nhớ trong process
+        token = AccessToken.for_user(self.user)
+        authentication = StatelessJWTAuthentication()
+        first = authentication.get_user(token)
+        self.assertFalse(get_membership(first).is_author)
+        with self.assertNumQueries(0):
+            second = authentication.get_user(token)
+        self.assertEqual(second.username, 'reader')
+        self.assertFalse(hasattr(second, '_membership'))
@@ -1,17 +1,20 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from backend.async_views import async_read_view, cached_api_response
+from .serializers import AikoTokenObtainPairSerializer, AikoTokenRefreshSerializer
 from .views import *
 
 urlpatterns = [
-    path('token/', TokenObtainPairView.as_view(), name='token-obtain-pair'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
+    path('token/', TokenObtainPairView.as_view(serializer_class=AikoTokenObtainPairSerializer), name='token-obtain-pair'),
+    path('token/refresh/', TokenRefreshView.as_view(serializer_class=AikoTokenRefreshSerializer), name='token-refresh'),
     path('info/', UserInfoView.as_view(), name='user-info'),
     path('login/', LoginAPIView.as_view(), name='login'),
+    path('logout/', LogoutView.as_view(), name='logout'),
     path('register/', RegisterView.as_view(), name='register'),
     path('check-username/', CheckUsernameView.as_view(), name='check-username'),
     path('check-email/', CheckEmailView.as_view(), name='check-email'),
     path('update-fullname/', UpdateFullNameView.as_view(), name='update-fullname'),
     path('update-avatar/', UpdateAvatarView.as_view(), name='update-avatar'),
     path('update-background/', UpdateBackgroundView.as_view(), name='update-background'),
-    path('<str:username>/', UserInfoByUsernameView.as_view(), name='user-info'),
+    path('<str:username>/', async_read_view(UserInfoByUsernameView.as_view(), fast_path=cached_api_response), name='user-info'),
 ]
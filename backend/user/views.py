@@ -2,9 +2,14 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import authenticate
 from rest_framework.exceptions import NotFound
+from backend.image_utils import InvalidImageError
+from backend.response_cache import cache_response
+from backend.upload_queue import stage_image_upload
+from .authentication import AikoRefreshToken, deny_token, revoke_user_tokens
 from .models import UserInfo
 from .serializers import *
 
@@ -12,20 +17,30 @@ class UserInfoView(APIView):
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        user_info = UserInfo.objects.get(user=user)
+        # Một query kèm bảng User: request.user chỉ dựng từ token, không có email
+        try:
+            user_info = UserInfo.objects.select_related('user').get(user_id=request.user.pk)
+        except UserInfo.DoesNotExist:
+            raise NotFound("User info not found")
+        user = user_info.user
         user_info = {
             'id': user.id,
             'username': user.username,
             'email': user.email,
             'fullname': user_info.full_name,
             'img_avatar': user_info.img_avatar,
+            'img_avatar_variants': user_info.img_avatar_variants,
             'img_background': user_info.img_background,
+            'img_background_variants': user_info.img_background_variants,
             'img_background_position': user_info.img_background_position,
         }
         return Response(user_info)
     
 class UserInfoByUsernameView(APIView):
+    @cache_response(
+        tags=lambda request, data, username: [f'username:{username}'],
+        key_tags=lambda request, username: [f'username:{username}'],
+    )
     def get(self, request, username):
         try:
             user_info = UserInfo.objects.get(user__username=username)
@@ -45,7 +60,7 @@ class LoginAPIView(APIView):
 
         if user is not None:
             # Tạo token
-            refresh = RefreshToken.for_user(user)
+            refresh = AikoRefreshToken.for_user(user)
             return Response({
                 "message": "Login successful",
                 "refresh": str(refresh),
@@ -57,6 +72,31 @@ class LoginAPIView(APIView):
                 "message": "Invalid username or password"
             }, status=status.HTTP_401_UNAUTHORIZED)
         
+class LogoutView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request):
+        """
+        Thu hồi access token đang dùng và refresh token gửi kèm (nếu có).
+        `all=true` thu hồi mọi token của user, đăng xuất khỏi tất cả thiết bị.
+        """
+        if str(request.data.get('all', '')).lower() in ('1', 'true'):
+            revoke_user_tokens(request.user.pk)
+            return Response({"message": "Logged out from all devices"}, status=status.HTTP_200_OK)
+
+        raw_refresh = request.data.get('refresh')
+        if raw_refresh:
+            try:
+                refresh = AikoRefreshToken(raw_refresh)
+            except TokenError as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            if refresh.get(api_settings.USER_ID_CLAIM) != request.user.pk:
+                return Response({"error": "Refresh token belongs to another user."}, status=status.HTTP_400_BAD_REQUEST)
+            deny_token(refresh)
+        if request.auth is not None:
+            deny_token(request.auth)
+        return Response({"message": "Logout successful"}, status=status.HTTP_200_OK)
+
 class RegisterView(APIView):
     def post(self, request, *args, **kwargs):
         serializer = RegisterSerializer(data=request.data)
@@ -109,12 +149,23 @@ class UpdateAvatarView(APIView):
 
         serializer = UpdateAvatarSerializer(user_info, data=request.data, partial=True)
         if serializer.is_valid():
-            # Handle avatar upload
+            # Handle avatar upload: trả về ngay với ảnh tạm, upload Imgur chạy nền
             img_avatar = request.data.get('file')
+            pending_upload = None
             if img_avatar and hasattr(img_avatar, 'file'):
-                serializer.validated_data['img_avatar'] = upload_image_to_imgur(img_avatar.file)
+                try:
+                    pending_upload = stage_image_upload(img_avatar, profile='avatar')
+                except InvalidImageError as e:
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                serializer.validated_data['img_avatar'] = pending_upload.placeholder_url
+                serializer.validated_data['img_avatar_variants'] = pending_upload.placeholder_variants
+            elif 'img_avatar' in serializer.validated_data:
+                # URL trực tiếp thì không có biến thể
+                serializer.validated_data['img_avatar_variants'] = None
 
             serializer.save()
+            if pending_upload:
+                pending_upload.submit(user_info, 'img_avatar', 'img_avatar_variants')
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -131,12 +182,23 @@ class UpdateBackgroundView(APIView):
 
         serializer = UpdateBackgroundSerializer(user_info, data=request.data, partial=True)
         if serializer.is_valid():
-            # Handle background upload
+            # Handle background upload: trả về ngay với ảnh tạm, upload Imgur chạy nền
             img_background = request.data.get('file')
+            pending_upload = None
             if img_background and hasattr(img_background, 'file'):
-                serializer.validated_data['img_background'] = upload_image_to_imgur(img_background.file)
+                try:
+                    pending_upload = stage_image_upload(img_background, profile='background')
+                except InvalidImageError as e:
+                    return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                serializer.validated_data['img_background'] = pending_upload.placeholder_url
+                serializer.validated_data['img_background_variants'] = pending_upload.placeholder_variants
+            elif 'img_background' in serializer.validated_data:
+                # URL trực tiếp thì không có biến thể
+                serializer.validated_data['img_background_variants'] = None
 
             serializer.save()
+            if pending_upload:
+                pending_upload.submit(user_info, 'img_background', 'img_background_variants')
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)